@@ -1,3 +1,3 @@
-from app.app import app
-
-__all__ = ["app"]
\ No newline at end of file
+# The application object lives in app.app ("app.app:app"). The package itself
+# imports nothing, so the document parser workers can import app.document_parsing
+# without loading the whole application.
@@ -0,0 +1,326 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import textwrap
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from agents import Agent
+
+from app.logging_setup import log_payload
+from app.model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+# Seconds between checks of the prompt files, 0 disables the watcher
+PROMPT_WATCH_INTERVAL_SECONDS = float(os.environ.get("PROMPT_WATCH_INTERVAL_SECONDS", "5"))
+
+DEFAULT_TRIAGE_PROMPT = """
+    Frage den Benutzer, um was es geht, und versuche den Fall dem korrekten Agenten zuzuordnen.
+    Leite nur an den Agenten weiter, wenn du sicher bist, dass es sich um einen Fall handelt, der von einem Agenten bearbeitet werden kann.
+    Du darfst keine Fragen beantworten.
+    """
+
+DEFAULT_SPECIALIST_PROMPT = """
+        Antworte mit "SORRY, Prompt nicht gefunden" und gib den Grund an, warum du nicht helfen kannst.
+        """
+
+OTHER_PROMPT = "You always respond with 'Sorry, I can only help with Road Traffic Law.'"
+
+SUMMARY_PROMPT = "Wenn alle Informationen vorliegen, fasse die Informationen zusammen und gib sie zurück und bedanke dich beim Benutzer für die Informationen. Wir werden die Daten nun an die/den zuständige/n Anwätin/Anwalt weiterleiten."
+
+# Prompt files (without extension) and the fallback used when a file is missing
+PROMPT_FILES = {
+    "triage_prompt": DEFAULT_TRIAGE_PROMPT,
+    "road_traffic_prompt": DEFAULT_SPECIALIST_PROMPT,
+    "betreibung_prompt": DEFAULT_SPECIALIST_PROMPT
+}
+
+
+def normalize_instructions(text: str) -> str:
+    """
+    Normalize agent instructions so they are byte-identical on every request and
+    after every reload, regardless of editor line endings, trailing whitespace or
+    the indentation of the hardcoded fallbacks. The provider's prompt cache only
+    matches on an exact prefix.
+    """
+    text = textwrap.dedent(text.replace("\r\n", "\n").replace("\r", "\n"))
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+@dataclass(frozen=True)
+class PromptSource:
+    """
+    A loaded prompt: the file it came from (None for the hardcoded fallback)
+    and its normalized content.
+    """
+    name: str
+    path: Optional[str]
+    content: str
+    sha256: str
+
+
+def _prompt_path(prompt_dir: str, name: str) -> Optional[str]:
+    # MD takes precedence over TXT
+    for extension in (".md", ".txt"):
+        path = os.path.join(prompt_dir, name + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def prompt_file_stats(prompt_dir: str) -> Dict[str, Optional[Tuple[str, int, int]]]:
+    """
+    (path, mtime_ns, size) of every prompt file, None for missing ones. Cheap
+    enough to poll.
+    """
+    stats: Dict[str, Optional[Tuple[str, int, int]]] = {}
+    for name in PROMPT_FILES:
+        path = _prompt_path(prompt_dir, name)
+        try:
+            stat = os.stat(path) if path else None
+        except FileNotFoundError:
+            stat = None
+        stats[name] = (path, stat.st_mtime_ns, stat.st_size) if stat else None
+    return stats
+
+
+def load_prompt(prompt_dir: str, name: str) -> PromptSource:
+    """
+    Load a prompt from `<name>.md` or `<name>.txt`, falling back to the
+    hardcoded default.
+    """
+    path = _prompt_path(prompt_dir, name)
+    content = None
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                content = file.read()
+            logger.info(f"Successfully loaded prompt from {path}")
+            log_payload(logger, "Prompt content", content, prompt_file=path)
+        except FileNotFoundError:
+            path = None
+    if content is None:
+        logger.warning(f"Prompt {name} not found in {prompt_dir}. Using hardcoded prompt as fallback.")
+        content = PROMPT_FILES[name]
+
+    content = normalize_instructions(content)
+    return PromptSource(
+        name=name,
+        path=path,
+        content=content,
+        sha256=hashlib.sha256(content.encode("utf-8")).hexdigest()
+    )
+
+
+@dataclass(frozen=True)
+class AgentGraph:
+    """
+    One consistent set of agents built from one set of prompts. A graph is never
+    modified after it has been built; reloading builds a new one. Requests take
+    the current graph once and use it until they finish.
+    """
+    version: int
+    fingerprint: str
+    loaded_at: float
+    triage: Agent
+    road_traffic: Agent
+    betreibung: Agent
+    other: Agent
+    summary: Agent
+    prompts: Dict[str, PromptSource] = field(default_factory=dict)
+
+    ROLES = ("triage", "road_traffic", "betreibung", "other", "summary")
+
+    # Specialists that conduct a multi-turn intake, so a session continues with
+    # them. "other" and "summary" answer one turn and can't hand off again.
+    RESUMABLE_ROLES = ("road_traffic", "betreibung")
+
+    def agents(self) -> List[Agent]:
+        return [self.triage, self.road_traffic, self.betreibung, self.other, self.summary]
+
+    def get_role(self, role: Optional[str]) -> Optional[Agent]:
+        """
+        The agent for a role name ("road_traffic", ...), None for unknown roles.
+        """
+        return getattr(self, role) if role in self.ROLES else None
+
+    def role_of(self, agent: Agent) -> Optional[str]:
+        for role in self.ROLES:
+            if getattr(self, role).name == agent.name:
+                return role
+        return None
+
+    def resumable_agent(self, name: Optional[str]) -> Optional[Agent]:
+        """
+        The agent a session's next turn continues with, None if the turn has
+        to be routed again (triage, "other", "summary", unknown agents).
+        """
+        agent = self.get_agent(name)
+        if agent is None:
+            return None
+        if agent.handoffs or self.role_of(agent) in self.RESUMABLE_ROLES:
+            return agent
+        return None
+
+    def get_agent(self, name: Optional[str]) -> Optional[Agent]:
+        """
+        Look up one of the graph's agents by its name.
+        """
+        if not name:
+            return None
+        for agent in self.agents():
+            if agent.name == name:
+                return agent
+        return None
+
+    def describe(self) -> Dict[str, object]:
+        return {
+            "version": self.version,
+            "fingerprint": self.fingerprint,
+            "loaded_at": self.loaded_at,
+            "prompts": [
+                {"name": prompt.name, "path": prompt.path, "sha256": prompt.sha256, "length": len(prompt.content)}
+                for prompt in self.prompts.values()
+            ]
+        }
+
+
+def graph_fingerprint(prompts: Dict[str, PromptSource]) -> str:
+    digest = hashlib.sha256()
+    for name in sorted(prompts):
+        digest.update(f"{name}:{prompts[name].sha256}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def build_agent_graph(registry: ModelRegistry, prompts: Dict[str, PromptSource], version: int) -> AgentGraph:
+    """
+    Create all agents for the given prompts.
+    """
+    triage_prompt = prompts["triage_prompt"].content
+    road_traffic_prompt = prompts["road_traffic_prompt"].content
+    debt_collection_prompt = prompts["betreibung_prompt"].content
+
+    trafficlaw_agent = Agent(
+        name="Road Traffic Law agent (Speeding)",
+        instructions=road_traffic_prompt,
+        model=registry.agent_model("road_traffic"),
+        model_settings=registry.model_settings("road_traffic", road_traffic_prompt)
+    )
+
+    collection_agent = Agent(
+        name="Debt collection agent",
+        instructions=debt_collection_prompt,
+        model=registry.agent_model("betreibung"),
+        model_settings=registry.model_settings("betreibung", debt_collection_prompt)
+    )
+
+    other_agent = Agent(
+        name="Other legal field agent (MISC)",
+        instructions=OTHER_PROMPT,
+        model=registry.agent_model("other"),
+        model_settings=registry.model_settings("other", OTHER_PROMPT)
+    )
+
+    summary_agent = Agent(
+        name="Summary agent",
+        instructions=SUMMARY_PROMPT,
+        model=registry.agent_model("summary"),
+        model_settings=registry.model_settings("summary", SUMMARY_PROMPT)
+    )
+
+    # The handoff order is fixed: the handoff tools are part of the cached prompt prefix
+    triage_agent = Agent(
+        name="Triage agent",
+        instructions=triage_prompt,
+        handoffs=[other_agent, trafficlaw_agent, collection_agent, summary_agent],
+        model=registry.agent_model("triage"),
+        model_settings=registry.model_settings("triage", triage_prompt)
+    )
+
+    return AgentGraph(
+        version=version,
+        fingerprint=graph_fingerprint(prompts),
+        loaded_at=time.time(),
+        triage=triage_agent,
+        road_traffic=trafficlaw_agent,
+        betreibung=collection_agent,
+        other=other_agent,
+        summary=summary_agent,
+        prompts=dict(prompts)
+    )
+
+
+class AgentGraphStore:
+    """
+    Holds the current AgentGraph and replaces it when the prompt files change.
+
+    Reloads stat the prompt files first and only read and hash them when a file's
+    mtime or size changed; a new graph is only built when a prompt's content
+    changed (or when forced). The new graph is built off the request path and
+    published with a single reference assignment, so running requests keep the
+    graph they started with.
+    """
+
+    def __init__(self, registry: ModelRegistry, prompt_dir: str = PROMPT_DIR):
+        self.registry = registry
+        self.prompt_dir = prompt_dir
+        self._lock = threading.Lock()
+        self._stats = prompt_file_stats(prompt_dir)
+        prompts = {name: load_prompt(prompt_dir, name) for name in PROMPT_FILES}
+        self._graph = build_agent_graph(registry, prompts, version=1)
+        self._listeners: List[Callable[[AgentGraph], None]] = []
+        logger.info(f"Loaded agent graph version 1 ({self._graph.fingerprint})")
+
+    @property
+    def current(self) -> AgentGraph:
+        return self._graph
+
+    def on_publish(self, listener: Callable[[AgentGraph], None]) -> None:
+        """
+        Call `listener` with every newly published graph, e.g. to drop state
+        derived from the old prompts.
+        """
+        self._listeners.append(listener)
+
+    def reload(self, force: bool = False) -> Tuple[bool, AgentGraph]:
+        """
+        Rebuild the graph if a prompt changed. Blocking; call it from a thread.
+
+        Returns:
+            Whether a new graph was published, and the current graph
+        """
+        with self._lock:
+            stats = prompt_file_stats(self.prompt_dir)
+            if not force and stats == self._stats:
+                return False, self._graph
+
+            prompts = {name: load_prompt(self.prompt_dir, name) for name in PROMPT_FILES}
+            self._stats = stats
+            if not force and graph_fingerprint(prompts) == self._graph.fingerprint:
+                logger.info("Prompt files touched but unchanged, keeping the agent graph")
+                return False, self._graph
+
+            graph = build_agent_graph(self.registry, prompts, version=self._graph.version + 1)
+            self._graph = graph
+            logger.info(f"Published agent graph version {graph.version} ({graph.fingerprint})")
+            for listener in self._listeners:
+                listener(graph)
+            return True, graph
+
+    async def watch(self, interval: float = PROMPT_WATCH_INTERVAL_SECONDS) -> None:
+        """
+        Poll the prompt files and reload on changes until cancelled.
+        """
+        logger.info(f"Watching {self.prompt_dir} for prompt changes every {interval}s")
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                logger.error(f"Error reloading prompts: {str(e)}")
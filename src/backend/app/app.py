@@ -4,31 +4,54 @@ import io
 from fastapi import FastAPI, Security, HTTPException, Depends, Body, Request, File, UploadFile, Form
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse, JSONResponse
 from starlette.status import HTTP_403_FORBIDDEN
 from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, function_tool
+
+# Load environment variables from .env file before the app modules read their settings
+load_dotenv()
+
+from agents import Agent, Runner, function_tool
 import asyncio
-from typing import List, Dict, Optional, Any
+import time
+from typing import List, Dict, Optional, Any, Tuple, Union
 from pydantic import BaseModel
 import os
-from unstructured.partition.pdf import partition_pdf
-from unstructured.partition.docx import partition_docx
 import tempfile
-import PyPDF2
-from PyPDF2 import PdfReader, PdfWriter
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-import html
-import re
+import base64
+import binascii
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from openai.types.responses import ResponseTextDeltaEvent
+from app.sessions import ConversationSession, create_session_store, new_session_id
+from app.worker_pool import BoundedWorkerPool, PoolSaturatedError
+from app import document_parsing
+from app.document_cache import create_document_cache, make_cache_key
+from app.uploads import MAX_UPLOAD_BYTES, UploadSizeLimitMiddleware, copy_upload, upload_size
+from app.logging_setup import configure_logging, log_payload, redact, get_log_levels, set_log_level, set_payload_sample_rate
+from app.metrics import REGISTRY, EVENT_LOOP_LAG_INTERVAL_SECONDS, PRE_ROUTER_DECISIONS, RESPONSE_CACHE_LOOKUPS, MetricsMiddleware, MetricsRunHooks, monitor_event_loop_lag, stage_timer, mark_request_parsed, record_token_usage, cached_tokens, usage_summary
+from app.agent_graph import AgentGraph, AgentGraphStore, PROMPT_DIR, PROMPT_WATCH_INTERVAL_SECONDS
+from app.pre_router import PRE_ROUTER_LOG_TEXT, RouteDecision, create_pre_router
+from app.response_cache import CachedResponse, create_response_cache
+from app.history import HistoryCompactor, transcript
+from app.resilience import LLM_AGENT_DEADLINE_SECONDS, LLM_SUMMARY_DEADLINE_SECONDS, LLM_SUMMARY_HEDGE_SECONDS, SUMMARY_RETRY_POLICY, deadline, deadline_budget, hedged, circuit_states, user_error_message
+from app.debug_artifacts import create_debug_artifact_store
+from app.openai_client import start_openai_client, close_openai_client
+from app.model_registry import MODEL_ROLES, load_model_registry, describe_model
+from app.pdf_merge import AttachmentError, merge_attachments, write_pdf, file_size, iter_file_chunks
+from app.report_jobs import create_report_job_manager, report_job_id, is_valid_job_id
+from app.startup import STARTUP_PREWARM, mark, startup_report, import_lazily, prewarm, import_time_report
 
 class Message(BaseModel):
     role: str
     content: str
 
+class SessionTurnRequest(BaseModel):
+    session_id: Optional[str] = None  # Omit to start a new session
+    new_message: Message
+
 class PDFFile(BaseModel):
     filename: str
     content: str  # Base64 encoded PDF content (will be decoded before processing)
@@ -38,485 +61,337 @@ class FinalizeReportRequest(BaseModel):
     pdf_files: List[PDFFile]
     title: Optional[str] = None
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler()  # Ensure logs are output to the console
-    ]
-)
+class LogLevelRequest(BaseModel):
+    logger: str = "root"
+    level: Optional[str] = None
+    payload_sample_rate: Optional[float] = None
+
+# Configure logging (JSON records written by a background thread, see LOG_* in the Readme)
+configure_logging()
 
 # Create logger instance
 logger = logging.getLogger(__name__)
 
-# Run local AI model (Ollama)
-# model = OpenAIChatCompletionsModel( 
-#     model="mistral-small:22b-instruct-2409-fp16",
-#     openai_client=AsyncOpenAI(base_url="http://localhost:11434/v1", api_key='ollama'),
-# )
+# Model and endpoint per agent role (see MODEL_CONFIG in the Readme)
+model_registry = load_model_registry()
+
+# Agents, rebuilt when the prompt files change (see PROMPT_WATCH_INTERVAL_SECONDS)
+agent_graph = AgentGraphStore(model_registry)
 
-modelname = 'gpt-4o'
+# Conversation sessions for /agent
+session_store = create_session_store()
 
-global triage_agent
-triage_agent = None
-global trafficlaw_agent
-trafficlaw_agent = None
-global other_agent
-other_agent = None
-global summary_agent
-summary_agent = None
-global collection_agent
-collection_agent = None
+# Sends clear-cut conversations straight to a specialist (see PRE_ROUTER_* in the Readme)
+pre_router = create_pre_router()
 
-def load_prompt(filename: str, default: str) -> str:
+def user_texts(input_items: List[Dict[str, Any]]) -> List[str]:
+    return [
+        item["content"] for item in input_items
+        if item.get("role") == "user" and isinstance(item.get("content"), str)
+    ]
+
+def select_starting_agent(graph: AgentGraph, input_items: List[Dict[str, Any]]):
     """
-    Load a prompt from a file.
+    Pick the agent a conversation starts with: a specialist if the pre-router
+    is confident (and not in shadow mode), the triage agent otherwise.
+
+    Returns:
+        The agent and the routing decision
     """
-    txtfile = filename + ".txt"
-    mdfile = filename + ".md"
-    
-    logger.info(f"Attempting to load prompt from {filename} (trying MD then TXT)")
-    
-    try:
-        with open(mdfile, "r", encoding="utf-8") as file:
-            content = file.read().strip()
-            logger.info(f"Successfully loaded prompt from {mdfile}")
-            logger.info(f"===== PROMPT FROM {mdfile} - BEGIN =====")
-            logger.info(content)
-            logger.info(f"===== PROMPT FROM {mdfile} - END =====")
-            return content
-    except FileNotFoundError:
-        logger.warning(f"{mdfile} not found. Trying {txtfile}.")
-        try:
-            with open(txtfile, "r", encoding="utf-8") as file:
-                content = file.read().strip()
-                logger.info(f"Successfully loaded prompt from {txtfile}")
-                logger.info(f"===== PROMPT FROM {txtfile} - BEGIN =====")
-                logger.info(content)
-                logger.info(f"===== PROMPT FROM {txtfile} - END =====")
-                return content
-        except FileNotFoundError:
-            logger.warning(f"Both {mdfile} and {txtfile} not found. Using hardcoded prompt as fallback.")
-            logger.info(f"===== DEFAULT PROMPT - BEGIN =====")
-            logger.info(default)
-            logger.info(f"===== DEFAULT PROMPT - END =====")
-            return default
-
-
-# Load agents
-def load_agents():
-    global triage_agent, trafficlaw_agent, other_agent, summary_agent, collection_agent  # Include collection_agent in globals
-
-    logger.info("Starting agent loading process")
-    
-    # Prompts with full path for better debugging
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    prompt_dir = os.path.join(base_path, "prompts")
-    
-    logger.info(f"Using prompt directory: {prompt_dir}")
-    
-    # Triage prompt
-    triage_prompt_path = os.path.join(prompt_dir, "triage_prompt")
-    triage_prompt = load_prompt(triage_prompt_path, """
-    Frage den Benutzer, um was es geht, und versuche den Fall dem korrekten Agenten zuzuordnen.
-    Leite nur an den Agenten weiter, wenn du sicher bist, dass es sich um einen Fall handelt, der von einem Agenten bearbeitet werden kann.
-    Du darfst keine Fragen beantworten.
-    """)
-    logger.info(f"Loaded triage prompt with length: {len(triage_prompt)} characters")
-
-    # Road traffic prompt
-    road_traffic_prompt_path = os.path.join(prompt_dir, "road_traffic_prompt")
-    road_traffic_prompt = load_prompt(road_traffic_prompt_path, """
-        Antworte mit "SORRY, Prompt nicht gefunden" und gib den Grund an, warum du nicht helfen kannst.
-        """)
-    logger.info(f"Loaded road traffic prompt with length: {len(road_traffic_prompt)} characters")
-    
-    # Create road traffic agent
-    logger.info("Creating Road Traffic Law agent")
-    trafficlaw_agent = Agent(
-        name="Road Traffic Law agent (Speeding)",
-        instructions=road_traffic_prompt,
-        model=modelname
+    decision = pre_router.route(user_texts(input_items))
+    agent = graph.get_role(decision.role) if decision.routed else None
+    outcome = "routed" if agent else ("shadow" if decision.shadow else "triage")
+    PRE_ROUTER_DECISIONS.inc(
+        decision=outcome,
+        role=decision.role if outcome != "triage" else "triage",
+        method=decision.method
     )
-    
-    # Debt collection prompt
-    debt_collection_prompt_path = os.path.join(prompt_dir, "betreibung_prompt")
-    debt_collection_prompt = load_prompt(debt_collection_prompt_path, """
-        Antworte mit "SORRY, Prompt nicht gefunden" und gib den Grund an, warum du nicht helfen kannst.
-        """)
-    logger.info(f"Loaded debt collection prompt with length: {len(debt_collection_prompt)} characters")
-    
-    # Create debt collection agent
-    logger.info("Creating Debt Collection agent")
-    collection_agent = Agent(
-        name="Debt collection agent",
-        instructions=debt_collection_prompt,
-        model=modelname
+    shadow = f" (shadow: would route to {decision.role})" if decision.shadow else ""
+    logger.info(
+        f"Pre-router: {agent.name if agent else 'triage'}{shadow} (confidence {decision.confidence:.2f})",
+        extra=decision.log_fields()
     )
+    return agent or graph.triage, decision
 
-    # Create other agent with hardcoded instructions
-    logger.info("Creating Other Legal Field agent")
-    other_agent = Agent(
-        name="Other legal field agent (MISC)",
-        instructions="You always respond with 'Sorry, I can only help with Road Traffic Law.'",
-        model=modelname
-    )
+def log_routing_outcome(graph: AgentGraph, decision: RouteDecision, input_items: List[Dict[str, Any]], last_agent: Agent) -> None:
+    """
+    Log which agent answered, next to the routing decision, for tuning the rules
+    and training the pre-router model.
+    """
+    fields = {**decision.log_fields(), "final_agent": last_agent.name, "final_role": graph.role_of(last_agent)}
+    if PRE_ROUTER_LOG_TEXT:
+        fields["route_text"] = redact(" ".join(user_texts(input_items)))[:2000]
+    logger.info("Routing outcome", extra=fields)
 
-    # Create summary agent with hardcoded instructions
-    logger.info("Creating Summary agent")
-    summary_agent = Agent(
-        name="Summary agent",
-        instructions="Wenn alle Informationen vorliegen, fasse die Informationen zusammen und gib sie zurück und bedanke dich beim Benutzer für die Informationen. Wir werden die Daten nun an die/den zuständige/n Anwätin/Anwalt weiterleiten.",
-        model=modelname
-    )
-    
-    # Create triage agent with all handoffs
-    logger.info("Creating Triage agent with handoffs to other agents")
-    triage_agent = Agent(
-        name="Triage agent",
-        instructions=triage_prompt,
-        handoffs=[other_agent, trafficlaw_agent, collection_agent, summary_agent],
-        model=modelname
-    )
-    
-    logger.info("All agents loaded successfully")
-    
-# Load agents
-load_agents()
+# Exact-match answers of deterministic agents (see RESPONSE_CACHE_* in the Readme),
+# dropped whenever new prompts are published
+response_cache = create_response_cache()
+agent_graph.on_publish(lambda graph: response_cache.clear())
 
-# Function to create a PDF cover page using ReportLab
-def create_cover_page(title, content, merger):
+def lookup_response(graph: AgentGraph, starting_agent: Agent, input_items: List[Dict[str, Any]]) -> Tuple[Optional[str], Optional[CachedResponse]]:
     """
-    Create a cover page using ReportLab
-    
+    Look up the answer to a conversation if the starting agent opted in to
+    response caching.
+
+    Returns:
+        The cache key (None if the agent is not cached) and the cached response, if any
+    """
+    role = graph.role_of(starting_agent)
+    if not response_cache.cacheable(role):
+        return None, None
+    key = response_cache.key(graph.fingerprint, role, input_items)
+    cached = response_cache.get(key)
+    RESPONSE_CACHE_LOOKUPS.inc(agent=starting_agent.name, result="hit" if cached else "miss")
+    if cached:
+        logger.info(f"Response cache hit for {starting_agent.name}", extra={"agent": cached.agent})
+    return key, cached
+
+def store_response(graph: AgentGraph, key: Optional[str], output: str, last_agent: Agent) -> None:
+    """
+    Cache an answer, unless the run handed off to an agent that is not cached.
+    """
+    if key is not None and response_cache.cacheable(graph.role_of(last_agent)):
+        response_cache.put(key, output, last_agent.name)
+
+async def summarize_history(previous: Optional[str], items: List[Dict[str, Any]]) -> str:
+    """
+    Extend the rolling summary of a long conversation with older items. Runs in
+    the background; exceptions are handled by the compactor.
+    """
+    prompt = """
+    Du fasst den älteren Teil eines Gesprächs zwischen einem Mandanten und einem juristischen Assistenten zusammen.
+    Die Zusammenfassung ersetzt diese Nachrichten im weiteren Gespräch. Übernimm alle Fakten, die für den Fall wichtig sind:
+    Daten, Orte, Beträge, Geschwindigkeiten, Fristen, erhaltene Dokumente und die Antworten des Mandanten auf gestellte Fragen.
+    Lass Begrüssungen und Wiederholungen weg. Schreibe sachlich in Stichpunkten.
+    """
+    content = f"Bisherige Zusammenfassung:\n{previous}\n\nNeue Nachrichten:\n{transcript(items)}" if previous else transcript(items)
+
+    async def create_summary(client, model: str):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": prompt}, {"role": "user", "content": content}],
+            max_tokens=600
+        )
+        return response, model
+
+    with stage_timer("history_summary_call", agent="history_summary"):
+        async with deadline(LLM_SUMMARY_DEADLINE_SECONDS):
+            response, summary_model = await model_registry.call("history_summary", create_summary, SUMMARY_RETRY_POLICY)
+    if response.usage:
+        record_token_usage(
+            "history_summary",
+            summary_model,
+            response.usage.prompt_tokens,
+            response.usage.completion_tokens,
+            cached_tokens(response.usage.prompt_tokens_details)
+        )
+    return response.choices[0].message.content.strip()
+
+# Keeps long conversations within HISTORY_TOKEN_BUDGET (see "Long Conversations" in the Readme)
+history_compactor = HistoryCompactor(summarize_history)
+
+def compact_history(input_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    The model input for a conversation: unchanged within the token budget,
+    with older turns summarized and long documents excerpted above it.
+    """
+    result = history_compactor.compact(input_items)
+    if result.compacted or result.summary_pending:
+        logger.info(
+            f"Compacted history from {result.original_tokens} to {result.tokens} tokens",
+            extra=result.log_fields()
+        )
+    return result.items
+
+# Run Agent
+async def run_agent(starting_agent: Agent, input_items: List[Dict[str, Any]]):
+    """
+    Run an agent on the given input items and log the execution.
+
     Args:
-        title: The title for the cover page
-        content: Text content for the cover page
-        merger: PyPDF2.PdfMerger object to add the cover page to
+        starting_agent: The agent the run starts with (triage or a resumed specialist)
+        input_items: Conversation items in the Agents SDK input format
+
+    Returns:
+        The RunResult of the run. Exceptions from the runner are propagated.
     """
-    # Create a BytesIO object to store the PDF
-    buffer = io.BytesIO()
-    
-    # Create the PDF document using ReportLab
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=72,
-        leftMargin=72,
-        topMargin=36,
-        bottomMargin=72
-    )
-    
-    # Create styles
-    styles = getSampleStyleSheet()
-    
-    # Custom styles for the document
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Title'],
-        fontSize=18,
-        alignment=1,  # Center alignment
-        spaceAfter=15,
-        textColor=colors.darkblue
+    logger.info(
+        f"Running {starting_agent.name} with {len(input_items)} items",
+        extra={"agent": starting_agent.name, "handoffs": [agent.name for agent in starting_agent.handoffs]}
     )
+    log_payload(logger, "Agent input", input_items, agent=starting_agent.name)
     
-    header_style = ParagraphStyle(
-        'Header',
-        parent=styles['Heading1'],
-        fontSize=14,
-        spaceBefore=20,
-        spaceAfter=10,
-        textColor=colors.darkblue,
-        borderWidth=0,
-        borderPadding=5,
-        borderColor=colors.lightgrey,
-        borderRadius=2
-    )
+    # Use the Runner to execute the agent, model calls are retried within the deadline
+    async with deadline(LLM_AGENT_DEADLINE_SECONDS):
+        result = await Runner.run(starting_agent, input=compact_history(input_items), hooks=MetricsRunHooks())
     
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=10,
-        leading=14,
-        spaceAfter=5
+    if result.last_agent is not starting_agent:
+        logger.info(f"Handoff: {starting_agent.name} -> {result.last_agent.name}")
+    logger.info(
+        f"Agent execution completed, final output length: {len(result.final_output)}",
+        extra={"agent": result.last_agent.name, **usage_summary(result.context_wrapper.usage)}
     )
+    log_payload(logger, "Agent output", result.final_output, agent=result.last_agent.name)
     
-    # Container for all flowable elements
-    elements = []
-    
-    # Add the title with better formatting (safely escaped for XML)
-    safe_title = html.escape(title)
-    elements.append(Paragraph(safe_title, title_style))
-    elements.append(Spacer(1, 0.25*inch))
-    
-    # Process content by looking for specific sections
-    # Extract main sections from the content
-    try:
-        # Use more robust section detection
-        content_parts = {}
-        current_section = "INTRO"
-        content_parts[current_section] = []
-        
-        # Split by lines first to handle various formats
-        lines = content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Detect section headers (all uppercase with colon or just all uppercase)
-            if (line.upper() == line and (':' in line or line.endswith(':'))) or line.strip() in ['CASE SUMMARY', 'ATTACHED DOCUMENTS', 'CONVERSATION HISTORY']:
-                current_section = line.rstrip(':')
-                content_parts[current_section] = []
-            else:
-                content_parts[current_section].append(line)
-        
-        # Now process each section with appropriate formatting
-        for section, lines in content_parts.items():
-            if section != "INTRO":  # Skip the intro section if it's empty
-                # Add the section header
-                elements.append(Paragraph(section, header_style))
-                
-                # Special handling for different sections
-                if "ATTACHED DOCUMENTS" in section:
-                    # Create a simple list of documents
-                    for line in lines:
-                        if line.strip():
-                            # Format document lines as bullets with safe text
-                            safe_line = html.escape(line)
-                            elements.append(Paragraph("• " + safe_line, normal_style))
-                elif "CONVERSATION HISTORY" in section:
-                    # Format conversation with role highlighting
-                    current_role = None
-                    message_text = []
-                    
-                    # Helper function to escape XML/HTML special characters
-                    def escape_xml(text):
-                        # Escape XML special chars but preserve <br/> tags
-                        text = re.sub(r'<(?!br/?>)', '&lt;', text)
-                        text = re.sub(r'(?<!<br/)>', '&gt;', text)
-                        text = text.replace('&', '&amp;').replace('&amp;lt;', '&lt;').replace('&amp;gt;', '&gt;')
-                        return text
-                    
-                    for line in lines:
-                        # Check if a line starts with a role indicator
-                        if line.startswith("Client:") or line.startswith("Legal Assistant:"):
-                            # If we have accumulated text from a previous role, add it
-                            if current_role and message_text:
-                                # Process message text for XML safety
-                                safe_messages = [escape_xml(msg) for msg in message_text]
-                                msg_text = "<br/>".join(safe_messages)
-                                
-                                # Safe role name
-                                safe_role = html.escape(current_role)
-                                
-                                # Add the role as a bold header
-                                elements.append(Paragraph(f"<b>{safe_role}</b>", normal_style))
-                                # Add the message content
-                                elements.append(Paragraph(msg_text, normal_style))
-                                elements.append(Spacer(1, 0.1*inch))
-                                message_text = []
-                            
-                            # Update current role
-                            current_role = line
-                        else:
-                            # Accumulate message text
-                            if current_role:  # Only add if we have a role
-                                message_text.append(line)
-                    
-                    # Add the last message if there is one
-                    if current_role and message_text:
-                        # Process message text for XML safety
-                        safe_messages = [escape_xml(msg) for msg in message_text]
-                        msg_text = "<br/>".join(safe_messages)
-                        
-                        # Safe role name
-                        safe_role = html.escape(current_role)
-                        
-                        # Add the role as a bold header
-                        elements.append(Paragraph(f"<b>{safe_role}</b>", normal_style))
-                        # Add the message content
-                        elements.append(Paragraph(msg_text, normal_style))
-                else:
-                    # Default handling for other sections (with safe escaping)
-                    combined_text = " ".join(lines)
-                    safe_text = html.escape(combined_text)
-                    elements.append(Paragraph(safe_text, normal_style))
-                
-                elements.append(Spacer(1, 0.15*inch))
-    except Exception as e:
-        # Fallback method if the section extraction fails
-        logger.error(f"Error formatting cover page content: {str(e)}")
-        
-        # Simple fallback - just add the content as is but safely escaped
-        elements.append(Paragraph("Content:", header_style))
-        
-        # Function to escape content safely for XML
-        def safe_escape(text):
-            return html.escape(text).replace('\n', '<br/>')
-        
-        # Add each line as a separate paragraph with proper escaping
-        for line in content.split('\n'):
-            if line.strip():
-                elements.append(Paragraph(safe_escape(line), normal_style))
-    
-    # Build the PDF
-    try:
-        doc.build(elements)
-        
-        # Get the PDF data from the BytesIO object
-        buffer.seek(0)
-        
-        # Add the cover page to the merger
-        merger.append(buffer)
-    except Exception as e:
-        logger.error(f"Error building cover page: {str(e)}")
-        
-        # Emergency fallback - create a very simple cover page
-        # Create new buffer and document
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        
-        # Safe version of everything
-        try:
-            safe_title = html.escape(title)
-            
-            # Create the absolute simplest document possible
-            elements = [
-                Paragraph(safe_title, styles['Title']),
-                Spacer(1, 0.25*inch),
-                Paragraph("Error creating formatted cover page. Please see the attached documents.", styles['Normal'])
-            ]
-            
-            # Try to build it
-            doc.build(elements)
-            buffer.seek(0)
-            merger.append(buffer)
-            
-            logger.info("Successfully created emergency fallback cover page")
-        except Exception as final_error:
-            # Absolute last resort - add a blank page with no content
-            logger.error(f"Emergency fallback failed: {str(final_error)}. Adding blank page instead.")
-            blank_writer = PyPDF2.PdfWriter()
-            blank_writer.add_blank_page(width=612, height=792)  # US Letter size
-            blank_buffer = io.BytesIO()
-            blank_writer.write(blank_buffer)
-            blank_buffer.seek(0)
-            merger.append(blank_buffer)
+    return result
 
-# Run Agent
 async def main(message_history: List[Message]):
     # Convert Message objects to dictionaries
     formatted_messages = [{"role": msg.role, "content": msg.content} for msg in message_history]
     
-    logger.info("=" * 80)
-    logger.info("STARTING NEW AGENT EXECUTION SESSION")
-    logger.info("=" * 80)
-    logger.info(f"Message history contains {len(formatted_messages)} messages")
-    
-    # Log the first few messages for context
-    if formatted_messages:
-        logger.info("First message content:")
-        first_msg = formatted_messages[0]
-        logger.info(f"Role: {first_msg['role']}")
-        logger.info(f"Content: {first_msg['content'][:200]}...")
-    
-    logger.info("-" * 80)
-    logger.info("AGENT CONFIGURATION")
-    logger.info("-" * 80)
-    logger.info(f"Triage agent name: {triage_agent.name}")
-    logger.info(f"Triage agent model: {triage_agent.model}")
-    logger.info(f"Triage agent has {len(triage_agent.handoffs)} handoffs")
-    
-    # Log handoff agents
-    logger.info("-" * 80)
-    logger.info("HANDOFF AGENTS AVAILABLE")
-    logger.info("-" * 80)
-    for i, handoff_agent in enumerate(triage_agent.handoffs):
-        logger.info(f"Handoff agent {i+1}: {handoff_agent.name}")
-        logger.info(f"Model: {handoff_agent.model}")
-        
-        # Get the actual full instructions for each agent
-        agent_instructions = handoff_agent.instructions
-        logger.info(f"===== AGENT {handoff_agent.name} INSTRUCTIONS - BEGIN =====")
-        logger.info(agent_instructions)
-        logger.info(f"===== AGENT {handoff_agent.name} INSTRUCTIONS - END =====")
-    
-    # Run the agent
-    logger.info("-" * 80)
-    logger.info("EXECUTING AGENT")
-    logger.info("-" * 80)
-    logger.info(f"Running triage agent with {len(formatted_messages)} messages")
-    
     try:
-        # Use the Runner to execute the agent
-        result = await Runner.run(triage_agent, input=formatted_messages)
-        
-        # Log the result details
-        logger.info("-" * 80)
-        logger.info("AGENT EXECUTION COMPLETED")
-        logger.info("-" * 80)
-        logger.info(f"Final output length: {len(result.final_output)}")
-        
-        # Extract full agent trace if available
-        if hasattr(result, 'trace') and result.trace:
-            logger.info("-" * 80)
-            logger.info("AGENT EXECUTION TRACE")
-            logger.info("-" * 80)
-            try:
-                logger.info(f"Trace contains {len(result.trace)} events")
-                for i, event in enumerate(result.trace):
-                    event_type = event.get('type', 'unknown')
-                    logger.info(f"Trace event {i+1}: {event_type}")
-                    
-                    # Log special events in more detail
-                    if event_type == 'handoff':
-                        from_agent = event.get('from_agent', 'Unknown')
-                        to_agent = event.get('to_agent', 'Unknown')
-                        logger.info(f"HANDOFF: {from_agent} -> {to_agent}")
-            except Exception as trace_err:
-                logger.error(f"Error processing trace: {str(trace_err)}")
-        
-        # Check if a handoff occurred and log details
-        if hasattr(result, 'handoff_history') and result.handoff_history:
-            logger.info("-" * 80)
-            logger.info("HANDOFF HISTORY DETECTED")
-            logger.info("-" * 80)
-            
-            for i, handoff in enumerate(result.handoff_history):
-                from_agent = handoff.get('from_agent', 'Unknown')
-                to_agent = handoff.get('to_agent', 'Unknown')
-                reason = handoff.get('reason', 'No reason provided')
-                
-                logger.info(f"Handoff {i+1}: {from_agent} -> {to_agent}")
-                logger.info(f"Reason: {reason}")
-                
-                # Try to identify which agent in our list was used
-                for agent in triage_agent.handoffs:
-                    if agent.name == to_agent:
-                        logger.info(f"Matched to configured agent: {agent.name}")
-                        logger.info(f"Using instructions starting with: {agent.instructions[:100]}...")
-        else:
-            logger.info("No handoffs occurred during this execution")
-        
-        # Log the full final output
-        logger.info("-" * 80)
-        logger.info("FINAL AGENT OUTPUT")
-        logger.info("-" * 80)
-        logger.info(result.final_output)
-        logger.info("-" * 80)
-        
+        graph = agent_graph.current
+        starting_agent, decision = select_starting_agent(graph, formatted_messages)
+        cache_key, cached = lookup_response(graph, starting_agent, formatted_messages)
+        if cached:
+            return cached.output
+        result = await run_agent(starting_agent, formatted_messages)
+        log_routing_outcome(graph, decision, formatted_messages, result.last_agent)
+        store_response(graph, cache_key, result.final_output, result.last_agent)
         return result.final_output
         
     except Exception as e:
-        logger.error(f"Error running agent: {str(e)}")
+        logger.error(f"Error running agent: {type(e).__name__}: {str(e)}")
         # Return a simple error message to the user
-        return "Sorry, there was an error processing your request. Please try again."
+        return user_error_message(e)
 
-# Load environment variables from .env file
-load_dotenv()
+async def run_session_turn(turn: SessionTurnRequest) -> Dict[str, Any]:
+    """
+    Run one turn of a server-side session. Only the new message is sent by the
+    client; the history and the agent that answered last come from the session store.
+    """
+    session = await asyncio.to_thread(session_store.get, turn.session_id) if turn.session_id else None
+    if session is None:
+        if turn.session_id:
+            logger.warning(f"Session {turn.session_id} not found or expired, starting a new conversation")
+        session = ConversationSession(session_id=turn.session_id or new_session_id())
+
+    # Resume at the specialist that answered last instead of going through triage
+    # again; turns after triage, "other" or "summary" are routed like a new conversation
+    graph = agent_graph.current
+    input_items = session.items + [{"role": turn.new_message.role, "content": turn.new_message.content}]
+    starting_agent = graph.resumable_agent(session.last_agent)
+    decision = None
+    if starting_agent is None:
+        starting_agent, decision = select_starting_agent(graph, input_items)
+    logger.info(f"Session {session.session_id}: resuming at {starting_agent.name} with {len(input_items)} items")
+
+    cache_key, cached = lookup_response(graph, starting_agent, input_items)
+    if cached:
+        session.items = input_items + [{"role": "assistant", "content": cached.output}]
+        session.last_agent = cached.agent
+        await asyncio.to_thread(session_store.save, session)
+        return {"session_id": session.session_id, "output": cached.output, "agent": cached.agent}
+
+    try:
+        result = await run_agent(starting_agent, input_items)
+    except Exception as e:
+        logger.error(f"Error running agent for session {session.session_id}: {type(e).__name__}: {str(e)}")
+        return {
+            "session_id": session.session_id,
+            "output": user_error_message(e),
+            "agent": starting_agent.name
+        }
+
+    if decision is not None:
+        log_routing_outcome(graph, decision, input_items, result.last_agent)
+    store_response(graph, cache_key, result.final_output, result.last_agent)
+    # The full history, not the compacted model input
+    session.items = input_items + [item.to_input_item() for item in result.new_items]
+    session.last_agent = result.last_agent.name
+    await asyncio.to_thread(session_store.save, session)
+
+    return {
+        "session_id": session.session_id,
+        "output": result.final_output,
+        "agent": result.last_agent.name
+    }
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """
+    Format a single Server-Sent Event frame.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# Run Agent (streaming)
+async def main_streamed(message_history: List[Message]):
+    """
+    Run the triage agent with the streamed runner and yield Server-Sent Events.
+
+    Emits "agent" (initial agent), "delta" (token deltas), "handoff" (agent changes)
+    and a final "done" event with the complete output. Errors are sent as an "error"
+    event because the HTTP status has already been sent when streaming starts.
+    """
+    formatted_messages = [{"role": msg.role, "content": msg.content} for msg in message_history]
+
+    graph = agent_graph.current
+    current_agent, decision = select_starting_agent(graph, formatted_messages)
+    logger.info(f"Running {current_agent.name} (streamed) with {len(formatted_messages)} messages")
+    yield format_sse("agent", {"agent": current_agent.name})
+
+    cache_key, cached = lookup_response(graph, current_agent, formatted_messages)
+    if cached:
+        if cached.agent != current_agent.name:
+            yield format_sse("handoff", {"from_agent": current_agent.name, "to_agent": cached.agent})
+        yield format_sse("delta", {"delta": cached.output})
+        yield format_sse("done", {"output": cached.output, "agent": cached.agent})
+        return
+
+    result = None
+    try:
+        # The runner's task inherits the deadline, which bounds each model call
+        # and its retries. A timeout scope must not span the yields below (it
+        # would cancel whatever the consumer is doing), so waiting for the next
+        # event is bounded separately.
+        with deadline_budget(LLM_AGENT_DEADLINE_SECONDS) as expires:
+            result = Runner.run_streamed(current_agent, input=compact_history(formatted_messages), hooks=MetricsRunHooks())
+
+        events = result.stream_events()
+        while True:
+            try:
+                event = await asyncio.wait_for(anext(events), timeout=max(0.0, expires - time.monotonic()))
+            except StopAsyncIteration:
+                break
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                if event.data.delta:
+                    yield format_sse("delta", {"delta": event.data.delta})
+            elif event.type == "agent_updated_stream_event":
+                if event.new_agent.name != current_agent.name:
+                    logger.info(f"HANDOFF: {current_agent.name} -> {event.new_agent.name}")
+                    yield format_sse("handoff", {
+                        "from_agent": current_agent.name,
+                        "to_agent": event.new_agent.name
+                    })
+                current_agent = event.new_agent
+
+        final_output = result.final_output if isinstance(result.final_output, str) else str(result.final_output)
+        logger.info(
+            f"Streamed agent execution completed, final output length: {len(final_output)}",
+            extra={"agent": result.last_agent.name, **usage_summary(result.context_wrapper.usage)}
+        )
+        log_routing_outcome(graph, decision, formatted_messages, result.last_agent)
+        store_response(graph, cache_key, final_output, result.last_agent)
+
+        yield format_sse("done", {
+            "output": final_output,
+            "agent": result.last_agent.name
+        })
+    except TimeoutError as e:
+        logger.error(f"Streamed agent run exceeded its deadline of {LLM_AGENT_DEADLINE_SECONDS}s")
+        yield format_sse("error", {
+            "message": user_error_message(e)
+        })
+    except Exception as e:
+        logger.error(f"Error running agent (streamed): {type(e).__name__}: {str(e)}")
+        yield format_sse("error", {
+            "message": user_error_message(e)
+        })
+    finally:
+        # Also reached when the client disconnects: the generator is closed with
+        # GeneratorExit or cancelled, which the handlers above don't catch, and
+        # the run must not go on in the background
+        if result is not None and not result.is_complete:
+            result.cancel()
 
 API_KEY = os.environ.get("CLIENT_API_KEY")
 security = HTTPBearer(auto_error=False)
@@ -540,7 +415,91 @@ async def get_api_key(credentials: HTTPAuthorizationCredentials = Security(secur
         )
     return credentials.credentials
 
-app = FastAPI()
+# Document parsing runs in worker processes so partition_pdf/OCR can't block the event loop.
+# Workers are started by a forkserver, not forked from this process: forking a
+# process that runs threads (log writer, thread pools) can deadlock on locks held
+# at fork time. The forkserver preloads the parser module, which doesn't import
+# the application (see app/__init__.py).
+parser_mp_context = multiprocessing.get_context("forkserver")
+parser_mp_context.set_forkserver_preload(["app.document_parsing"])
+PARSER_WORKERS = int(os.environ.get("PARSER_WORKERS", "2"))
+document_parser_pool = BoundedWorkerPool(
+    name="document-parser",
+    executor_factory=lambda: ProcessPoolExecutor(
+        max_workers=PARSER_WORKERS,
+        mp_context=parser_mp_context,
+        initializer=document_parsing.init_worker
+    ),
+    max_concurrency=PARSER_WORKERS,
+    max_queue=int(os.environ.get("PARSER_MAX_QUEUE", "8")),
+    timeout_seconds=float(os.environ.get("PARSER_TIMEOUT_SECONDS", "120")),
+    warmup=document_parsing.warm_up,
+    recycle_on_timeout=True
+)
+
+# Report assembly (PDF merge, cover page, serialization) runs in a bounded
+# thread pool so a large report doesn't block the event loop for chat requests
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "2"))
+report_pool = BoundedWorkerPool(
+    name="report",
+    executor_factory=lambda: ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report"),
+    max_concurrency=REPORT_WORKERS,
+    max_queue=int(os.environ.get("REPORT_MAX_QUEUE", "8")),
+    timeout_seconds=float(os.environ.get("REPORT_TIMEOUT_SECONDS", "120"))
+)
+
+def warm_up_cover_page() -> None:
+    from app.cover_page import cover_styles
+    cover_styles()
+
+# Cache of parsed documents, keyed by content hash and parser strategy
+document_cache = create_document_cache()
+
+# Opt-in store for cover page text of recent reports (DEBUG_ARTIFACTS)
+debug_artifacts = create_debug_artifact_store()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_openai_client()
+    document_parser_pool.start()
+    report_pool.start()
+    prompt_watcher = None
+    if PROMPT_WATCH_INTERVAL_SECONDS > 0:
+        prompt_watcher = asyncio.create_task(agent_graph.watch(PROMPT_WATCH_INTERVAL_SECONDS))
+    report_job_cleanup = asyncio.create_task(report_jobs.cleanup_loop())
+    lag_monitor = None
+    if EVENT_LOOP_LAG_INTERVAL_SECONDS > 0:
+        lag_monitor = asyncio.create_task(monitor_event_loop_lag(EVENT_LOOP_LAG_INTERVAL_SECONDS))
+    mark("startup_complete")
+    # Load the report stack once the server accepts requests, not before
+    prewarm_task = None
+    if STARTUP_PREWARM:
+        prewarm_task = asyncio.create_task(asyncio.to_thread(prewarm, ["PyPDF2", "app.cover_page"], [warm_up_cover_page]))
+    yield
+    if prewarm_task:
+        prewarm_task.cancel()
+    if lag_monitor:
+        lag_monitor.cancel()
+    if prompt_watcher:
+        prompt_watcher.cancel()
+    report_job_cleanup.cancel()
+    await report_jobs.shutdown()
+    await history_compactor.shutdown()
+    document_parser_pool.shutdown()
+    report_pool.shutdown()
+    await model_registry.close()
+    await close_openai_client()
+    session_store.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Enforce the upload size limit while request bodies are received. Added before
+# CORS so CORS wraps it and its 413 responses carry the CORS headers
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES,
+    paths=["/parse-document", "/finalize-report", "/finalize-report-form", "/reports"]
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -551,6 +510,9 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+# Request and stage timings for /metrics (outermost, so it sees the full request)
+app.add_middleware(MetricsMiddleware)
+
 @app.get("/")
 async def root():
     return {"message": "Hello world!"}
@@ -563,57 +525,65 @@ async def secured_endpoint(api_key: str = Depends(get_api_key)):
 async def agent_endpoint(
     request: Request,
     api_key: str = Depends(get_api_key), 
-    message_history: List[Message] = Body(...)
+    payload: Union[List[Message], SessionTurnRequest] = Body(...)
 ):  
-    # Log the raw request body for debugging
-    body = await request.body()
-    logger.info("RAW REQUEST BODY:")
-    logger.info(body.decode())
-    logger.info("#" * 50)
-    
-    logger.info("Received message history:")
-    logger.info("#" * 50)
-    logger.info(message_history)
-    logger.info("#" * 50)
-    for message in message_history:
-        logger.info(f"{message.role}: {message.content}")
-    logger.info("#" * 50)
+    """
+    Run the agents on a conversation. Accepts either the full message history
+    (returns the answer as a string) or {session_id, new_message} for a
+    server-side session (returns session_id, output and the answering agent).
+    """
+    mark_request_parsed()
+    if isinstance(payload, SessionTurnRequest):
+        logger.info(f"Received session turn for session {payload.session_id or '(new)'}")
+        return await run_session_turn(payload)
+
+    message_history = payload
+
+    logger.info(f"Received agent request with {len(message_history)} messages")
+    log_payload(logger, "Message history", [message.model_dump() for message in message_history])
     return await main(message_history)
 
+@app.post("/agent/stream")
+async def agent_stream_endpoint(
+    api_key: str = Depends(get_api_key),
+    message_history: List[Message] = Body(...)
+):
+    """
+    Streaming variant of /agent. Returns Server-Sent Events with token deltas,
+    handoff events and a final "done" event containing the full answer.
+    """
+    mark_request_parsed()
+    logger.info(f"Received streaming agent request with {len(message_history)} messages")
+    return StreamingResponse(
+        main_streamed(message_history),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.post("/reload-prompts")
-async def reload_prompts(api_key: str = Depends(get_api_key)):
+async def reload_prompts(force: bool = False, api_key: str = Depends(get_api_key)):
+    """
+    Reload the agents if a prompt file changed (or always with ?force=true).
+    The new agents are built in a thread and swapped in at once; requests that
+    are already running finish with the agents they started with.
+    """
     logger.info("Reload prompts endpoint called")
     
-    # Check prompt files exist before reloading
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    prompt_dir = os.path.join(base_path, "prompts")
-    
-    logger.info(f"Checking prompt files in directory: {prompt_dir}")
-    
     # List all prompt files for debugging
     try:
-        prompt_files = os.listdir(prompt_dir)
-        logger.info(f"Found prompt files: {prompt_files}")
+        prompt_files = os.listdir(PROMPT_DIR)
     except Exception as e:
         logger.error(f"Error listing prompt directory: {str(e)}")
         prompt_files = []
     
-    # Check for specific prompt files
-    for prompt_name in ["triage_prompt", "road_traffic_prompt", "betreibung_prompt"]:
-        txt_path = os.path.join(prompt_dir, f"{prompt_name}.txt")
-        md_path = os.path.join(prompt_dir, f"{prompt_name}.md")
-        
-        txt_exists = os.path.exists(txt_path)
-        md_exists = os.path.exists(md_path)
-        
-        logger.info(f"Prompt {prompt_name}: TXT exists: {txt_exists}, MD exists: {md_exists}")
-    
-    # Reload the agents with the current prompt files
     try:
-        logger.info("Calling load_agents() to reload all agents")
-        load_agents()
-        logger.info("Agents reloaded successfully")
-        return {"message": "Prompts reloaded successfully", "found_files": prompt_files}
+        reloaded, graph = await asyncio.to_thread(agent_graph.reload, force)
+        message = "Prompts reloaded successfully" if reloaded else "Prompts unchanged, agents not reloaded"
+        logger.info(message)
+        return {"message": message, "found_files": prompt_files, "graph": graph.describe()}
     except Exception as e:
         logger.error(f"Error reloading agents: {str(e)}")
         return {"message": f"Error reloading prompts: {str(e)}", "found_files": prompt_files}
@@ -625,79 +595,169 @@ async def debug_agents(api_key: str = Depends(get_api_key)):
     """
     logger.info("Debug agents endpoint called")
     
+    graph = agent_graph.current
     debug_info = {
-        "agents": []
+        "agents": [],
+        "models": [model_registry.describe(role) for role in MODEL_ROLES],
+        "graph": graph.describe()
     }
     
     # Check prompt files exist
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    prompt_dir = os.path.join(base_path, "prompts")
-    
     try:
-        prompt_files = os.listdir(prompt_dir)
+        prompt_files = os.listdir(PROMPT_DIR)
         debug_info["prompt_files"] = prompt_files
     except Exception as e:
         logger.error(f"Error listing prompt directory: {str(e)}")
         debug_info["prompt_files_error"] = str(e)
     
     # Add information about triage agent
-    if triage_agent:
-        triage_info = {
-            "name": triage_agent.name,
-            "model": triage_agent.model,
-            "instruction_length": len(triage_agent.instructions),
-            "instruction_preview": triage_agent.instructions[:200],
-            "handoffs": []
+    triage_info = {
+        "name": graph.triage.name,
+        "model": describe_model(graph.triage.model),
+        "instruction_length": len(graph.triage.instructions),
+        "instruction_preview": graph.triage.instructions[:200],
+        "handoffs": []
+    }
+    
+    # Add handoff information
+    for handoff_agent in graph.triage.handoffs:
+        handoff_info = {
+            "name": handoff_agent.name,
+            "model": describe_model(handoff_agent.model),
+            "instruction_length": len(handoff_agent.instructions),
+            "instruction_preview": handoff_agent.instructions[:200]
         }
-        
-        # Add handoff information
-        if hasattr(triage_agent, 'handoffs'):
-            for handoff_agent in triage_agent.handoffs:
-                handoff_info = {
-                    "name": handoff_agent.name,
-                    "model": handoff_agent.model,
-                    "instruction_length": len(handoff_agent.instructions),
-                    "instruction_preview": handoff_agent.instructions[:200]
-                }
-                triage_info["handoffs"].append(handoff_info)
-        
-        debug_info["agents"].append(triage_info)
+        triage_info["handoffs"].append(handoff_info)
     
-    # Add information for other specific agents
-    for agent_name, agent in [
-        ("trafficlaw_agent", trafficlaw_agent), 
-        ("collection_agent", collection_agent), 
-        ("other_agent", other_agent),
-        ("summary_agent", summary_agent)
-    ]:
-        if agent:
-            agent_info = {
-                "name": agent.name,
-                "model": agent.model,
-                "instruction_length": len(agent.instructions),
-                "instruction_preview": agent.instructions[:200]
-            }
-            debug_info["agents"].append(agent_info)
+    debug_info["agents"].append(triage_info)
     
-    # Log the debug info
-    logger.info("Agent debug information:")
-    for agent_info in debug_info["agents"]:
-        logger.info(f"Agent: {agent_info['name']}")
-        logger.info(f"Instructions preview: {agent_info['instruction_preview']}")
+    # Add information for other specific agents
+    for agent in [graph.road_traffic, graph.betreibung, graph.other, graph.summary]:
+        agent_info = {
+            "name": agent.name,
+            "model": describe_model(agent.model),
+            "instruction_length": len(agent.instructions),
+            "instruction_preview": agent.instructions[:200]
+        }
+        debug_info["agents"].append(agent_info)
     
     return debug_info
 
+@app.get("/metrics")
+async def metrics(api_key: str = Depends(get_api_key)):
+    """
+    Request, stage and model call timings and token counts in the Prometheus
+    text format. Values are per worker process.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug-document-cache")
+async def debug_document_cache(api_key: str = Depends(get_api_key)):
+    """
+    Hit/miss counters and sizes of the parsed document cache.
+    """
+    return document_cache.stats()
+
+@app.get("/debug-response-cache")
+async def debug_response_cache(api_key: str = Depends(get_api_key)):
+    """
+    Configuration, size and hit/miss counters of the response cache.
+    """
+    return response_cache.stats()
+
+@app.get("/debug-resilience")
+async def debug_resilience(api_key: str = Depends(get_api_key)):
+    """
+    Circuit breaker state of each model endpoint and the fallback model.
+    """
+    return {
+        "circuits": circuit_states(),
+        "fallback": model_registry.describe("fallback") if "fallback" in model_registry.roles else None
+    }
+
+@app.get("/debug-history")
+async def debug_history(api_key: str = Depends(get_api_key)):
+    """
+    Token budget and counters of the conversation history compaction.
+    """
+    return history_compactor.stats()
+
+@app.get("/debug-pre-router")
+async def debug_pre_router(text: Optional[str] = None, api_key: str = Depends(get_api_key)):
+    """
+    Pre-router configuration, and the decision for `text` if given.
+    """
+    info = pre_router.describe()
+    if text is not None:
+        info["decision"] = pre_router.route([text]).log_fields()
+    return info
+
+@app.get("/debug-startup")
+async def debug_startup(imports: bool = False, limit: int = 30, api_key: str = Depends(get_api_key)):
+    """
+    Startup timings of this worker. With imports=true, also an import time
+    breakdown (python -X importtime) measured in a fresh interpreter.
+    """
+    report = startup_report()
+    if imports:
+        report["imports"] = await asyncio.to_thread(import_time_report, "app.app", limit)
+    return report
+
+@app.get("/debug-artifacts")
+async def list_debug_artifacts(api_key: str = Depends(get_api_key)):
+    """
+    Debug artifacts kept by this worker process (only with DEBUG_ARTIFACTS enabled).
+    """
+    return {**debug_artifacts.stats(), "artifacts": debug_artifacts.list()}
+
+@app.get("/debug-artifacts/{key}")
+async def get_debug_artifact(key: str, api_key: str = Depends(get_api_key)):
+    """
+    Content of a debug artifact, e.g. the key from a report's X-Debug-Artifact header.
+    """
+    artifact = debug_artifacts.get(key)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Debug artifact not found or expired")
+    return PlainTextResponse(artifact["content"])
+
+@app.get("/debug-logging")
+async def debug_logging(api_key: str = Depends(get_api_key)):
+    """
+    Current log levels, payload sample rate and dropped log records.
+    """
+    return get_log_levels()
+
+@app.post("/debug-logging")
+async def update_logging(request: LogLevelRequest, api_key: str = Depends(get_api_key)):
+    """
+    Change a logger's level and/or the payload sample rate at runtime. Applies
+    to the worker process that handles the request.
+    """
+    try:
+        if request.level:
+            set_log_level(request.logger, request.level)
+            logger.warning(f"Log level of {request.logger} set to {request.level.upper()}")
+        if request.payload_sample_rate is not None:
+            set_payload_sample_rate(request.payload_sample_rate)
+            logger.warning(f"Payload sample rate set to {request.payload_sample_rate}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return get_log_levels()
+
 @app.post("/parse-document")
 async def parse_document(
     request: Request,
     api_key: str = Depends(get_api_key)
 ):
     """
-    Parse a document using unstructured and return the extracted text.
-    Supports PDF and DOCX formats.
+    Parse a document and return the extracted text.
+    Supports PDF and DOCX formats. PDF pages are read from their text layer when
+    possible and only sent to unstructured's OCR pipeline otherwise; "pages" in
+    the response lists the strategy used for each page.
     """
     # Get the form data using FastAPI's form handling
-    form_data = await request.form()
+    with stage_timer("request_parse"):
+        form_data = await request.form()
     
     # Check if a file was uploaded
     if "file" not in form_data:
@@ -705,34 +765,70 @@ async def parse_document(
     
     file = form_data["file"]
     
-    # Create a temporary file to save the uploaded file
+    # Stream the upload into a temporary file for the parser workers, hashing it on the way
     with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        # Write the content of the uploaded file to the temporary file
-        content = await file.read()
-        temp_file.write(content)
+        with stage_timer("upload_copy"):
+            _, content_sha256 = await copy_upload(file, temp_file)
         temp_file_path = temp_file.name
 
     try:
         # Get the file extension
         file_extension = file.filename.split('.')[-1].lower() if file.filename else ''
         
-        # Parse the document based on its type
-        if file_extension == 'pdf':
-            elements = partition_pdf(filename=temp_file_path)
-        elif file_extension in ['docx', 'doc']:
-            elements = partition_docx(filename=temp_file_path)
-        else:
-            os.unlink(temp_file_path)  # Clean up the temporary file
+        if file_extension not in document_parsing.SUPPORTED_EXTENSIONS:
             return {"error": f"Unsupported file format: {file_extension}. Supported formats are PDF and DOCX."}
         
-        # Convert all elements to text and join them
-        text = "\n".join([str(element) for element in elements])
+        # Re-uploads of the same document are served from the cache
+        cache_key = make_cache_key(
+            content_sha256,
+            f"{document_parsing.parser_fingerprint()}-{file_extension}"
+        )
+        cached = await asyncio.to_thread(document_cache.get, cache_key)
+        if cached is not None:
+            logger.info(f"Document cache hit for {file.filename}")
+            return {
+                "filename": file.filename,
+                "content_type": file.content_type,
+                "text": cached["text"],
+                "pages": cached.get("pages", []),
+                "cached": True
+            }
+        
+        # Parse the document in the worker pool
+        with stage_timer("document_parse"):
+            parsed = await document_parser_pool.run(
+                document_parsing.parse_document, temp_file_path, file_extension
+            )
+        
+        # Join the text of all elements
+        text = "\n".join(parsed["elements"])
+        
+        await asyncio.to_thread(
+            document_cache.put,
+            cache_key,
+            {"text": text, "elements": parsed["elements"], "pages": parsed["pages"]}
+        )
         
         return {
             "filename": file.filename,
             "content_type": file.content_type,
-            "text": text
+            "text": text,
+            "pages": parsed["pages"],
+            "cached": False
         }
+    except PoolSaturatedError as e:
+        logger.warning(f"Document parser pool saturated, rejecting {file.filename}")
+        raise HTTPException(
+            status_code=503,
+            detail="Document parser is busy. Please try again later.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except asyncio.TimeoutError:
+        logger.error(f"Parsing {file.filename} timed out after {document_parser_pool.timeout_seconds}s")
+        raise HTTPException(
+            status_code=504,
+            detail="Parsing the document took too long."
+        )
     except Exception as e:
         logger.error(f"Error parsing document: {str(e)}")
         return {"error": f"Failed to parse document: {str(e)}"}
@@ -740,6 +836,219 @@ async def parse_document(
         # Clean up the temporary file
         os.unlink(temp_file_path)
 
+async def generate_case_summary(messages: List[Message]) -> str:
+    """
+    Summarize the conversation for the report cover page. Falls back to a
+    generic text if the model call fails.
+    """
+    # Generate a more meaningful summary using the AI model
+    try:
+        # Create a prompt for summarization
+        summary_prompt = f"""
+        Du bist ein juristischer Dokumentenzusammenfasser. Du sollst ein Gespräch zwischen einem Mandanten und einem Assistenten zusammenfassen.
+        Erstelle eine professionelle, prägnante Zusammenfassung der Hauptthemen, Fragen und gegebenen Ratschläge in diesem Gespräch.
+        Konzentriere dich darauf, die Art des rechtlichen Falls und die wichtigsten rechtlichen Punkte zu identifizieren.
+        
+        Sei sachlich, objektiv und vermeide Spekulationen. Halte deine Zusammenfassung auf 2-4 Sätze beschränkt.
+        """
+        
+        # Convert message history to a format suitable for the summary agent
+        formatted_messages = [{"role": msg.role, "content": msg.content} for msg in messages]
+        
+        # Add the summary prompt as a system message
+        prompt_message = {"role": "system", "content": summary_prompt}
+        summary_messages = [prompt_message] + formatted_messages
+        
+        async def create_summary(client, model: str):
+            response = await client.chat.completions.create(
+                model=model,
+                messages=summary_messages,
+                max_tokens=350
+            )
+            return response, model
+        
+        # Generate summary with the model configured for report summaries. The call
+        # is short, so a second request is sent if the first one is slow.
+        with stage_timer("summary_call", agent="report_summary"):
+            async with deadline(LLM_SUMMARY_DEADLINE_SECONDS):
+                summary_response, summary_model = await hedged(
+                    lambda: model_registry.call("report_summary", create_summary, SUMMARY_RETRY_POLICY),
+                    LLM_SUMMARY_HEDGE_SECONDS
+                )
+        if summary_response.usage:
+            record_token_usage(
+                "report_summary",
+                summary_model,
+                summary_response.usage.prompt_tokens,
+                summary_response.usage.completion_tokens,
+                cached_tokens(summary_response.usage.prompt_tokens_details)
+            )
+        
+        # Extract the summary
+        ai_summary = summary_response.choices[0].message.content.strip()
+        logger.info(f"Generated AI summary with length: {len(ai_summary)} characters")
+        log_payload(logger, "AI summary", ai_summary)
+        
+    except Exception as e:
+        logger.error(f"Error generating AI summary: {str(e)}")
+        # Fallback to a basic summary if AI generation fails
+        ai_summary = "Unable to generate AI summary. This report contains a conversation related to legal matters."
+
+    return ai_summary
+
+def open_base64_attachment(pdf_file: PDFFile):
+    """
+    Return a function that decodes a base64 attachment into an in-memory stream.
+    """
+    def open_attachment():
+        try:
+            stream = io.BytesIO(base64.b64decode(pdf_file.content))
+        except binascii.Error:
+            logger.error(f"Invalid base64 content in {pdf_file.filename}")
+            raise ValueError(f"Invalid PDF content: {pdf_file.filename} contains invalid base64 data")
+        # Drop the encoded copy, only the decoded bytes are needed from here on
+        pdf_file.content = ""
+        return stream
+    return open_attachment
+
+def open_upload_attachment(file: UploadFile):
+    """
+    Return a function that hands out the spooled upload of an attachment.
+    """
+    def open_attachment():
+        content_length = upload_size(file)
+        
+        # Validate PDF content is not empty
+        if not content_length:
+            raise ValueError(f"PDF file {file.filename} has empty content")
+        
+        logger.info(f"PDF file {file.filename} content length: {content_length}")
+        return file.file
+    return open_attachment
+
+def report_pool_busy(retry_after: int) -> HTTPException:
+    logger.warning("Report pool saturated, rejecting report")
+    return HTTPException(
+        status_code=503,
+        detail="Report generation is busy. Please try again later.",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+async def run_report_job(fn, *args, wait_for_pool: bool = False):
+    """
+    Run a step of the report assembly in the report pool. With `wait_for_pool`
+    (background jobs) the step waits for a free slot instead of being rejected.
+
+    Raises:
+        HTTPException: 503 with Retry-After if the pool is saturated, 504 on timeout
+    """
+    try:
+        if wait_for_pool:
+            await report_pool.wait_for_capacity()
+        return await report_pool.run(fn, *args)
+    except PoolSaturatedError as e:
+        raise report_pool_busy(e.retry_after)
+    except asyncio.TimeoutError:
+        logger.error(f"Report assembly timed out after {report_pool.timeout_seconds}s")
+        raise HTTPException(
+            status_code=504,
+            detail="Generating the report took too long."
+        )
+
+async def build_report_body(summary_messages: List[Message], attachments, wait_for_pool: bool = False):
+    """
+    Generate the case summary and merge the attachments concurrently. The merge
+    is CPU-bound and runs in the report pool while the summary request is in flight.
+
+    Returns:
+        The summary text and the PdfWriter containing the attachments
+
+    Raises:
+        HTTPException: 400 if an attachment can't be opened, 503/504 if the
+            report pool is saturated or times out
+    """
+    # Reject (or wait) before spending a model call on a report that can't be assembled
+    if wait_for_pool:
+        await report_pool.wait_for_capacity()
+    elif report_pool.saturated:
+        raise report_pool_busy(report_pool.retry_after)
+    summary_task = asyncio.create_task(generate_case_summary(summary_messages))
+    try:
+        with stage_timer("pdf_merge"):
+            writer = await run_report_job(merge_attachments, attachments, wait_for_pool=wait_for_pool)
+    except AttachmentError as e:
+        summary_task.cancel()
+        logger.error(f"Error processing PDF file {e.filename}: {e.message}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error processing PDF file {e.filename}: {e.message}"
+        )
+    except Exception:
+        summary_task.cancel()
+        raise
+    ai_summary = await summary_task
+    return ai_summary, writer
+
+async def _no_progress(stage: str) -> None:
+    pass
+
+async def assemble_report(
+    title: Optional[str],
+    messages: List[Message],
+    attachments,
+    progress=_no_progress,
+    wait_for_pool: bool = False
+):
+    """
+    Build a complete report: summary and attachments, cover page, serialized PDF.
+    The cover content stays in memory; it is only kept as a debug artifact when
+    DEBUG_ARTIFACTS is enabled. Background jobs pass `wait_for_pool` so a busy
+    report pool delays them instead of failing them.
+
+    Returns:
+        A stream with the finished PDF and the key of the cover page artifact (or None)
+    """
+    await progress("summarizing")
+    ai_summary, writer = await build_report_body(messages, attachments, wait_for_pool)
+    report_title = title or "Legal Case Documents"
+    attachment_names = [filename for filename, _ in attachments]
+
+    # ReportLab is only imported for reports (usually prewarmed after startup)
+    cover_page = await import_lazily("app.cover_page")
+
+    artifact_key = None
+    if debug_artifacts.enabled or logger.isEnabledFor(logging.DEBUG):
+        cover_content = cover_page.cover_page_text(report_title, ai_summary, attachment_names, messages)
+        log_payload(logger, "Cover page content", cover_content)
+        artifact_key = debug_artifacts.put("cover_page", cover_content)
+
+    await progress("rendering_cover")
+    with stage_timer("cover_render"):
+        await run_report_job(
+            cover_page.add_cover_page, writer, report_title, ai_summary, attachment_names, messages,
+            wait_for_pool=wait_for_pool
+        )
+    logger.info("Added cover page to PDF")
+
+    await progress("writing_pdf")
+    # Write the combined PDF to a spooled file, which is then streamed in chunks
+    with stage_timer("pdf_write"):
+        merged_pdf = await run_report_job(write_pdf, writer, wait_for_pool=wait_for_pool)
+    return merged_pdf, artifact_key
+
+def report_response(merged_pdf, artifact_key: Optional[str]) -> StreamingResponse:
+    headers = {
+        "Content-Disposition": f'attachment; filename="combined_report.pdf"',
+        "Content-Length": str(file_size(merged_pdf))
+    }
+    if artifact_key:
+        headers["X-Debug-Artifact"] = artifact_key
+    return StreamingResponse(
+        iter_file_chunks(merged_pdf), 
+        media_type="application/pdf",
+        headers=headers
+    )
+
 @app.post("/finalize-report")
 async def finalize_report(request: FinalizeReportRequest, api_key: str = Depends(get_api_key)):
     """
@@ -753,6 +1062,7 @@ async def finalize_report(request: FinalizeReportRequest, api_key: str = Depends
     Returns:
     - A combined PDF document
     """
+    mark_request_parsed()
     try:
         # Validate that PDF content is not empty
         for pdf_file in request.pdf_files:
@@ -762,213 +1072,17 @@ async def finalize_report(request: FinalizeReportRequest, api_key: str = Depends
                     detail=f"PDF file {pdf_file.filename} has empty content"
                 )
             logger.info(f"PDF file {pdf_file.filename} content length: {len(pdf_file.content)}")
-        # Create a PDF merger object
-        merger = PyPDF2.PdfMerger()
-        
-        # Generate a more meaningful summary using the AI model
-        try:
-            # Create a prompt for summarization
-            summary_prompt = f"""
-            Du bist ein juristischer Dokumentenzusammenfasser. Du sollst ein Gespräch zwischen einem Mandanten und einem Assistenten zusammenfassen.
-            Erstelle eine professionelle, prägnante Zusammenfassung der Hauptthemen, Fragen und gegebenen Ratschläge in diesem Gespräch.
-            Konzentriere dich darauf, die Art des rechtlichen Falls und die wichtigsten rechtlichen Punkte zu identifizieren.
-            
-            Sei sachlich, objektiv und vermeide Spekulationen. Halte deine Zusammenfassung auf 2-4 Sätze beschränkt.
-            """
-            
-            # Convert message history to a format suitable for the summary agent
-            formatted_messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
-            
-            # Add the summary prompt as a system message
-            prompt_message = {"role": "system", "content": summary_prompt}
-            summary_messages = [prompt_message] + formatted_messages
-            
-            # Use the OpenAI model to generate a summary
-            from openai import AsyncOpenAI
-            
-            # Create client with API key from environment or default configuration
-            client = AsyncOpenAI()
-            
-            # Generate summary
-            summary_response = await client.chat.completions.create(
-                model=modelname,  # Using the same model defined earlier in the file
-                messages=summary_messages,
-                max_tokens=350
-            )
-            
-            # Extract the summary
-            ai_summary = summary_response.choices[0].message.content.strip()
-            logger.info(f"Generated AI summary: {ai_summary}")
-            
-        except Exception as e:
-            logger.error(f"Error generating AI summary: {str(e)}")
-            # Fallback to a basic summary if AI generation fails
-            ai_summary = "Unable to generate AI summary. This report contains a conversation related to legal matters."
-        
-        # Create a formatted message history
-        message_history = "Full Conversation:\n\n"
-        for i, msg in enumerate(request.messages, 1):
-            role_display = "Client" if msg.role == "user" else "Legal Assistant"
-            message_history += f"{i}. {role_display}:\n{msg.content}\n\n"
-        
-        # Create a list of attached documents
-        attached_docs = "Attached Documents:\n"
-        for i, pdf_file in enumerate(request.pdf_files, 1):
-            attached_docs += f"{i}. {pdf_file.filename}\n"
-        
-        # Set the title
-        report_title = request.title or "Legal Case Documents"
-        
-        # Format the cover page content
-        cover_content = f"""
-{report_title}
-
-CASE SUMMARY:
-{ai_summary}
-
-ATTACHED DOCUMENTS:
-{"".join(f"{i}. {pdf_file.filename}\n" for i, pdf_file in enumerate(request.pdf_files, 1))}
-
-CONVERSATION HISTORY:
-"""
-        # Add each message with proper formatting and ensure line breaks are preserved
-        for msg in request.messages:
-            role_display = "Client" if msg.role == "user" else "Legal Assistant"
-            # Add the role as a prefix
-            cover_content += f"{role_display}:\n"
-            # Add the message content with preserved line breaks
-            cover_content += f"{msg.content}\n\n"
-        
-        # Log the cover content for debugging
-        logger.info(f"Cover page content: {cover_content[:500]}...")
-        
-        # Create a temporary text file
-        with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as temp_text:
-            temp_text.write(cover_content.encode('utf-8'))
-            temp_text_path = temp_text.name
         
-        try:
-            # Create and add a cover page with content
-            create_cover_page(report_title, cover_content, merger)
-            
-            # Log that we've added the cover page
-            logger.info("Added cover page to PDF")
-            
-            # Also write the cover content to a separate text file for manual reference
-            with open("cover_page_content.txt", "w", encoding="utf-8") as cover_file:
-                cover_file.write(cover_content)
-                logger.info("Saved cover page content to cover_page_content.txt for reference")
-        finally:
-            # Clean up the temporary text file
-            os.unlink(temp_text_path)
-        
-        # Add all PDF files in the order they were provided
-        for pdf_file in request.pdf_files:
-            try:
-                # Create a temporary file for each PDF
-                with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_pdf:
-                    # PDF files should be binary data, not text
-                    # Check if content is base64 encoded and decode if needed
-                    import base64
-                    try:
-                        # Try to decode if it's base64 encoded
-                        if isinstance(pdf_file.content, str):
-                            try:
-                                pdf_content = base64.b64decode(pdf_file.content)
-                            except base64.binascii.Error:
-                                logger.error(f"Invalid base64 content in {pdf_file.filename}")
-                                raise ValueError(f"Invalid PDF content: {pdf_file.filename} contains invalid base64 data")
-                        else:
-                            pdf_content = pdf_file.content
-                        
-                        # Write the binary content to the temporary file
-                        temp_pdf.write(pdf_content)
-                        temp_pdf_path = temp_pdf.name
-                        logger.info(f"Successfully wrote PDF file {pdf_file.filename} to temporary file")
-                    except Exception as e:
-                        logger.error(f"Error processing PDF content for {pdf_file.filename}: {str(e)}")
-                        raise
-                
-                # Validate that the PDF is readable before adding it to the merger
-                try:
-                    # Try to read the PDF to make sure it's valid
-                    with open(temp_pdf_path, "rb") as test_pdf:
-                        reader = PyPDF2.PdfReader(test_pdf)
-                        # Check if PDF has pages
-                        if len(reader.pages) == 0:
-                            logger.warning(f"PDF file {pdf_file.filename} has 0 pages")
-                        else:
-                            logger.info(f"PDF file {pdf_file.filename} has {len(reader.pages)} pages")
-                    
-                    # If we got here, the PDF is valid, so add it to the merger
-                    merger.append(temp_pdf_path)
-                except PyPDF2.errors.PdfReadError as e:
-                    logger.warning(f"Attempting to repair corrupted PDF file {pdf_file.filename}: {str(e)}")
-                    try:
-                        # Attempt to repair the corrupted PDF
-                        repaired_pdf = io.BytesIO()
-                        with open(temp_pdf_path, "rb") as corrupted_file:
-                            reader = PyPDF2.PdfReader(corrupted_file)
-                            writer = PyPDF2.PdfWriter()
-                            for page in reader.pages:
-                                writer.add_page(page)
-                            writer.write(repaired_pdf)
-                        repaired_pdf.seek(0)
-                        merger.append(repaired_pdf)
-                        logger.info(f"Successfully repaired and included {pdf_file.filename}")
-                    except Exception as repair_error:
-                        logger.error(f"Failed to repair PDF file {pdf_file.filename}: {str(repair_error)}")
-                        # Add a placeholder page indicating the file could not be processed
-                        placeholder_writer = PyPDF2.PdfWriter()
-                        placeholder_writer.add_blank_page(width=612, height=792)  # US Letter size
-                        placeholder_stream = io.BytesIO()
-                        placeholder_writer.write(placeholder_stream)
-                        placeholder_stream.seek(0)
-                        merger.append(placeholder_stream)
-                        logger.warning(f"Added placeholder for {pdf_file.filename}")
-                finally:
-                    # Make sure to clean up each temporary file
-                    os.unlink(temp_pdf_path)
-            except Exception as e:
-                logger.error(f"Error processing PDF file {pdf_file.filename}: {str(e)}")
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Error processing PDF file {pdf_file.filename}: {str(e)}"
-                )
-        
-        # Write the combined PDF to a BytesIO object
-        merged_pdf = io.BytesIO()
-        merger.write(merged_pdf)
-        merger.close()
-        merged_pdf.seek(0)
-        
-        # Create a temporary reference to the cover file path
-        cover_file_path = os.path.join(os.path.dirname(__file__), "cover_page_content.txt")
-        
-        # Define a cleanup function that will run after the response is delivered
-        async def cleanup_after_response():
-            # Wait a moment to ensure file is not in use
-            await asyncio.sleep(1)
-            try:
-                # Remove the cover page content file if it exists
-                if os.path.exists(cover_file_path):
-                    os.remove(cover_file_path)
-                    logger.info("Cleaned up cover_page_content.txt file")
-            except Exception as e:
-                logger.error(f"Error cleaning up cover page file: {str(e)}")
-        
-        # Schedule the cleanup to run in the background
-        asyncio.create_task(cleanup_after_response())
-        
-        # Return the combined PDF as a streaming response
-        return StreamingResponse(
-            merged_pdf, 
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'attachment; filename="combined_report.pdf"'
-            }
+        # Summarize the conversation while the attachments are decoded and merged
+        merged_pdf, artifact_key = await assemble_report(
+            request.title,
+            request.messages,
+            [(pdf_file.filename, open_base64_attachment(pdf_file)) for pdf_file in request.pdf_files]
         )
+        return report_response(merged_pdf, artifact_key)
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error finalizing report: {str(e)}")
         raise HTTPException(
@@ -996,196 +1110,22 @@ async def finalize_report_form(
     Returns:
     - A combined PDF document
     """
+    mark_request_parsed()
     try:
         # Parse the messages JSON string
-        import json
         message_list = json.loads(messages)
         parsed_messages = [Message(**msg) for msg in message_list]
         
-        # Create a PDF merger object
-        merger = PyPDF2.PdfMerger()
-        
-        # Generate a more meaningful summary using the AI model
-        try:
-            # Create a prompt for summarization
-            summary_prompt = f"""
-            Du bist ein juristischer Dokumentenzusammenfasser. Du sollst ein Gespräch zwischen einem Mandanten und einem Assistenten zusammenfassen.
-            Erstelle eine professionelle, prägnante Zusammenfassung der Hauptthemen, Fragen und gegebenen Ratschläge in diesem Gespräch.
-            Konzentriere dich darauf, die Art des rechtlichen Falls und die wichtigsten rechtlichen Punkte zu identifizieren.
-            
-            Sei sachlich, objektiv und vermeide Spekulationen. Halte deine Zusammenfassung auf 2-4 Sätze beschränkt.
-            """
-            
-            # Convert message history to a format suitable for the summary agent
-            formatted_messages = [{"role": msg.role, "content": msg.content} for msg in parsed_messages]
-            
-            # Add the summary prompt as a system message
-            prompt_message = {"role": "system", "content": summary_prompt}
-            summary_messages = [prompt_message] + formatted_messages
-            
-            # Use the OpenAI model to generate a summary
-            from openai import AsyncOpenAI
-            
-            # Create client with API key from environment or default configuration
-            client = AsyncOpenAI()
-            
-            # Generate summary
-            summary_response = await client.chat.completions.create(
-                model=modelname,  # Using the same model defined earlier in the file
-                messages=summary_messages,
-                max_tokens=350
-            )
-            
-            # Extract the summary
-            ai_summary = summary_response.choices[0].message.content.strip()
-            logger.info(f"Generated AI summary: {ai_summary}")
-            
-        except Exception as e:
-            logger.error(f"Error generating AI summary: {str(e)}")
-            # Fallback to a basic summary if AI generation fails
-            ai_summary = "Unable to generate AI summary. This report contains a conversation related to legal matters."
-        
-        # Create a formatted message history
-        message_history = "Full Conversation:\n\n"
-        for i, msg in enumerate(parsed_messages, 1):
-            role_display = "Client" if msg.role == "user" else "Legal Assistant"
-            message_history += f"{i}. {role_display}:\n{msg.content}\n\n"
-        
-        # Create a list of attached documents
-        attached_docs = "Attached Documents:\n"
-        for i, file in enumerate(files, 1):
-            attached_docs += f"{i}. {file.filename}\n"
-        
-        # Set the title
-        report_title = title or "Legal Case Documents"
-        
-        # Format the cover page content
-        cover_content = f"""
-{report_title}
-
-CASE SUMMARY:
-{ai_summary}
-
-ATTACHED DOCUMENTS:
-{"".join(f"{i}. {file.filename}\n" for i, file in enumerate(files, 1))}
-
-CONVERSATION HISTORY:
-"""
-        # Add each message with proper formatting and ensure line breaks are preserved
-        for msg in parsed_messages:
-            role_display = "Client" if msg.role == "user" else "Legal Assistant"
-            # Add the role as a prefix
-            cover_content += f"{role_display}:\n"
-            # Add the message content with preserved line breaks
-            cover_content += f"{msg.content}\n\n"
-        
-        # Log the cover content for debugging
-        logger.info(f"Cover page content: {cover_content[:500]}...")
-        
-        # Create a temporary text file
-        with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as temp_text:
-            temp_text.write(cover_content.encode('utf-8'))
-            temp_text_path = temp_text.name
-        
-        try:
-            # Create and add a cover page with content
-            create_cover_page(report_title, cover_content, merger)
-            
-            # Log that we've added the cover page
-            logger.info("Added cover page to PDF")
-            
-            # Also write the cover content to a separate text file for manual reference
-            with open("cover_page_content.txt", "w", encoding="utf-8") as cover_file:
-                cover_file.write(cover_content)
-                logger.info("Saved cover page content to cover_page_content.txt for reference")
-        finally:
-            # Clean up the temporary text file
-            os.unlink(temp_text_path)
-        
-        # Add all PDF files in the order they were provided
-        for file in files:
-            try:
-                # Read the file content
-                content = await file.read()
-                
-                # Validate PDF content is not empty
-                if not content:
-                    raise ValueError(f"PDF file {file.filename} has empty content")
-                
-                logger.info(f"PDF file {file.filename} content length: {len(content)}")
-                
-                # Create a temporary file
-                with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_pdf:
-                    temp_pdf.write(content)
-                    temp_pdf_path = temp_pdf.name
-                    logger.info(f"Successfully wrote PDF file {file.filename} to temporary file")
-                
-                # Validate that the PDF is readable before adding it to the merger
-                try:
-                    # Try to read the PDF to make sure it's valid
-                    with open(temp_pdf_path, "rb") as test_pdf:
-                        reader = PyPDF2.PdfReader(test_pdf)
-                        # Check if PDF has pages
-                        if len(reader.pages) == 0:
-                            logger.warning(f"PDF file {file.filename} has 0 pages")
-                        else:
-                            logger.info(f"PDF file {file.filename} has {len(reader.pages)} pages")
-                    
-                    # If we got here, the PDF is valid, so add it to the merger
-                    merger.append(temp_pdf_path)
-                except PyPDF2.errors.PdfReadError as e:
-                    logger.warning(f"PDF read error for file {file.filename}: {str(e)}")
-                    placeholder_writer = PyPDF2.PdfWriter()
-                    placeholder_writer.add_blank_page(width=612, height=792)  # US Letter size
-                    placeholder_stream = io.BytesIO()
-                    placeholder_writer.write(placeholder_stream)
-                    placeholder_stream.seek(0)
-                    merger.append(placeholder_stream)
-                    logger.warning(f"Added placeholder for {file.filename}")
-                finally:
-                    # Clean up the temporary file
-                    os.unlink(temp_pdf_path)
-                    
-            except Exception as e:
-                logger.error(f"Error processing PDF file {file.filename}: {str(e)}")
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Error processing PDF file {file.filename}: {str(e)}"
-                )
-        
-        # Write the combined PDF to a BytesIO object
-        merged_pdf = io.BytesIO()
-        merger.write(merged_pdf)
-        merger.close()
-        merged_pdf.seek(0)
-        
-        # Create a temporary reference to the cover file path
-        cover_file_path = os.path.join(os.path.dirname(__file__), "cover_page_content.txt")
-        
-        # Define a cleanup function that will run after the response is delivered
-        async def cleanup_after_response():
-            # Wait a moment to ensure file is not in use
-            await asyncio.sleep(1)
-            try:
-                # Remove the cover page content file if it exists
-                if os.path.exists(cover_file_path):
-                    os.remove(cover_file_path)
-                    logger.info("Cleaned up cover_page_content.txt file")
-            except Exception as e:
-                logger.error(f"Error cleaning up cover page file: {str(e)}")
-        
-        # Schedule the cleanup to run in the background
-        asyncio.create_task(cleanup_after_response())
-        
-        # Return the combined PDF as a streaming response
-        return StreamingResponse(
-            merged_pdf, 
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'attachment; filename="combined_report.pdf"'
-            }
+        # Summarize the conversation while the attachments are merged
+        merged_pdf, artifact_key = await assemble_report(
+            title,
+            parsed_messages,
+            [(file.filename, open_upload_attachment(file)) for file in files]
         )
+        return report_response(merged_pdf, artifact_key)
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error finalizing report (form): {str(e)}")
         raise HTTPException(
@@ -1193,6 +1133,93 @@ CONVERSATION HISTORY:
             detail=f"Error finalizing report: {str(e)}"
         )
 
+def validate_pdf_contents(pdf_files: List[PDFFile]) -> None:
+    for pdf_file in pdf_files:
+        if not pdf_file.content:
+            raise HTTPException(
+                status_code=400,
+                detail=f"PDF file {pdf_file.filename} has empty content"
+            )
+
+def report_request_id(request: FinalizeReportRequest) -> str:
+    """
+    Job id of a report request: identical inputs give the same id.
+    """
+    def parts():
+        yield request.title or ""
+        yield str(len(request.messages))
+        for msg in request.messages:
+            yield msg.role
+            yield msg.content
+        yield str(len(request.pdf_files))
+        for pdf_file in request.pdf_files:
+            yield pdf_file.filename
+            yield pdf_file.content
+    return report_job_id(parts())
+
+async def build_job_report(request: FinalizeReportRequest, progress) -> io.IOBase:
+    """
+    Assemble the report of a background job; same steps as /finalize-report.
+    """
+    merged_pdf, _ = await assemble_report(
+        request.title,
+        request.messages,
+        [(pdf_file.filename, open_base64_attachment(pdf_file)) for pdf_file in request.pdf_files],
+        progress,
+        wait_for_pool=True
+    )
+    return merged_pdf
+
+# Background report jobs, results are kept in REPORT_RESULT_DIR
+report_jobs = create_report_job_manager(build_job_report)
+
+def report_job_status(job) -> Dict[str, Any]:
+    status = job.to_dict()
+    status["status_url"] = f"/reports/{job.job_id}"
+    return status
+
+@app.post("/reports", status_code=202)
+async def submit_report(request: FinalizeReportRequest, api_key: str = Depends(get_api_key)):
+    """
+    Start generating a report in the background. Takes the same input as
+    /finalize-report and returns a job id immediately; poll GET /reports/{job_id}
+    for the result. Submitting the same input again returns the existing job.
+    """
+    mark_request_parsed()
+    validate_pdf_contents(request.pdf_files)
+    job_id = await asyncio.to_thread(report_request_id, request)
+    job, created = await report_jobs.submit(job_id, request)
+    return JSONResponse(
+        status_code=202,
+        content={**report_job_status(job), "created": created},
+        headers={"Location": f"/reports/{job.job_id}"}
+    )
+
+@app.get("/reports/{job_id}")
+async def get_report(job_id: str, api_key: str = Depends(get_api_key)):
+    """
+    Status of a report job: 202 with progress while it runs, the PDF once it is
+    done, and the job's error status code if it failed.
+    """
+    job = await asyncio.to_thread(report_jobs.store.get, job_id) if is_valid_job_id(job_id) else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if job.status == "done":
+        return FileResponse(
+            report_jobs.store.result_path(job_id),
+            media_type="application/pdf",
+            filename="combined_report.pdf"
+        )
+    if job.status == "failed":
+        return JSONResponse(status_code=job.error_status or 500, content=report_job_status(job))
+    return JSONResponse(
+        status_code=202,
+        content=report_job_status(job),
+        headers={"Retry-After": "2"}
+    )
+
+mark("app_imported")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,219 @@
+import io
+import html
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Protocol
+
+import PyPDF2
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.lib.utils import simpleSplit
+from reportlab.platypus import Flowable, Paragraph, SimpleDocTemplate, Spacer
+
+logger = logging.getLogger(__name__)
+
+
+class CoverMessage(Protocol):
+    role: str
+    content: str
+
+
+@lru_cache(maxsize=1)
+def cover_styles() -> Dict[str, ParagraphStyle]:
+    """
+    Paragraph styles of the cover page, created once per process.
+    """
+    styles = getSampleStyleSheet()
+    return {
+        "fallback_title": styles["Title"],
+        "fallback_normal": styles["Normal"],
+        "title": ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Title'],
+            fontSize=18,
+            alignment=1,  # Center alignment
+            spaceAfter=15,
+            textColor=colors.darkblue
+        ),
+        "header": ParagraphStyle(
+            'Header',
+            parent=styles['Heading1'],
+            fontSize=14,
+            spaceBefore=20,
+            spaceAfter=10,
+            textColor=colors.darkblue,
+            borderWidth=0,
+            borderPadding=5,
+            borderColor=colors.lightgrey,
+            borderRadius=2
+        ),
+        "normal": ParagraphStyle(
+            'CustomNormal',
+            parent=styles['Normal'],
+            fontSize=10,
+            leading=14,
+            spaceAfter=5
+        ),
+        "role": ParagraphStyle(
+            'Role',
+            parent=styles['Normal'],
+            fontName='Helvetica-Bold',
+            fontSize=10,
+            leading=14
+        )
+    }
+
+
+class PlainText(Flowable):
+    """
+    Unformatted text block for the conversation history. Unlike Paragraph it does
+    not parse markup and wraps lines with simpleSplit, which keeps long
+    histories cheap to lay out. Splits across pages by lines.
+    """
+
+    def __init__(self, lines: Optional[List[str]], style: ParagraphStyle, space_after: float = 0, wrapped: Optional[List[str]] = None):
+        super().__init__()
+        self.lines = lines
+        self.style = style
+        self.space_after = space_after
+        self._wrapped = wrapped
+        self._wrapped_width = None
+
+    def wrap(self, available_width, available_height):
+        if self._wrapped is None or (self.lines is not None and self._wrapped_width != available_width):
+            wrapped: List[str] = []
+            for line in self.lines:
+                wrapped.extend(simpleSplit(line, self.style.fontName, self.style.fontSize, available_width) or [""])
+            self._wrapped = wrapped
+            self._wrapped_width = available_width
+        self.width = available_width
+        self.height = len(self._wrapped) * self.style.leading
+        return self.width, self.height
+
+    def getSpaceAfter(self):
+        return self.space_after
+
+    def split(self, available_width, available_height):
+        self.wrap(available_width, available_height)
+        fitting = int(available_height // self.style.leading)
+        if fitting <= 0 or fitting >= len(self._wrapped):
+            return []
+        return [
+            PlainText(None, self.style, 0, self._wrapped[:fitting]),
+            PlainText(None, self.style, self.space_after, self._wrapped[fitting:])
+        ]
+
+    def draw(self):
+        text = self.canv.beginText(0, self.height - self.style.fontSize)
+        text.setFont(self.style.fontName, self.style.fontSize, self.style.leading)
+        for line in self._wrapped:
+            text.textLine(line)
+        self.canv.drawText(text)
+
+
+def role_display(role: str) -> str:
+    return "Client" if role == "user" else "Legal Assistant"
+
+
+def _text_lines(text: str) -> List[str]:
+    return [line for line in (line.strip() for line in text.split("\n")) if line]
+
+
+def _document(buffer: io.BytesIO) -> SimpleDocTemplate:
+    return SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=36,
+        bottomMargin=72
+    )
+
+
+def render_cover_page(title: str, summary: str, attachments: Iterable[str], messages: Iterable[CoverMessage]) -> io.BytesIO:
+    """
+    Render the cover page PDF (title, case summary, attached documents and the
+    conversation) and return it as a rewound stream.
+
+    Raises:
+        Exception: ReportLab could not build the document
+    """
+    styles = cover_styles()
+    normal_style = styles["normal"]
+    header_style = styles["header"]
+
+    elements: List = [
+        Paragraph(html.escape(title), styles["title"]),
+        Spacer(1, 0.25*inch),
+        Paragraph("CASE SUMMARY", header_style),
+        Paragraph(html.escape(" ".join(line.strip() for line in summary.split("\n") if line.strip())), normal_style),
+        Spacer(1, 0.15*inch),
+        Paragraph("ATTACHED DOCUMENTS", header_style)
+    ]
+    for i, filename in enumerate(attachments, 1):
+        elements.append(PlainText([f"• {i}. {filename}"], normal_style, normal_style.spaceAfter))
+    elements.append(Spacer(1, 0.15*inch))
+
+    elements.append(Paragraph("CONVERSATION HISTORY", header_style))
+    for msg in messages:
+        lines = _text_lines(msg.content)
+        if not lines:
+            continue
+        elements.append(PlainText([f"{role_display(msg.role)}:"], styles["role"], normal_style.spaceAfter))
+        elements.append(PlainText(lines, normal_style, normal_style.spaceAfter))
+        elements.append(Spacer(1, 0.1*inch))
+
+    buffer = io.BytesIO()
+    _document(buffer).build(elements)
+    buffer.seek(0)
+    return buffer
+
+
+def _render_fallback_cover_page(title: str) -> io.BytesIO:
+    styles = cover_styles()
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=letter).build([
+        Paragraph(html.escape(title), styles["fallback_title"]),
+        Spacer(1, 0.25*inch),
+        Paragraph("Error creating formatted cover page. Please see the attached documents.", styles["fallback_normal"])
+    ])
+    buffer.seek(0)
+    return buffer
+
+
+def add_cover_page(writer: PyPDF2.PdfWriter, title: str, summary: str, attachments: Iterable[str], messages: Iterable[CoverMessage]) -> None:
+    """
+    Render the cover page and insert it at the front of the report. Falls back
+    to a minimal cover page, and to a blank page if even that fails.
+    """
+    try:
+        buffer = render_cover_page(title, summary, list(attachments), list(messages))
+    except Exception as e:
+        logger.error(f"Error building cover page: {str(e)}")
+        try:
+            buffer = _render_fallback_cover_page(title)
+            logger.info("Successfully created emergency fallback cover page")
+        except Exception as final_error:
+            # Absolute last resort - add a blank page with no content
+            logger.error(f"Emergency fallback failed: {str(final_error)}. Adding blank page instead.")
+            blank_writer = PyPDF2.PdfWriter()
+            blank_writer.add_blank_page(width=612, height=792)  # US Letter size
+            buffer = io.BytesIO()
+            blank_writer.write(buffer)
+            buffer.seek(0)
+
+    writer.merge(0, buffer)
+
+
+def cover_page_text(title: str, summary: str, attachments: Iterable[str], messages: Iterable[CoverMessage]) -> str:
+    """
+    Plain-text version of the cover page, for reference files and logging.
+    """
+    parts = [f"{title}\n\nCASE SUMMARY:\n{summary}\n\nATTACHED DOCUMENTS:\n"]
+    parts.extend(f"{i}. {filename}\n" for i, filename in enumerate(attachments, 1))
+    parts.append("\nCONVERSATION HISTORY:\n")
+    for msg in messages:
+        parts.append(f"{role_display(msg.role)}:\n{msg.content}\n\n")
+    return "".join(parts)
@@ -0,0 +1,102 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DebugArtifactStore:
+    """
+    Opt-in in-memory store for intermediate report artifacts (e.g. the plain-text
+    cover page), so they can be inspected through the API without writing files
+    on the request path.
+
+    Every artifact gets a unique key. Entries expire after `ttl_seconds`; when
+    the store exceeds `max_bytes` the oldest entries are evicted. A disabled
+    store keeps nothing. Artifacts live in the worker process that created them.
+    """
+
+    def __init__(self, enabled: bool, max_bytes: int, ttl_seconds: float):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # key -> (created_at, name, content, size)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        # Caller holds the lock; entries are ordered by creation time
+        while self._entries:
+            key, (created_at, _, _, size) = next(iter(self._entries.items()))
+            if self._bytes <= self.max_bytes and now - created_at <= self.ttl_seconds:
+                break
+            self._entries.pop(key)
+            self._bytes -= size
+
+    def put(self, name: str, content: str) -> Optional[str]:
+        """
+        Store an artifact and return its key, or None if the store is disabled
+        or the artifact is larger than the whole store.
+        """
+        if not self.enabled:
+            return None
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.warning(f"Debug artifact {name} too large ({size} bytes), not stored")
+            return None
+        key = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (now, name, content, size)
+            self._bytes += size
+            self._evict(now)
+        logger.info(f"Stored debug artifact {name} as {key}")
+        return key
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._evict(time.time())
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created_at, name, content, size = entry
+        return {"key": key, "name": name, "created_at": created_at, "size": size, "content": content}
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._evict(time.time())
+            return [
+                {"key": key, "name": name, "created_at": created_at, "size": size}
+                for key, (created_at, name, _, size) in self._entries.items()
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds
+            }
+
+
+def create_debug_artifact_store() -> DebugArtifactStore:
+    """
+    Create the debug artifact store configured via environment variables:
+
+    - DEBUG_ARTIFACTS: "true" to keep report artifacts (default off)
+    - DEBUG_ARTIFACTS_MAX_MB: total size of the stored artifacts (default 8)
+    - DEBUG_ARTIFACTS_TTL_SECONDS: lifetime of an artifact (default 900)
+    """
+    enabled = os.environ.get("DEBUG_ARTIFACTS", "false").lower() in ("1", "true", "yes")
+    max_bytes = int(float(os.environ.get("DEBUG_ARTIFACTS_MAX_MB", "8")) * 1024 * 1024)
+    ttl_seconds = float(os.environ.get("DEBUG_ARTIFACTS_TTL_SECONDS", "900"))
+    if enabled:
+        logger.info(f"Debug artifacts enabled (max {max_bytes} bytes, TTL {ttl_seconds}s)")
+    return DebugArtifactStore(enabled, max_bytes, ttl_seconds)
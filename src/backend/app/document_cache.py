@@ -0,0 +1,210 @@
+import os
+import gzip
+import json
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(content_sha256: str, strategy: str) -> str:
+    """
+    Build the cache key for a document: the SHA-256 of its bytes plus the parser
+    strategy, so a changed parser never serves stale results.
+    """
+    safe_strategy = "".join(c if c.isalnum() or c in "-_" else "_" for c in strategy)
+    return f"{content_sha256}-{safe_strategy}"
+
+
+class DocumentCache:
+    """
+    Two-tier cache for parsed document text.
+
+    The memory tier holds the most recently used entries up to `memory_max_bytes`.
+    The disk tier stores gzip-compressed JSON files in `disk_dir` up to
+    `disk_max_bytes`, evicting the least recently used files (by mtime). Disk hits
+    are promoted to the memory tier. Pass disk_dir=None to disable the disk tier.
+    """
+
+    def __init__(self, memory_max_bytes: int, disk_dir: Optional[str], disk_max_bytes: int):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0
+        }
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._scan_disk())
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json.gz")
+
+    def _scan_disk(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".json.gz"):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _remember(self, key: str, value: Dict[str, Any], size: int) -> None:
+        # Caller holds the lock
+        if size > self.memory_max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        self._memory[key] = (value, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_max_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self._counters["memory_evictions"] += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached value for `key` or None. Blocking when it has to read
+        from disk, so call it from a thread on the request path.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return entry[0]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "rb") as cache_file:
+                    compressed = cache_file.read()
+                raw = gzip.decompress(compressed)
+                value = json.loads(raw)
+                # Touch the file so it counts as recently used for eviction
+                os.utime(path, None)
+                with self._lock:
+                    self._counters["disk_hits"] += 1
+                    self._remember(key, value, len(raw))
+                return value
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Dropping unreadable document cache entry {key}: {str(e)}")
+                self._remove_disk_entry(path)
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Store a parsed document in both tiers.
+        """
+        raw = json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+        with self._lock:
+            self._counters["stores"] += 1
+            self._remember(key, value, len(raw))
+
+        if not self.disk_dir:
+            return
+
+        compressed = gzip.compress(raw, compresslevel=5)
+
+        if len(compressed) > self.disk_max_bytes:
+            return
+
+        path = self._disk_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(temp_path, "wb") as cache_file:
+                cache_file.write(compressed)
+            os.replace(temp_path, path)
+            with self._lock:
+                self._disk_bytes += len(compressed) - previous_size
+            self._evict_disk()
+        except Exception as e:
+            logger.warning(f"Could not write document cache entry {key}: {str(e)}")
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def _remove_disk_entry(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+            with self._lock:
+                self._disk_bytes -= size
+        except FileNotFoundError:
+            pass
+
+    def _evict_disk(self) -> None:
+        if self._disk_bytes <= self.disk_max_bytes:
+            return
+        entries = sorted(self._scan_disk(), key=lambda entry: entry[1])
+        # Re-sync with the directory, other workers may write to it as well
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+                with self._lock:
+                    self._counters["disk_evictions"] += 1
+            except FileNotFoundError:
+                total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            return {
+                **self._counters,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.memory_max_bytes,
+                "disk_dir": self.disk_dir,
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes
+            }
+
+
+def create_document_cache() -> DocumentCache:
+    """
+    Create the document cache configured via environment variables:
+
+    - DOCUMENT_CACHE_MEMORY_MB: size of the memory tier (default 64)
+    - DOCUMENT_CACHE_DIR: directory of the disk tier, empty to disable it
+    - DOCUMENT_CACHE_DISK_MB: size of the disk tier (default 512)
+    """
+    memory_max_bytes = int(float(os.environ.get("DOCUMENT_CACHE_MEMORY_MB", "64")) * 1024 * 1024)
+    disk_dir = os.environ.get(
+        "DOCUMENT_CACHE_DIR",
+        os.path.join(tempfile.gettempdir(), "manona-document-cache")
+    ) or None
+    disk_max_bytes = int(float(os.environ.get("DOCUMENT_CACHE_DISK_MB", "512")) * 1024 * 1024)
+
+    logger.info(f"Document cache: memory {memory_max_bytes} bytes, disk {disk_dir or 'disabled'} ({disk_max_bytes} bytes)")
+    return DocumentCache(memory_max_bytes, disk_dir, disk_max_bytes)
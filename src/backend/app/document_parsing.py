@@ -0,0 +1,186 @@
+import os
+import tempfile
+from typing import List, Dict, Any
+
+# Functions in this module run inside the document parser worker processes.
+# Keep them at module level so they can be pickled by the ProcessPoolExecutor.
+
+SUPPORTED_EXTENSIONS = ["pdf", "docx", "doc"]
+
+# Part of the document cache key. Change it whenever parsing output changes;
+# the settings below are part of the key as well.
+PARSER_STRATEGY = "tiered-v1"
+
+# A page whose text layer has fewer characters than this is sent to OCR
+MIN_PAGE_CHARS = int(os.environ.get("PARSER_MIN_PAGE_CHARS", "40"))
+
+# unstructured strategy for pages without a usable text layer
+FALLBACK_STRATEGY = os.environ.get("PARSER_FALLBACK_STRATEGY", "hi_res")
+
+# Tesseract languages for the OCR fallback
+OCR_LANGUAGES = [lang.strip() for lang in os.environ.get("PARSER_OCR_LANGUAGES", "deu,fra,ita,eng").split(",") if lang.strip()]
+
+
+def parser_fingerprint() -> str:
+    """
+    Parser part of the document cache key: the strategy version plus the
+    settings that change the extracted text.
+    """
+    return f"{PARSER_STRATEGY}-{MIN_PAGE_CHARS}-{FALLBACK_STRATEGY}-{'+'.join(OCR_LANGUAGES)}"
+
+
+def init_worker():
+    """
+    Set up logging (the parent's log writer thread is not inherited) and import
+    unstructured once per worker process, so jobs don't pay for loading the
+    NLP/vision stack.
+    """
+    from app.logging_setup import configure_logging
+    configure_logging()
+    import PyPDF2  # noqa: F401
+    from unstructured.partition.pdf import partition_pdf  # noqa: F401
+    from unstructured.partition.docx import partition_docx  # noqa: F401
+
+
+def warm_up() -> int:
+    """
+    No-op job used to start the worker processes ahead of the first upload.
+    """
+    return os.getpid()
+
+
+def is_usable_text(text: str) -> bool:
+    """
+    Decide whether a page's text layer can be used as-is.
+
+    Scanned pages have no text layer at all, and PDFs with broken font encodings
+    produce replacement characters, control characters or mostly symbols.
+    """
+    stripped = "".join(text.split())
+    if len(stripped) < MIN_PAGE_CHARS:
+        return False
+
+    garbage = sum(1 for char in stripped if char == "\ufffd" or (ord(char) < 32))
+    if garbage / len(stripped) > 0.02:
+        return False
+
+    alphanumeric = sum(1 for char in stripped if char.isalnum())
+    return alphanumeric / len(stripped) >= 0.5
+
+
+def _partition_pdf_pages(reader, page_indexes: List[int]) -> Dict[int, List[str]]:
+    """
+    Run unstructured with the fallback strategy on a subset of the pages and
+    return the element texts per original page index.
+    """
+    from PyPDF2 import PdfWriter
+    from unstructured.partition.pdf import partition_pdf
+
+    writer = PdfWriter()
+    for index in page_indexes:
+        writer.add_page(reader.pages[index])
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as subset_file:
+        writer.write(subset_file)
+        subset_path = subset_file.name
+
+    try:
+        elements = partition_pdf(
+            filename=subset_path,
+            strategy=FALLBACK_STRATEGY,
+            languages=OCR_LANGUAGES
+        )
+    finally:
+        os.unlink(subset_path)
+
+    texts_by_page: Dict[int, List[str]] = {index: [] for index in page_indexes}
+    for element in elements:
+        # page_number is 1-based and relative to the subset document
+        subset_page = getattr(element.metadata, "page_number", None) or 1
+        original_index = page_indexes[min(subset_page, len(page_indexes)) - 1]
+        texts_by_page[original_index].append(str(element))
+    return texts_by_page
+
+
+def extract_pdf(file_path: str) -> Dict[str, Any]:
+    """
+    Extract the text of a PDF page by page.
+
+    Pages with a usable text layer are read with PyPDF2, which takes milliseconds.
+    Only pages without one (scans, broken encodings) go through unstructured's
+    layout/OCR pipeline. If PyPDF2 cannot open the file at all, the whole file is
+    handed to unstructured.
+
+    Returns:
+        Dict with "elements" (list of texts in page order) and "pages"
+        (per-page strategy metadata)
+    """
+    from PyPDF2 import PdfReader
+
+    try:
+        reader = PdfReader(file_path)
+        page_count = len(reader.pages)
+    except Exception:
+        from unstructured.partition.pdf import partition_pdf
+        elements = partition_pdf(filename=file_path)
+        page_numbers = sorted({getattr(element.metadata, "page_number", None) or 1 for element in elements})
+        return {
+            "elements": [str(element) for element in elements],
+            "pages": [{"page": page, "strategy": "unstructured"} for page in page_numbers]
+        }
+
+    texts_by_page: Dict[int, List[str]] = {}
+    strategies: Dict[int, str] = {}
+    fallback_pages: List[int] = []
+
+    for index in range(page_count):
+        try:
+            text = reader.pages[index].extract_text() or ""
+        except Exception:
+            text = ""
+
+        if is_usable_text(text):
+            texts_by_page[index] = [text.strip()]
+            strategies[index] = "text_layer"
+        else:
+            fallback_pages.append(index)
+
+    if fallback_pages:
+        texts_by_page.update(_partition_pdf_pages(reader, fallback_pages))
+        for index in fallback_pages:
+            strategies[index] = FALLBACK_STRATEGY
+
+    elements: List[str] = []
+    pages: List[Dict[str, Any]] = []
+    for index in range(page_count):
+        page_texts = texts_by_page.get(index, [])
+        elements.extend(page_texts)
+        pages.append({
+            "page": index + 1,
+            "strategy": strategies[index],
+            "characters": sum(len(text) for text in page_texts)
+        })
+
+    return {"elements": elements, "pages": pages}
+
+
+def parse_document(file_path: str, file_extension: str) -> Dict[str, Any]:
+    """
+    Extract the text of an uploaded document.
+
+    Args:
+        file_path: Path of the uploaded file on disk
+        file_extension: Lower-case file extension (pdf, docx or doc)
+
+    Returns:
+        Dict with "elements" (text per element) and "pages" (per-page strategy
+        metadata, empty for Word documents)
+    """
+    if file_extension == "pdf":
+        return extract_pdf(file_path)
+    elif file_extension in ["docx", "doc"]:
+        from unstructured.partition.docx import partition_docx
+        elements = partition_docx(filename=file_path)
+        return {"elements": [str(element) for element in elements], "pages": []}
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
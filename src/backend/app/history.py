@@ -0,0 +1,303 @@
+import os
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional, token counts are estimated without it
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Input tokens above which older turns are compacted, 0 disables compaction
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "8000"))
+
+# User turns at the end of the conversation that are always sent verbatim
+HISTORY_KEEP_RECENT_TURNS = int(os.environ.get("HISTORY_KEEP_RECENT_TURNS", "4"))
+
+# User messages above this size (pasted documents) are replaced by an excerpt
+HISTORY_DOCUMENT_TOKENS = int(os.environ.get("HISTORY_DOCUMENT_TOKENS", "1000"))
+
+# Rolling summaries kept in memory
+HISTORY_SUMMARY_CACHE_ENTRIES = int(os.environ.get("HISTORY_SUMMARY_CACHE_ENTRIES", "1000"))
+
+# Tokens added per item for role and message framing
+MESSAGE_OVERHEAD_TOKENS = 4
+
+EXCERPT_HEAD_CHARS = 600
+EXCERPT_TAIL_CHARS = 300
+
+SUMMARY_PREFIX = "Zusammenfassung des bisherigen Gesprächs (ältere Nachrichten wurden gekürzt):\n"
+
+Summarizer = Callable[[Optional[str], List[Dict[str, Any]]], Awaitable[str]]
+
+
+def item_text(item: Dict[str, Any]) -> str:
+    """
+    Text of an input item: message content, or the output / arguments of tool items.
+    """
+    content = item.get("content", item.get("output", item.get("arguments", "")))
+    if isinstance(content, list):
+        # Output messages from earlier runs: [{"type": "output_text", "text": ...}]
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    if not isinstance(content, str):
+        return str(content)
+    return content
+
+
+def item_kind(item: Dict[str, Any]) -> str:
+    return item.get("role") or ":".join(filter(None, [item.get("type"), item.get("name")]))
+
+
+def _item_digest(item: Dict[str, Any]) -> bytes:
+    payload = f"{item_kind(item)}\x00{item_text(item)}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken if it is installed, and estimates them from the
+    text length (4 characters per token) otherwise. Counts are cached by content
+    digest, so each message is only counted once across turns.
+    """
+
+    def __init__(self, encoding: str = "o200k_base", max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[bytes, int]" = OrderedDict()
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding {encoding}, estimating tokens: {str(e)}")
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count_text(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def count_item(self, item: Dict[str, Any], digest: Optional[bytes] = None) -> int:
+        digest = digest or _item_digest(item)
+        count = self._counts.get(digest)
+        if count is None:
+            count = self.count_text(item_text(item)) + MESSAGE_OVERHEAD_TOKENS
+            self._counts[digest] = count
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        else:
+            self._counts.move_to_end(digest)
+        return count
+
+
+@dataclass
+class CompactionResult:
+    items: List[Dict[str, Any]]
+    original_tokens: int
+    tokens: int
+    summarized_items: int = 0
+    excerpted_documents: int = 0
+    summary_pending: bool = False
+
+    @property
+    def compacted(self) -> bool:
+        return self.summarized_items > 0 or self.excerpted_documents > 0
+
+    def log_fields(self) -> Dict[str, Any]:
+        return {
+            "history_tokens": self.original_tokens,
+            "history_compacted_tokens": self.tokens,
+            "history_summarized_items": self.summarized_items,
+            "history_excerpted_documents": self.excerpted_documents,
+            "history_summary_pending": self.summary_pending
+        }
+
+
+@dataclass
+class _SummaryState:
+    entries: "OrderedDict[bytes, str]" = field(default_factory=OrderedDict)
+    pending: Set[bytes] = field(default_factory=set)
+    tasks: Set[asyncio.Task] = field(default_factory=set)
+
+
+class HistoryCompactor:
+    """
+    Keeps the model input of long conversations within a token budget.
+
+    Below the budget the history is sent unchanged. Above it, the last
+    `keep_recent_turns` user turns (with the answers and tool calls that
+    followed them) stay verbatim; older turns are replaced by a rolling summary
+    and large pasted documents among them by a short excerpt.
+
+    Summaries are never created on the request path: the first turn over the
+    budget schedules a background summary of the older turns and is sent with
+    excerpts only; later turns use the newest summary that covers a prefix of
+    their history and extend it in the background. Summaries are keyed by a
+    hash chain over the summarized items, so finding the longest covered prefix
+    is a single pass over the history.
+    """
+
+    def __init__(
+        self,
+        summarize: Summarizer,
+        budget_tokens: int = HISTORY_TOKEN_BUDGET,
+        keep_recent_turns: int = HISTORY_KEEP_RECENT_TURNS,
+        document_tokens: int = HISTORY_DOCUMENT_TOKENS,
+        max_summaries: int = HISTORY_SUMMARY_CACHE_ENTRIES,
+        counter: Optional[TokenCounter] = None
+    ):
+        self.summarize = summarize
+        self.budget_tokens = budget_tokens
+        self.keep_recent_turns = max(1, keep_recent_turns)
+        self.document_tokens = document_tokens
+        self.max_summaries = max_summaries
+        self.counter = counter or TokenCounter()
+        self._summaries = _SummaryState()
+        self._counters = {"compactions": 0, "summary_hits": 0, "summaries_created": 0, "summary_errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_tokens > 0
+
+    def _recent_start(self, items: List[Dict[str, Any]]) -> int:
+        """
+        Index of the first item of the verbatim window, always a user message.
+        """
+        turns = 0
+        for index in range(len(items) - 1, -1, -1):
+            if items[index].get("role") == "user":
+                turns += 1
+                if turns == self.keep_recent_turns:
+                    return index
+        return 0
+
+    def _excerpt(self, item: Dict[str, Any], tokens: int) -> Dict[str, Any]:
+        text = item_text(item)
+        excerpt = (
+            f"[Gekürztes Dokument ({tokens} Tokens), Anfang und Ende:]\n"
+            f"{text[:EXCERPT_HEAD_CHARS].rstrip()}\n[…]\n{text[-EXCERPT_TAIL_CHARS:].lstrip()}"
+        )
+        return {"role": item["role"], "content": excerpt}
+
+    def compact(self, items: List[Dict[str, Any]]) -> CompactionResult:
+        """
+        Compact a conversation to the token budget. Cheap enough for the request
+        path: token counts are cached and no model is called.
+        """
+        digests = [_item_digest(item) for item in items]
+        counts = [self.counter.count_item(item, digest) for item, digest in zip(items, digests)]
+        total = sum(counts)
+        if not self.enabled or total <= self.budget_tokens:
+            return CompactionResult(items=items, original_tokens=total, tokens=total)
+
+        split = self._recent_start(items)
+        if split == 0:
+            return CompactionResult(items=items, original_tokens=total, tokens=total)
+
+        # Hash chain over the older items: prefixes[k] identifies items[:k]
+        prefixes = [b""]
+        for digest in digests[:split]:
+            prefixes.append(hashlib.blake2b(prefixes[-1] + digest, digest_size=16).digest())
+
+        covered, summary = 0, None
+        for length in range(split, 0, -1):
+            summary = self._summaries.entries.get(prefixes[length])
+            if summary is not None:
+                self._summaries.entries.move_to_end(prefixes[length])
+                covered = length
+                break
+
+        compacted: List[Dict[str, Any]] = []
+        tokens = 0
+        if summary is not None:
+            self._counters["summary_hits"] += 1
+            compacted.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+            tokens += self.counter.count_text(summary) + MESSAGE_OVERHEAD_TOKENS
+
+        excerpted = 0
+        for item, count in zip(items[covered:split], counts[covered:split]):
+            if item.get("role") == "user" and self.document_tokens > 0 and count > self.document_tokens:
+                item = self._excerpt(item, count)
+                count = self.counter.count_text(item["content"]) + MESSAGE_OVERHEAD_TOKENS
+                excerpted += 1
+            compacted.append(item)
+            tokens += count
+        compacted.extend(items[split:])
+        tokens += sum(counts[split:])
+
+        pending = covered < split
+        if pending:
+            self._schedule_summary(prefixes[split], summary, items[covered:split])
+
+        self._counters["compactions"] += 1
+        return CompactionResult(
+            items=compacted,
+            original_tokens=total,
+            tokens=tokens,
+            summarized_items=covered,
+            excerpted_documents=excerpted,
+            summary_pending=pending
+        )
+
+    def _schedule_summary(self, key: bytes, previous: Optional[str], new_items: List[Dict[str, Any]]) -> None:
+        state = self._summaries
+        if key in state.pending:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        state.pending.add(key)
+        task = loop.create_task(self._create_summary(key, previous, new_items))
+        state.tasks.add(task)
+        task.add_done_callback(state.tasks.discard)
+
+    async def _create_summary(self, key: bytes, previous: Optional[str], new_items: List[Dict[str, Any]]) -> None:
+        try:
+            summary = await self.summarize(previous, new_items)
+            entries = self._summaries.entries
+            entries[key] = summary
+            entries.move_to_end(key)
+            while len(entries) > self.max_summaries:
+                entries.popitem(last=False)
+            self._counters["summaries_created"] += 1
+            logger.info(f"Summarized {len(new_items)} older conversation items ({len(summary)} characters)")
+        except Exception as e:
+            self._counters["summary_errors"] += 1
+            logger.error(f"Error summarizing conversation history: {str(e)}")
+        finally:
+            self._summaries.pending.discard(key)
+
+    async def shutdown(self) -> None:
+        """
+        Cancel background summaries that are still running.
+        """
+        tasks = list(self._summaries.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "budget_tokens": self.budget_tokens,
+            "keep_recent_turns": self.keep_recent_turns,
+            "document_tokens": self.document_tokens,
+            "exact_token_counts": self.counter.exact,
+            "summaries": len(self._summaries.entries),
+            "summaries_pending": len(self._summaries.pending)
+        }
+
+
+def transcript(items: List[Dict[str, Any]]) -> str:
+    """
+    Plain text rendering of conversation items for the summary model.
+    """
+    return "\n\n".join(f"{item_kind(item)}: {item_text(item)}" for item in items if item_text(item))
@@ -0,0 +1,210 @@
+import os
+import re
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Root log level and per-logger overrides, e.g. "app.app=DEBUG,httpx=WARNING"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "httpx=WARNING")
+
+# "json" for one JSON object per line, "text" for the classic format
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+
+# Records waiting for the writer thread; further records are dropped and counted
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+# Maximum characters of a payload preview
+LOG_PREVIEW_CHARS = int(os.environ.get("LOG_PREVIEW_CHARS", "200"))
+
+# Fraction of requests whose (redacted, truncated) payloads are logged at DEBUG
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes of every LogRecord; anything else was passed via `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_REDACTIONS = [
+    (re.compile(r"Bearer\s+[A-Za-z0-9._~+/=-]+", re.IGNORECASE), "Bearer [REDACTED]"),
+    (re.compile(r"\bsk-[A-Za-z0-9_-]{10,}"), "[API_KEY]"),
+    (re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"), "[EMAIL]"),
+    (re.compile(r"\b756[.\s]?\d{4}[.\s]?\d{4}[.\s]?\d{2}\b"), "[AHV]"),
+    (re.compile(r"\b[A-Z]{2}\d{2}(?:\s?[A-Z0-9]{4}){3,7}(?:\s?[A-Z0-9]{1,3})?\b"), "[IBAN]"),
+    (re.compile(r"(?<!\w)\+?\d(?:[\s/().-]?\d){8,}"), "[PHONE]"),
+]
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as single-line JSON, including fields passed via `extra`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller: when the queue is full the record
+    is dropped and counted instead.
+    """
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_pid: Optional[int] = None
+
+
+def _build_output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def configure_logging() -> None:
+    """
+    Route all logging through a bounded queue to a background writer thread.
+
+    Safe to call more than once. Call it again in a forked child process: the
+    writer thread does not survive a fork, so a new queue and listener are started.
+    """
+    global _listener, _listener_pid
+
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+
+    for override in LOG_LEVELS.split(","):
+        if "=" in override:
+            name, level = override.split("=", 1)
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, _build_output_handler(), respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def stop_logging() -> None:
+    """
+    Flush queued records and stop the writer thread.
+    """
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def redact(text: str) -> str:
+    """
+    Mask credentials and personal data (e-mail addresses, phone numbers, IBANs,
+    AHV numbers) in free text.
+    """
+    for pattern, replacement in _REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def preview(value: Any, limit: int = LOG_PREVIEW_CHARS) -> str:
+    """
+    Redacted preview of a payload, truncated to `limit` characters.
+    """
+    if not isinstance(value, str):
+        try:
+            value = json.dumps(value, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            value = str(value)
+    # Only redact what will be shown, so large payloads stay cheap
+    truncated = len(value) > limit
+    text = redact(value[:limit])
+    if truncated:
+        text += f"... (+{len(value) - limit} chars)"
+    return text
+
+
+def log_payload(logger: logging.Logger, label: str, payload: Any, **fields: Any) -> None:
+    """
+    Log a redacted payload preview at DEBUG for a sample of calls
+    (LOG_PAYLOAD_SAMPLE_RATE). Costs nothing when DEBUG is off for the logger.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    logger.debug(label, extra={"payload": preview(payload), **fields})
+
+
+def get_log_levels() -> Dict[str, Any]:
+    """
+    Effective levels of the root logger and all loggers with an explicit level.
+    """
+    levels = {"root": logging.getLevelName(logging.getLogger().level)}
+    for name, logger in sorted(logging.Logger.manager.loggerDict.items()):
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+            levels[name] = logging.getLevelName(logger.level)
+    return {
+        "levels": levels,
+        "payload_sample_rate": LOG_PAYLOAD_SAMPLE_RATE,
+        "dropped_records": DroppingQueueHandler.dropped
+    }
+
+
+def set_log_level(logger_name: str, level: str) -> None:
+    """
+    Change the level of one logger ("root" for the root logger) at runtime.
+
+    Raises:
+        ValueError: Unknown level name
+    """
+    level = level.upper()
+    if not isinstance(logging.getLevelName(level), int):
+        raise ValueError(f"Unknown log level: {level}")
+    logger = logging.getLogger() if logger_name in ("", "root") else logging.getLogger(logger_name)
+    logger.setLevel(level)
+
+
+def set_payload_sample_rate(rate: float) -> None:
+    """
+    Change LOG_PAYLOAD_SAMPLE_RATE at runtime.
+
+    Raises:
+        ValueError: Rate outside 0..1
+    """
+    global LOG_PAYLOAD_SAMPLE_RATE
+    if not 0.0 <= rate <= 1.0:
+        raise ValueError("The sample rate must be between 0 and 1")
+    LOG_PAYLOAD_SAMPLE_RATE = rate
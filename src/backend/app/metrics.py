@@ -0,0 +1,349 @@
+import os
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from agents import Agent, RunContextWrapper, RunHooks
+from agents.items import ModelResponse
+
+# Latency buckets in seconds, from cache hits to long model calls and OCR runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# Seconds between event loop lag samples, 0 disables the monitor
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.25"))
+
+# Scope of the HTTP request being handled, set by MetricsMiddleware
+_current_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("metrics_scope", default=None)
+_request_started: ContextVar[Optional[float]] = ContextVar("metrics_request_started", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """
+    Monotonic counter with labels, rendered in the Prometheus text format.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Histogram with labels and fixed buckets, rendered in the Prometheus text format.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: counts per bucket (non-cumulative), sum, count
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = ([0] * (len(self.buckets) + 1), [0.0, 0.0])
+            counts, totals = self._values[key]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, totals) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {int(totals[1])}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {totals[0]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {int(totals[1])}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str]) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "manona_http_request_duration_seconds",
+    "Duration of HTTP requests until the response is complete",
+    ["endpoint", "method", "status"]
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "manona_stage_duration_seconds",
+    "Duration of processing stages within a request",
+    ["stage", "endpoint", "agent"]
+)
+MODEL_CALL_SECONDS = REGISTRY.histogram(
+    "manona_model_call_duration_seconds",
+    "Duration of single model calls",
+    ["agent", "model"]
+)
+MODEL_TOKENS = REGISTRY.counter(
+    "manona_model_tokens_total",
+    "Tokens used by model calls",
+    ["agent", "model", "kind"]
+)
+AGENT_HANDOFFS = REGISTRY.counter(
+    "manona_agent_handoffs_total",
+    "Handoffs between agents",
+    ["from_agent", "to_agent"]
+)
+PRE_ROUTER_DECISIONS = REGISTRY.counter(
+    "manona_pre_router_decisions_total",
+    "Conversations routed to a specialist without triage, sent to triage, or routed in shadow mode only",
+    ["decision", "role", "method"]
+)
+RESPONSE_CACHE_LOOKUPS = REGISTRY.counter(
+    "manona_response_cache_lookups_total",
+    "Response cache lookups for agents that opted in",
+    ["agent", "result"]
+)
+LLM_CALL_RETRIES = REGISTRY.counter(
+    "manona_llm_call_retries_total",
+    "Model calls repeated after a rate limit, server error, timeout or connection error",
+    ["endpoint", "reason"]
+)
+LLM_FALLBACKS = REGISTRY.counter(
+    "manona_llm_fallbacks_total",
+    "Model calls sent to the fallback model after the primary endpoint failed",
+    ["endpoint", "fallback"]
+)
+LLM_CIRCUIT_TRANSITIONS = REGISTRY.counter(
+    "manona_llm_circuit_transitions_total",
+    "Circuit breaker state changes per model endpoint",
+    ["endpoint", "state"]
+)
+EVENT_LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "manona_event_loop_lag_seconds",
+    "Delay of the event loop in waking up a sleeping task, i.e. time it was blocked",
+    [],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+
+def current_endpoint() -> str:
+    """
+    Route path of the request being handled (e.g. "/agent"), or "" outside a request.
+    """
+    scope = _current_scope.get()
+    if scope is None:
+        return ""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def model_label(model: Any) -> str:
+    if model is None or isinstance(model, str):
+        return model or "default"
+    return getattr(model, "model", type(model).__name__)
+
+
+@contextmanager
+def stage_timer(stage: str, agent: str = "") -> Iterator[None]:
+    """
+    Record the duration of a block in manona_stage_duration_seconds, labelled
+    with the current endpoint.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage, endpoint=current_endpoint(), agent=agent)
+
+
+def mark_request_parsed() -> None:
+    """
+    Record the time from the start of the request until the handler runs, i.e.
+    receiving and validating the body. Call it first thing in a handler.
+    """
+    started = _request_started.get()
+    if started is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="request_parse", endpoint=current_endpoint(), agent="")
+
+
+def record_token_usage(agent: str, model: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0) -> None:
+    """
+    Count tokens of a model call. `input_tokens` includes the cached ones, which
+    are also counted separately as kind="cached_input".
+    """
+    MODEL_TOKENS.inc(input_tokens or 0, agent=agent, model=model, kind="input")
+    MODEL_TOKENS.inc(cached_input_tokens or 0, agent=agent, model=model, kind="cached_input")
+    MODEL_TOKENS.inc(output_tokens or 0, agent=agent, model=model, kind="output")
+
+
+def cached_tokens(details: Any) -> int:
+    """
+    cached_tokens from Responses (input_tokens_details) or chat completions
+    (prompt_tokens_details) usage details, 0 if the provider doesn't report it.
+    """
+    return getattr(details, "cached_tokens", 0) or 0
+
+
+def usage_summary(usage: Any) -> Dict[str, Any]:
+    """
+    Token totals of a run (RunResult.context_wrapper.usage) for logging.
+    """
+    cached = cached_tokens(getattr(usage, "input_tokens_details", None))
+    input_tokens = usage.input_tokens or 0
+    return {
+        "model_requests": usage.requests,
+        "input_tokens": input_tokens,
+        "cached_input_tokens": cached,
+        "uncached_input_tokens": input_tokens - cached,
+        "output_tokens": usage.output_tokens or 0
+    }
+
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL_SECONDS) -> None:
+    """
+    Sleep for `interval` in a loop and record how much later than requested the
+    task wakes up. Runs until cancelled.
+    """
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+class MetricsRunHooks(RunHooks):
+    """
+    Run hooks that time every model call and agent turn and count tokens and
+    handoffs. Create one instance per run.
+    """
+
+    def __init__(self):
+        self._llm_started: Dict[str, float] = {}
+        self._agent_started: Optional[Tuple[str, float]] = None
+
+    def _finish_agent(self) -> None:
+        if self._agent_started is not None:
+            name, started = self._agent_started
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="agent_run", endpoint=current_endpoint(), agent=name)
+            self._agent_started = None
+
+    async def on_agent_start(self, context: RunContextWrapper, agent: Agent) -> None:
+        self._finish_agent()
+        self._agent_started = (agent.name, time.perf_counter())
+
+    async def on_agent_end(self, context: RunContextWrapper, agent: Agent, output: Any) -> None:
+        self._finish_agent()
+
+    async def on_handoff(self, context: RunContextWrapper, from_agent: Agent, to_agent: Agent) -> None:
+        AGENT_HANDOFFS.inc(from_agent=from_agent.name, to_agent=to_agent.name)
+
+    async def on_llm_start(self, context: RunContextWrapper, agent: Agent, system_prompt: Optional[str], input_items: List[Any]) -> None:
+        self._llm_started[agent.name] = time.perf_counter()
+
+    async def on_llm_end(self, context: RunContextWrapper, agent: Agent, response: ModelResponse) -> None:
+        model = model_label(agent.model)
+        started = self._llm_started.pop(agent.name, None)
+        if started is not None:
+            MODEL_CALL_SECONDS.observe(time.perf_counter() - started, agent=agent.name, model=model)
+        usage = response.usage
+        if usage is not None:
+            record_token_usage(
+                agent.name,
+                model,
+                usage.input_tokens,
+                usage.output_tokens,
+                cached_tokens(getattr(usage, "input_tokens_details", None))
+            )
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records the duration of every HTTP request, labelled
+    with its route, and makes the route available to stage timers.
+    """
+
+    def __init__(self, app, exclude_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        scope_token = _current_scope.set(scope)
+        started_token = _request_started.set(started)
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                endpoint=current_endpoint(),
+                method=scope["method"],
+                status=str(status["code"])
+            )
+            _current_scope.reset(scope_token)
+            _request_started.reset(started_token)
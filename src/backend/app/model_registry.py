@@ -0,0 +1,236 @@
+import os
+import json
+import hashlib
+import logging
+from dataclasses import dataclass, asdict, replace
+from typing import Awaitable, Callable, Dict, Optional, Any, Tuple, TypeVar, Union
+
+from openai import AsyncOpenAI
+from agents import Model, ModelSettings, OpenAIChatCompletionsModel, OpenAIProvider
+
+from app.openai_client import create_openai_client, get_openai_client
+from app.resilience import ResilientModel, RetryPolicy, call_with_fallback
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# Roles that can be assigned their own model ("fallback" is used when a role's endpoint fails)
+MODEL_ROLES = ["triage", "road_traffic", "betreibung", "other", "summary", "report_summary", "history_summary", "fallback"]
+
+DEFAULT_MODEL = "gpt-4o"
+
+
+@dataclass(frozen=True)
+class ModelEndpoint:
+    """
+    Model and endpoint used for one role.
+
+    Without base_url the role uses the shared OpenAI client and the Agents SDK's
+    default API. With base_url the role talks to an OpenAI-compatible server
+    (Ollama, vLLM, a local mock, ...) through the chat completions API.
+    """
+    model: str
+    base_url: Optional[str] = None
+    api_key: Optional[str] = None
+    api_key_env: Optional[str] = None
+
+    def resolved_api_key(self) -> Optional[str]:
+        if self.api_key_env:
+            return os.environ.get(self.api_key_env)
+        return self.api_key
+
+
+class ModelRegistry:
+    """
+    Maps agent roles to models and endpoints, and keeps one pooled client per
+    custom endpoint.
+    """
+
+    def __init__(self, default: ModelEndpoint, roles: Dict[str, ModelEndpoint]):
+        self.default = default
+        self.roles = roles
+        self._clients: Dict[Tuple[str, Optional[str]], AsyncOpenAI] = {}
+
+    def endpoint(self, role: str) -> ModelEndpoint:
+        return self.roles.get(role, self.default)
+
+    def fallback(self, role: str) -> Optional[ModelEndpoint]:
+        """
+        The endpoint to use when the role's endpoint fails, if a fallback is
+        configured and differs from it.
+        """
+        fallback = self.roles.get("fallback")
+        if fallback is None or fallback == self.endpoint(role):
+            return None
+        return fallback
+
+    def client(self, role: str) -> AsyncOpenAI:
+        """
+        Client for a role: the shared OpenAI client, or a pooled client for the
+        role's custom endpoint.
+        """
+        return self._client(self.endpoint(role))
+
+    def _client(self, endpoint: ModelEndpoint) -> AsyncOpenAI:
+        if not endpoint.base_url:
+            return get_openai_client()
+
+        api_key = endpoint.resolved_api_key()
+        key = (endpoint.base_url, api_key)
+        if key not in self._clients:
+            logger.info(f"Creating OpenAI-compatible client for {endpoint.base_url}")
+            # Local servers usually ignore the key, but the client requires one
+            self._clients[key] = create_openai_client(base_url=endpoint.base_url, api_key=api_key or "local")
+        return self._clients[key]
+
+    def _model(self, endpoint: ModelEndpoint) -> Model:
+        if not endpoint.base_url:
+            # Resolved like the SDK resolves model names: default client and API
+            return OpenAIProvider().get_model(endpoint.model)
+        return OpenAIChatCompletionsModel(model=endpoint.model, openai_client=self._client(endpoint))
+
+    def agent_model(self, role: str) -> Model:
+        """
+        Value for the `model` argument of an Agent: the role's model behind
+        retries, the circuit breaker and the fallback model (see app.resilience).
+        """
+        endpoint = self.endpoint(role)
+        fallback = self.fallback(role)
+        return ResilientModel(
+            primary=lambda: self._model(endpoint),
+            endpoint=endpoint_name(endpoint),
+            fallback=(lambda: self._model(fallback)) if fallback else None,
+            fallback_endpoint=endpoint_name(fallback) if fallback else None,
+            model=endpoint.model
+        )
+
+    async def call(self, role: str, make_call: Callable[[AsyncOpenAI, str], Awaitable[T]], policy: RetryPolicy = RetryPolicy()) -> T:
+        """
+        Make a direct API call for a role, e.g. a chat completion, with the same
+        retries, circuit breaker and fallback as agent runs. `make_call`
+        receives the client and the model name.
+        """
+        endpoint = self.endpoint(role)
+        fallback = self.fallback(role)
+        primary_call = (endpoint_name(endpoint), lambda: make_call(self._client(endpoint), endpoint.model))
+        fallback_call = (endpoint_name(fallback), lambda: make_call(self._client(fallback), fallback.model)) if fallback else None
+        return await call_with_fallback(primary_call, fallback_call, policy)
+
+    def model_settings(self, role: str, instructions: str) -> ModelSettings:
+        """
+        Model settings for an agent. OpenAI endpoints get a prompt_cache_key that
+        is the same for every conversation handled by this agent and changes
+        with its instructions, so requests sharing the static prefix
+        (instructions and handoff tools) are routed to the same prompt cache.
+        Without it the SDK generates a new key per run.
+        """
+        endpoint = self.endpoint(role)
+        if endpoint.base_url:
+            return ModelSettings()
+        fingerprint = hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:12]
+        return ModelSettings(extra_args={"prompt_cache_key": f"manona-{role}-{fingerprint}"})
+
+    def describe(self, role: str) -> Dict[str, Any]:
+        if role == "fallback" and "fallback" not in self.roles:
+            # Unlike other roles, an unset fallback does not use the default model
+            return {"role": role, "model": None, "disabled": True}
+        endpoint = self.endpoint(role)
+        return {
+            "role": role,
+            "model": endpoint.model,
+            "base_url": endpoint.base_url or "openai",
+            "api": "chat_completions" if endpoint.base_url else "default"
+        }
+
+    async def close(self) -> None:
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
+
+
+def endpoint_name(endpoint: ModelEndpoint) -> str:
+    """
+    Name of an endpoint in logs, metrics and circuit breakers, e.g. "gpt-4o@openai".
+    """
+    return f"{endpoint.model}@{endpoint.base_url or 'openai'}"
+
+
+def describe_model(model: Union[str, Model, None]) -> Any:
+    """
+    JSON-friendly representation of an Agent's `model` attribute.
+    """
+    if model is None or isinstance(model, str):
+        return model
+    if isinstance(model, ResilientModel):
+        return {"endpoint": model.endpoint, "fallback": model.fallback_endpoint}
+    if isinstance(model, OpenAIChatCompletionsModel):
+        return {"model": model.model, "base_url": str(model._client.base_url)}
+    return type(model).__name__
+
+
+def _parse_endpoint(value: Union[str, Dict[str, Any]], base: ModelEndpoint) -> ModelEndpoint:
+    if isinstance(value, str):
+        return replace(base, model=value)
+    known = {key: value[key] for key in asdict(base) if key in value}
+    return replace(base, **known)
+
+
+def load_model_registry() -> ModelRegistry:
+    """
+    Build the model registry from the JSON file in MODEL_CONFIG (if set) and
+    environment overrides.
+
+    The file has a "default" entry and optional per-role entries under "roles".
+    An entry is either a model name or an object with model, base_url and
+    api_key / api_key_env:
+
+        {
+          "default": {"model": "gpt-4o"},
+          "roles": {
+            "triage": "gpt-4o-mini",
+            "other": {"model": "llama3.1:8b", "base_url": "http://localhost:11434/v1", "api_key": "ollama"}
+          }
+        }
+
+    Environment overrides: MODEL_DEFAULT and MODEL_BASE_URL for the default,
+    MODEL_<ROLE> and MODEL_<ROLE>_BASE_URL per role (e.g. MODEL_TRIAGE).
+    """
+    config: Dict[str, Any] = {}
+    config_path = os.environ.get("MODEL_CONFIG")
+    if config_path:
+        with open(config_path, "r", encoding="utf-8") as config_file:
+            config = json.load(config_file)
+        logger.info(f"Loaded model config from {config_path}")
+
+    default = _parse_endpoint(config.get("default", {}), ModelEndpoint(model=DEFAULT_MODEL))
+    if os.environ.get("MODEL_DEFAULT"):
+        default = replace(default, model=os.environ["MODEL_DEFAULT"])
+    if os.environ.get("MODEL_BASE_URL"):
+        default = replace(default, base_url=os.environ["MODEL_BASE_URL"])
+
+    roles: Dict[str, ModelEndpoint] = {}
+    for role, value in config.get("roles", {}).items():
+        if role not in MODEL_ROLES:
+            logger.warning(f"Ignoring unknown model role in config: {role}")
+            continue
+        roles[role] = _parse_endpoint(value, default)
+
+    for role in MODEL_ROLES:
+        model = os.environ.get(f"MODEL_{role.upper()}")
+        base_url = os.environ.get(f"MODEL_{role.upper()}_BASE_URL")
+        if model or base_url:
+            endpoint = roles.get(role, default)
+            roles[role] = replace(endpoint, model=model or endpoint.model, base_url=base_url or endpoint.base_url)
+
+    registry = ModelRegistry(default, roles)
+    for role in MODEL_ROLES:
+        if role != "fallback":
+            logger.info(f"Model for {role}: {registry.describe(role)}")
+    # The fallback is skipped for roles that already use its endpoint
+    fallback_roles = [role for role in MODEL_ROLES if role != "fallback" and registry.fallback(role)]
+    if fallback_roles:
+        logger.info(f"Fallback model: {registry.describe('fallback')} for {', '.join(fallback_roles)}")
+    else:
+        logger.info("Fallback model: disabled")
+    return registry
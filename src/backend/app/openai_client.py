@@ -0,0 +1,71 @@
+import os
+import logging
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from agents import set_default_openai_client
+
+logger = logging.getLogger(__name__)
+
+# Connection pool settings for the OpenAI API
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "60"))
+OPENAI_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_TIMEOUT_SECONDS", "120"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_CONNECT_TIMEOUT_SECONDS", "10"))
+
+_client: Optional[AsyncOpenAI] = None
+
+
+def create_openai_client(**kwargs) -> AsyncOpenAI:
+    """
+    Create an AsyncOpenAI client with a bounded, keep-alive connection pool.
+    Keyword arguments (e.g. base_url, api_key) are passed to AsyncOpenAI.
+    """
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS
+        )
+    )
+    kwargs.setdefault("timeout", httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS))
+    # Retries are handled by app.resilience, with deadlines and the circuit breaker
+    kwargs.setdefault("max_retries", 0)
+    return AsyncOpenAI(http_client=http_client, **kwargs)
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """
+    The process-wide OpenAI client. Created on first use if the application
+    lifespan has not started it yet.
+    """
+    global _client
+    if _client is None:
+        start_openai_client()
+    return _client
+
+
+def start_openai_client() -> AsyncOpenAI:
+    """
+    Create the process-wide client and make the Agents SDK use it as well, so
+    agent runs and summary calls share one connection pool.
+    """
+    global _client
+    if _client is None:
+        _client = create_openai_client()
+        set_default_openai_client(_client)
+        logger.info(
+            f"Created shared OpenAI client (max {OPENAI_MAX_CONNECTIONS} connections, "
+            f"{OPENAI_MAX_KEEPALIVE_CONNECTIONS} keep-alive, expiry {OPENAI_KEEPALIVE_EXPIRY_SECONDS}s)"
+        )
+    return _client
+
+
+async def close_openai_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+        logger.info("Closed shared OpenAI client")
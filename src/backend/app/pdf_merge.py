@@ -0,0 +1,197 @@
+import io
+import logging
+import tempfile
+from typing import TYPE_CHECKING, BinaryIO, Callable, Iterator, List, Tuple
+
+# PyPDF2 is imported when a report is merged, not when the app starts
+if TYPE_CHECKING:
+    import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+# Merged reports up to this size stay in memory, larger ones are spooled to disk
+OUTPUT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Chunk size used to stream the merged report to the client
+OUTPUT_CHUNK_SIZE = 256 * 1024
+
+
+class AttachmentError(Exception):
+    """
+    Raised when an attachment can't be opened (empty or invalid content).
+    """
+
+    def __init__(self, filename: str, message: str):
+        super().__init__(message)
+        self.filename = filename
+        self.message = message
+
+
+def add_placeholder_page(writer: "PyPDF2.PdfWriter") -> None:
+    """
+    Add a blank US Letter page in place of a document that could not be read.
+    """
+    writer.add_blank_page(width=612, height=792)
+
+
+def add_pdf(writer: "PyPDF2.PdfWriter", stream: BinaryIO, filename: str) -> int:
+    """
+    Append a PDF to the report.
+
+    The document is parsed once and the same reader is used for validation and
+    merging. Unreadable pages are skipped; if the document can't be read at all,
+    a placeholder page is added instead.
+
+    Args:
+        writer: The report being assembled
+        stream: Seekable binary stream with the PDF content
+        filename: Name of the document, used for logging
+
+    Returns:
+        Number of pages added to the report
+    """
+    import PyPDF2
+
+    pages_before = len(writer.pages)
+    stream.seek(0)
+    try:
+        reader = PyPDF2.PdfReader(stream)
+        page_count = len(reader.pages)
+        if page_count == 0:
+            logger.warning(f"PDF file {filename} has 0 pages")
+        else:
+            logger.info(f"PDF file {filename} has {page_count} pages")
+    except Exception as e:
+        logger.warning(f"PDF read error for file {filename}: {str(e)}")
+        add_placeholder_page(writer)
+        logger.warning(f"Added placeholder for {filename}")
+        return 1
+
+    # Source page number -> page added to the report, for the outline below
+    copied_pages = {}
+    for page_number in range(page_count):
+        try:
+            copied_pages[page_number] = writer.add_page(reader.pages[page_number])
+        except Exception as e:
+            logger.warning(f"Skipping unreadable page {page_number + 1} of {filename}: {str(e)}")
+    copied = len(copied_pages)
+    if copied:
+        add_outline(writer, reader, copied_pages, filename)
+
+    if page_count and copied == 0:
+        add_placeholder_page(writer)
+        logger.warning(f"Added placeholder for {filename}")
+    elif copied < page_count:
+        logger.info(f"Included {copied} of {page_count} pages of {filename}")
+
+    return len(writer.pages) - pages_before
+
+
+def add_outline(writer: "PyPDF2.PdfWriter", reader: "PyPDF2.PdfReader", copied_pages: dict, filename: str) -> None:
+    """
+    Copy the bookmarks and named destinations of a document that point to the
+    copied pages, like PdfMerger.append did. PdfWriter.append can't be used
+    because it fails as a whole on a single unreadable page. A broken outline
+    only costs the bookmarks, not the document.
+    """
+    from PyPDF2.generic import Fit
+
+    def copied_page(destination):
+        # -1 (not a page of this document) is never a key
+        return copied_pages.get(reader.get_destination_page_number(destination))
+
+    def copy_items(items: list, parent) -> None:
+        previous = parent
+        for item in items:
+            if isinstance(item, list):
+                # A nested list holds the children of the item before it
+                copy_items(item, previous)
+                continue
+            page = copied_page(item)
+            if page is None:
+                # Children of a dropped bookmark move up a level
+                previous = parent
+                continue
+            flags = item.get("/F", 0)
+            previous = writer.add_outline_item(
+                item.title,
+                page,
+                parent=parent,
+                color=item.get("/C"),
+                bold=bool(flags & 2),
+                italic=bool(flags & 1),
+                # dest_array is [page, fit type, fit arguments...]
+                fit=Fit(item["/Type"], tuple(item.dest_array[2:])),
+            )
+
+    try:
+        for destination in reader.named_destinations.values():
+            page = copied_page(destination)
+            if page is None:
+                continue
+            array = destination.dest_array
+            array[0] = page.indirect_reference
+            writer.add_named_destination_array(destination["/Title"], array)
+
+        copy_items(reader.outline, None)
+    except Exception as e:
+        logger.warning(f"Could not copy the outline of {filename}: {str(e)}")
+
+
+def merge_attachments(attachments: List[Tuple[str, Callable[[], BinaryIO]]]) -> "PyPDF2.PdfWriter":
+    """
+    Build a report writer containing all attachments in order. This is CPU-bound
+    and meant to run in a worker thread.
+
+    Args:
+        attachments: (filename, open_attachment) pairs. open_attachment returns a
+            seekable stream with the PDF; decoding work done there also runs in
+            the worker thread.
+
+    Raises:
+        AttachmentError: An attachment could not be opened
+    """
+    import PyPDF2
+
+    writer = PyPDF2.PdfWriter()
+    for filename, open_attachment in attachments:
+        try:
+            stream = open_attachment()
+        except Exception as e:
+            raise AttachmentError(filename, str(e)) from e
+        add_pdf(writer, stream, filename)
+    return writer
+
+
+def write_pdf(writer: "PyPDF2.PdfWriter") -> BinaryIO:
+    """
+    Serialize the report into a spooled temporary file (in memory for small
+    reports, on disk for large ones) and rewind it.
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=OUTPUT_SPOOL_MAX_BYTES)
+    writer.write(output)
+    writer.close()
+    output.seek(0)
+    return output
+
+
+def file_size(stream: BinaryIO) -> int:
+    position = stream.tell()
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def iter_file_chunks(stream: BinaryIO, chunk_size: int = OUTPUT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield a file in chunks and close it afterwards, for StreamingResponse.
+    """
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        stream.close()
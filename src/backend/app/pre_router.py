@@ -0,0 +1,375 @@
+"""
+In-process router that sends clear-cut conversations straight to a specialist
+agent instead of spending a model call on the triage agent.
+
+Keyword rules score every routable role; a small TF-IDF model trained from
+logged routing outcomes can be added for cases the rules don't decide. Below
+the confidence threshold the conversation goes through LLM triage as before.
+In shadow mode (the default) decisions are only logged, so they can be
+compared with the agent triage picked before routing is switched on.
+
+Train a model from JSON logs (records of "Routing outcome" with route_text):
+
+    python -m app.pre_router train logs/*.jsonl --output app/pre_router_model.json
+"""
+import os
+import re
+import sys
+import json
+import math
+import argparse
+import logging
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PRE_ROUTER_MODES = ("off", "shadow", "on")
+
+
+def _router_mode(value: str) -> str:
+    value = value.strip().lower()
+    if value in ("1", "true", "yes"):
+        return "on"
+    if value in ("0", "false", "no"):
+        return "off"
+    if value not in PRE_ROUTER_MODES:
+        logger.warning(f"Unknown PRE_ROUTER '{value}', using shadow mode")
+        return "shadow"
+    return value
+
+
+# off, shadow (decide and log, but always start at triage) or on
+PRE_ROUTER_MODE = _router_mode(os.environ.get("PRE_ROUTER", "shadow"))
+
+# Minimum confidence for routing without triage; a single strong keyword
+# (0.75) is not enough, it takes a second one pointing the same way
+PRE_ROUTER_THRESHOLD = float(os.environ.get("PRE_ROUTER_THRESHOLD", "0.8"))
+PRE_ROUTER_MODEL_THRESHOLD = float(os.environ.get("PRE_ROUTER_MODEL_THRESHOLD", "0.6"))
+
+# Minimum rule score lead of the chosen role over the runner-up
+PRE_ROUTER_MARGIN = float(os.environ.get("PRE_ROUTER_MARGIN", "2"))
+
+# JSON file with keyword rules replacing the defaults, and an optional trained model
+PRE_ROUTER_RULES = os.environ.get("PRE_ROUTER_RULES")
+PRE_ROUTER_MODEL = os.environ.get("PRE_ROUTER_MODEL")
+
+# Include the (redacted) user text in routing logs, needed to train a model
+PRE_ROUTER_LOG_TEXT = os.environ.get("PRE_ROUTER_LOG_TEXT", "false").lower() in ("1", "true", "yes")
+
+# Pseudo-score of "none of the rules", keeps single weak matches below the threshold
+RULE_SMOOTHING = 1.0
+
+# Label of conversations the triage agent answered itself; predicting it means "don't route"
+TRIAGE_LABEL = "triage"
+
+# Role -> keyword stems and weights. Stems match at the start of a word after
+# lowercasing and removing accents ("Radarfalle", "Betreibungsamt"), so
+# compounds that merely contain a stem ("Blitzschlag", "Radarsensor") don't.
+DEFAULT_RULES: Dict[str, Dict[str, float]] = {
+    "road_traffic": {
+        "geblitzt": 3, "blitzer": 3, "radarfall": 3, "radarkontroll": 3, "radarfoto": 3,
+        "rotlicht": 3, "strassenverkehr": 3, "raser": 2, "geschwindigkeit": 2, "tempo": 2,
+        "fahrausweis": 2, "fuhrerausweis": 2, "verkehr": 2, "ordnungsbusse": 2, "busse": 1,
+        "strafbefehl": 1, "alkohol": 1
+    },
+    "betreibung": {
+        "betreib": 3, "zahlungsbefehl": 3, "rechtsvorschlag": 3, "pfandung": 3,
+        "verlustschein": 3, "inkasso": 2, "konkurs": 2, "mahnung": 1, "forderung": 1, "schulden": 1
+    }
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lowercase (ß -> ss) and strip accents (ä -> a).
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(normalize_text(text))
+
+
+@dataclass
+class RouteDecision:
+    """
+    Outcome of routing a conversation: the role to start with (None for triage).
+    """
+    role: Optional[str]
+    confidence: float
+    method: str  # rules, model, none
+    scores: Dict[str, float] = field(default_factory=dict)
+    matched: List[str] = field(default_factory=list)
+    # Shadow mode: `role` is what the router would have picked, the run starts at triage
+    shadow: bool = False
+
+    @property
+    def routed(self) -> bool:
+        return self.role is not None and not self.shadow
+
+    @property
+    def outcome(self) -> str:
+        if self.routed:
+            return "routed"
+        return "shadow" if self.shadow else "triage"
+
+    def log_fields(self) -> Dict[str, Any]:
+        return {
+            "route_decision": self.outcome,
+            "route_role": self.role,
+            "route_method": self.method,
+            "route_confidence": round(self.confidence, 3),
+            "route_scores": {role: round(score, 3) for role, score in self.scores.items()},
+            "route_matched": self.matched
+        }
+
+
+class KeywordRules:
+    def __init__(self, rules: Dict[str, Dict[str, float]], margin: float = PRE_ROUTER_MARGIN):
+        self.rules = {
+            role: {normalize_text(stem): float(weight) for stem, weight in stems.items()}
+            for role, stems in rules.items()
+        }
+        self.margin = margin
+
+    def score(self, tokens: List[str]) -> Tuple[Dict[str, float], List[str]]:
+        scores: Dict[str, float] = {}
+        matched: List[str] = []
+        for role, stems in self.rules.items():
+            total = 0.0
+            for stem, weight in stems.items():
+                if any(token.startswith(stem) for token in tokens):
+                    total += weight
+                    matched.append(stem)
+            scores[role] = total
+        return scores, matched
+
+    def decide(self, tokens: List[str], threshold: float) -> RouteDecision:
+        scores, matched = self.score(tokens)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] <= 0:
+            return RouteDecision(None, 0.0, "rules", scores, matched)
+        top_role, top = ranked[0]
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        confidence = top / (top + max(second, 0.0) + RULE_SMOOTHING)
+        role = top_role if confidence >= threshold and top - second >= self.margin else None
+        return RouteDecision(role, confidence, "rules", scores, matched)
+
+
+def _features(tokens: List[str]) -> Dict[str, float]:
+    """
+    Word tokens plus character 4-grams, which catch parts of German compounds.
+    """
+    counts: Dict[str, float] = {}
+    for token in tokens:
+        counts[f"w:{token}"] = counts.get(f"w:{token}", 0) + 1
+        padded = f"_{token}_"
+        for i in range(len(padded) - 3):
+            gram = f"c:{padded[i:i + 4]}"
+            counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def _normalize_vector(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {key: value / norm for key, value in vector.items()} if norm else {}
+
+
+class TfidfModel:
+    """
+    TF-IDF nearest-centroid classifier: one normalized centroid per label,
+    cosine similarity against the conversation's TF-IDF vector.
+    """
+
+    def __init__(self, idf: Dict[str, float], centroids: Dict[str, Dict[str, float]]):
+        self.idf = idf
+        self.centroids = centroids
+
+    def _vector(self, tokens: List[str]) -> Dict[str, float]:
+        return _normalize_vector({
+            feature: (1 + math.log(count)) * self.idf[feature]
+            for feature, count in _features(tokens).items()
+            if feature in self.idf
+        })
+
+    def similarities(self, tokens: List[str]) -> Dict[str, float]:
+        vector = self._vector(tokens)
+        return {
+            label: sum(weight * centroid.get(feature, 0.0) for feature, weight in vector.items())
+            for label, centroid in self.centroids.items()
+        }
+
+    def decide(self, tokens: List[str], threshold: float) -> RouteDecision:
+        similarities = self.similarities(tokens)
+        total = sum(max(value, 0.0) for value in similarities.values())
+        if not total:
+            return RouteDecision(None, 0.0, "model", similarities)
+        label, top = max(similarities.items(), key=lambda item: item[1])
+        confidence = top / total
+        role = label if confidence >= threshold and label != TRIAGE_LABEL else None
+        return RouteDecision(role, confidence, "model", similarities)
+
+    @classmethod
+    def train(cls, examples: List[Tuple[str, str]], max_features_per_label: int = 2000) -> "TfidfModel":
+        documents = [(_features(tokenize(text)), label) for text, label in examples]
+        document_frequency: Dict[str, int] = {}
+        for features, _ in documents:
+            for feature in features:
+                document_frequency[feature] = document_frequency.get(feature, 0) + 1
+        count = len(documents)
+        idf = {feature: math.log((1 + count) / (1 + df)) + 1 for feature, df in document_frequency.items()}
+
+        sums: Dict[str, Dict[str, float]] = {}
+        for features, label in documents:
+            vector = _normalize_vector({f: (1 + math.log(c)) * idf[f] for f, c in features.items()})
+            target = sums.setdefault(label, {})
+            for feature, value in vector.items():
+                target[feature] = target.get(feature, 0.0) + value
+
+        centroids = {}
+        for label, vector in sums.items():
+            strongest = dict(sorted(vector.items(), key=lambda item: item[1], reverse=True)[:max_features_per_label])
+            centroids[label] = _normalize_vector(strongest)
+        used = {feature for centroid in centroids.values() for feature in centroid}
+        return cls({feature: idf[feature] for feature in used}, centroids)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"version": 1, "idf": self.idf, "centroids": self.centroids}
+
+    @classmethod
+    def load(cls, path: str) -> "TfidfModel":
+        with open(path, "r", encoding="utf-8") as model_file:
+            data = json.load(model_file)
+        return cls(data["idf"], data["centroids"])
+
+
+class PreRouter:
+    """
+    Decides whether a conversation can skip triage. Rules are tried first; the
+    model, if loaded, gets the conversations the rules don't route.
+    """
+
+    def __init__(
+        self,
+        rules: KeywordRules,
+        model: Optional[TfidfModel] = None,
+        mode: str = "on",
+        threshold: float = PRE_ROUTER_THRESHOLD,
+        model_threshold: float = PRE_ROUTER_MODEL_THRESHOLD
+    ):
+        self.rules = rules
+        self.model = model
+        self.mode = mode
+        self.threshold = threshold
+        self.model_threshold = model_threshold
+
+    def route(self, user_texts: Iterable[str]) -> RouteDecision:
+        if self.mode == "off":
+            return RouteDecision(None, 0.0, "none")
+        tokens = tokenize(" ".join(user_texts))
+        if not tokens:
+            return RouteDecision(None, 0.0, "none")
+        decision = self.rules.decide(tokens, self.threshold)
+        if not decision.routed and self.model is not None:
+            model_decision = self.model.decide(tokens, self.model_threshold)
+            if model_decision.routed:
+                model_decision.matched = decision.matched
+                decision = model_decision
+        decision.shadow = self.mode == "shadow" and decision.role is not None
+        return decision
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "threshold": self.threshold,
+            "margin": self.rules.margin,
+            "model_threshold": self.model_threshold,
+            "rules": self.rules.rules,
+            "model_labels": sorted(self.model.centroids) if self.model else None
+        }
+
+
+def create_pre_router() -> PreRouter:
+    """
+    Create the router configured via PRE_ROUTER, PRE_ROUTER_RULES and PRE_ROUTER_MODEL.
+    """
+    rules = DEFAULT_RULES
+    if PRE_ROUTER_RULES:
+        with open(PRE_ROUTER_RULES, "r", encoding="utf-8") as rules_file:
+            rules = json.load(rules_file)
+        logger.info(f"Loaded pre-router rules from {PRE_ROUTER_RULES}")
+
+    model = None
+    if PRE_ROUTER_MODEL:
+        try:
+            model = TfidfModel.load(PRE_ROUTER_MODEL)
+            logger.info(f"Loaded pre-router model from {PRE_ROUTER_MODEL} ({', '.join(sorted(model.centroids))})")
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Could not load pre-router model {PRE_ROUTER_MODEL}: {str(e)}")
+
+    logger.info(f"Pre-router mode {PRE_ROUTER_MODE} (threshold {PRE_ROUTER_THRESHOLD}, margin {PRE_ROUTER_MARGIN})")
+    return PreRouter(KeywordRules(rules), model, mode=PRE_ROUTER_MODE)
+
+
+def load_training_examples(paths: Iterable[str], include_routed: bool = False) -> List[Tuple[str, str]]:
+    """
+    (text, label) pairs from JSON log files. Uses "Routing outcome" records with
+    route_text and final_role; by default only conversations decided by LLM
+    triage (including shadow decisions), so the model doesn't learn from its
+    own decisions. Lines with
+    "text" and "label" are accepted as hand-labelled examples.
+    """
+    examples = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                if "text" in record and "label" in record:
+                    examples.append((record["text"], record["label"]))
+                elif record.get("route_text") and record.get("final_role"):
+                    if include_routed or record.get("route_decision") in ("triage", "shadow"):
+                        examples.append((record["route_text"], record["final_role"]))
+    return examples
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Pre-router tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="Train the TF-IDF model from logs")
+    train.add_argument("logs", nargs="+")
+    train.add_argument("--output", required=True)
+    train.add_argument("--include-routed", action="store_true", help="Also learn from conversations the router decided")
+    route = commands.add_parser("route", help="Show the decision for a text")
+    route.add_argument("text")
+    route.add_argument("--model")
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        examples = load_training_examples(args.logs, args.include_routed)
+        if not examples:
+            sys.exit("No training examples found")
+        model = TfidfModel.train(examples)
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(model.to_dict(), output_file)
+        labels: Dict[str, int] = {}
+        for _, label in examples:
+            labels[label] = labels.get(label, 0) + 1
+        print(f"Trained on {len(examples)} examples {labels}, wrote {args.output}")
+    else:
+        model = TfidfModel.load(args.model) if args.model else None
+        router = PreRouter(KeywordRules(DEFAULT_RULES), model)
+        print(json.dumps(router.route([args.text]).log_fields(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
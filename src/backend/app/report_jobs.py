@@ -0,0 +1,307 @@
+import os
+import re
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, BinaryIO, Callable, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Finished reports and job metadata, shared by all worker processes
+REPORT_RESULT_DIR = os.environ.get(
+    "REPORT_RESULT_DIR",
+    os.path.join(tempfile.gettempdir(), "manona-reports")
+)
+
+# How long finished or failed jobs are kept
+REPORT_RESULT_TTL_SECONDS = float(os.environ.get("REPORT_RESULT_TTL_SECONDS", "3600"))
+
+# A queued or running job without progress for this long is considered lost
+# (e.g. the worker process was restarted) and is started again on resubmission
+REPORT_JOB_STALE_SECONDS = float(os.environ.get("REPORT_JOB_STALE_SECONDS", "900"))
+
+# Unfinished jobs are touched this often, so a job waiting for a slot or for
+# the report pool is not taken for a lost one
+REPORT_JOB_HEARTBEAT_SECONDS = REPORT_JOB_STALE_SECONDS / 3
+
+# Report jobs run in parallel per worker process; further jobs wait in the background.
+# A running job waits for the report pool when interactive reports keep it busy
+REPORT_JOB_CONCURRENCY = int(os.environ.get("REPORT_JOB_CONCURRENCY", "2"))
+
+REPORT_CLEANUP_INTERVAL_SECONDS = float(os.environ.get("REPORT_CLEANUP_INTERVAL_SECONDS", "300"))
+
+_JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def report_job_id(parts: Iterable[str]) -> str:
+    """
+    Derive a job id from the report inputs, so resubmitting the same report
+    finds the existing job. Parts are length-prefixed to keep boundaries unambiguous.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8")
+        digest.update(f"{len(data)}:".encode("ascii"))
+        digest.update(data)
+    return digest.hexdigest()[:32]
+
+
+def is_valid_job_id(job_id: str) -> bool:
+    return bool(_JOB_ID_PATTERN.match(job_id))
+
+
+@dataclass
+class ReportJob:
+    job_id: str
+    status: str  # queued, running, done, failed
+    progress: str
+    created_at: float
+    updated_at: float
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+    size: Optional[int] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def is_stale(self, now: float) -> bool:
+        return not self.finished and now - self.updated_at > REPORT_JOB_STALE_SECONDS
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class ReportJobStore:
+    """
+    File-based store for job metadata (<id>.json) and finished reports (<id>.pdf).
+    Files are replaced atomically, so every worker process can read them.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        # Serializes updates of this process, so a heartbeat can't overwrite a
+        # newer state or share the temporary file
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _meta_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def result_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.pdf")
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        try:
+            with open(self._meta_path(job_id), "r", encoding="utf-8") as meta_file:
+                job = ReportJob(**json.load(meta_file))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+
+        now = time.time()
+        if job.finished and now - job.updated_at > self.ttl_seconds:
+            self.delete(job_id)
+            return None
+        if job.is_stale(now):
+            job.status = "failed"
+            job.error = "The report job was interrupted. Please submit it again."
+            job.error_status = 500
+        return job
+
+    def create(self, job: ReportJob) -> bool:
+        """
+        Claim a job id. Returns False if another request or worker already did.
+        """
+        try:
+            fd = os.open(self._meta_path(job.job_id), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as meta_file:
+            json.dump(job.to_dict(), meta_file)
+        return True
+
+    def update(self, job: ReportJob) -> None:
+        path = self._meta_path(job.job_id)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with self._lock:
+            job.updated_at = time.time()
+            with open(temp_path, "w", encoding="utf-8") as meta_file:
+                json.dump(job.to_dict(), meta_file)
+            os.replace(temp_path, path)
+
+    def save_result(self, job_id: str, stream: BinaryIO) -> int:
+        """
+        Copy a finished report into the store and close the stream. Blocking.
+        """
+        path = self.result_path(job_id)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as result_file:
+                shutil.copyfileobj(stream, result_file)
+            os.replace(temp_path, path)
+        finally:
+            stream.close()
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        return os.path.getsize(path)
+
+    def delete(self, job_id: str) -> None:
+        for path in (self.result_path(job_id), self._meta_path(job_id)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def cleanup(self) -> int:
+        """
+        Delete expired jobs and their results. Blocking.
+        """
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as meta_file:
+                    job = ReportJob(**json.load(meta_file))
+            except (FileNotFoundError, json.JSONDecodeError, TypeError):
+                continue
+            expired = job.finished or job.is_stale(now)
+            if expired and now - job.updated_at > self.ttl_seconds:
+                self.delete(job_id)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} expired report jobs")
+        return removed
+
+
+# Builds the report for a job: called with the job's payload and an async
+# progress callback, returns a stream with the finished PDF
+ReportBuilder = Callable[[Any, Callable[[str], Awaitable[None]]], Awaitable[BinaryIO]]
+
+
+class ReportJobManager:
+    """
+    Runs report jobs in background tasks of the worker process that accepted them.
+    """
+
+    def __init__(
+        self,
+        store: ReportJobStore,
+        build_report: ReportBuilder,
+        max_concurrency: int,
+        heartbeat_seconds: float = REPORT_JOB_HEARTBEAT_SECONDS
+    ):
+        self.store = store
+        self.build_report = build_report
+        self.heartbeat_seconds = heartbeat_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, job_id: str, payload: Any) -> Tuple[ReportJob, bool]:
+        """
+        Start a job unless one with the same id exists and has not failed.
+
+        Returns:
+            The job and whether it was newly created
+        """
+        job, created = await asyncio.to_thread(self._claim, job_id)
+        if created:
+            task = asyncio.create_task(self._run(job, payload))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            logger.info(f"Queued report job {job_id}")
+        return job, created
+
+    def _claim(self, job_id: str) -> Tuple[ReportJob, bool]:
+        """
+        Return the existing job or create a queued one (blocking file I/O).
+        """
+        existing = self.store.get(job_id)
+        if existing is not None and existing.status != "failed":
+            return existing, False
+        if existing is not None:
+            logger.info(f"Restarting failed report job {job_id}")
+            self.store.delete(job_id)
+
+        now = time.time()
+        job = ReportJob(job_id=job_id, status="queued", progress="queued", created_at=now, updated_at=now)
+        if not self.store.create(job):
+            return self.store.get(job_id) or job, False
+        return job, True
+
+    async def _heartbeat(self, job: ReportJob, stop: asyncio.Event) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.heartbeat_seconds)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await asyncio.to_thread(self.store.update, job)
+            except OSError as e:
+                logger.warning(f"Could not touch report job {job.job_id}: {str(e)}")
+
+    async def _run(self, job: ReportJob, payload: Any) -> None:
+        stop = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job, stop))
+        try:
+            await self._build(job, payload)
+        finally:
+            stop.set()
+            await heartbeat
+
+    async def _build(self, job: ReportJob, payload: Any) -> None:
+        async with self._semaphore:
+            async def progress(stage: str) -> None:
+                job.status = "running"
+                job.progress = stage
+                await asyncio.to_thread(self.store.update, job)
+
+            try:
+                stream = await self.build_report(payload, progress)
+                job.size = await asyncio.to_thread(self.store.save_result, job.job_id, stream)
+                job.status = "done"
+                job.progress = "done"
+                logger.info(f"Report job {job.job_id} finished ({job.size} bytes)")
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "The report job was cancelled. Please submit it again."
+                job.error_status = 503
+                self.store.update(job)
+                raise
+            except Exception as e:
+                # HTTPExceptions from the report pipeline keep their status code
+                job.status = "failed"
+                job.error = str(getattr(e, "detail", None) or e)
+                job.error_status = getattr(e, "status_code", 500)
+                logger.error(f"Report job {job.job_id} failed: {job.error}")
+            await asyncio.to_thread(self.store.update, job)
+
+    async def cleanup_loop(self, interval: float = REPORT_CLEANUP_INTERVAL_SECONDS) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.store.cleanup)
+            except Exception as e:
+                logger.error(f"Error cleaning up report jobs: {str(e)}")
+            await asyncio.sleep(interval)
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def create_report_job_manager(build_report: ReportBuilder) -> ReportJobManager:
+    store = ReportJobStore(REPORT_RESULT_DIR, REPORT_RESULT_TTL_SECONDS)
+    logger.info(f"Report job results in {REPORT_RESULT_DIR} (TTL {REPORT_RESULT_TTL_SECONDS}s)")
+    return ReportJobManager(store, build_report, REPORT_JOB_CONCURRENCY)
@@ -0,0 +1,367 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+import openai
+from agents import Model
+
+from app.metrics import LLM_CALL_RETRIES, LLM_FALLBACKS, LLM_CIRCUIT_TRANSITIONS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Retries of a model call on 429, 5xx, timeouts and connection errors
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE_SECONDS = float(os.environ.get("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.environ.get("LLM_BACKOFF_MAX_SECONDS", "8"))
+
+# Time limit of a single attempt (for streams: until the first event)
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.environ.get("LLM_ATTEMPT_TIMEOUT_SECONDS", "45"))
+
+# Deadlines per stage, including retries
+LLM_AGENT_DEADLINE_SECONDS = float(os.environ.get("LLM_AGENT_DEADLINE_SECONDS", "90"))
+LLM_SUMMARY_DEADLINE_SECONDS = float(os.environ.get("LLM_SUMMARY_DEADLINE_SECONDS", "20"))
+
+# Start a second report summary request if the first has not answered after this many seconds, 0 disables
+LLM_SUMMARY_HEDGE_SECONDS = float(os.environ.get("LLM_SUMMARY_HEDGE_SECONDS", "4"))
+
+# Consecutive failures after which an endpoint is skipped, and for how long
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("CIRCUIT_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_deadline", default=None)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an endpoint whose circuit breaker is open.
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit for {name} is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+@contextmanager
+def deadline_budget(seconds: float) -> Iterator[float]:
+    """
+    Set the deadline that model calls started in this context (and tasks
+    created in it) are bounded by, without a timeout around the block itself.
+    For code that must not be cancelled from outside, e.g. a generator that
+    yields to its consumer. Yields the expiry time (time.monotonic()).
+    """
+    expires = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        expires = min(expires, outer)
+    token = _deadline.set(expires)
+    try:
+        yield expires
+    finally:
+        _deadline.reset(token)
+
+
+@asynccontextmanager
+async def deadline(seconds: float):
+    """
+    Bound a stage (an agent run, a summary call) including all retries. Nested
+    deadlines never extend an outer one. Raises TimeoutError when exceeded.
+    """
+    with deadline_budget(seconds) as expires:
+        async with asyncio.timeout(max(0.0, expires - time.monotonic())):
+            yield
+
+
+def remaining_time() -> Optional[float]:
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether a failed call may succeed when repeated: rate limits, server
+    errors, timeouts and connection problems. Other client errors are final.
+    """
+    if isinstance(error, (openai.APIConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Seconds to wait according to the response's retry-after-ms / Retry-After header.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_retries: int = LLM_MAX_RETRIES
+    backoff_base: float = LLM_BACKOFF_BASE_SECONDS
+    backoff_max: float = LLM_BACKOFF_MAX_SECONDS
+    attempt_timeout: float = LLM_ATTEMPT_TIMEOUT_SECONDS
+
+    def delay(self, attempt: int, error: BaseException) -> float:
+        """
+        The server's Retry-After if given, otherwise exponential backoff with
+        full jitter, so clients that failed together don't retry together.
+        """
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            return server_delay
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+# Summary calls get attempts that fit their deadline twice, so a failed attempt can be retried
+SUMMARY_RETRY_POLICY = RetryPolicy(attempt_timeout=min(LLM_ATTEMPT_TIMEOUT_SECONDS, LLM_SUMMARY_DEADLINE_SECONDS / 2))
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive retryable failures of an
+    endpoint. After `reset_seconds` one probe call is let through (half-open);
+    its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f"Circuit for {self.name}: {self.state} -> {state}")
+            LLM_CIRCUIT_TRANSITIONS.inc(endpoint=self.name, state=state)
+            self.state = state
+
+    def before_call(self) -> None:
+        """
+        Raise CircuitOpenError if the endpoint must not be called now.
+        """
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == "closed":
+                return
+            waited = time.monotonic() - self.opened_at
+            if waited >= self.reset_seconds:
+                # Also lets another probe through if the last one never finished
+                self.opened_at = time.monotonic()
+                self._transition("half_open")
+                return
+            raise CircuitOpenError(self.name, max(0.0, self.reset_seconds - waited))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._transition("closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.failure_threshold > 0 and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition("open")
+
+    def describe(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "failure_threshold": self.failure_threshold}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(name: str) -> CircuitBreaker:
+    """
+    The process-wide breaker of an endpoint, shared by all agents and calls using it.
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def circuit_states() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.describe() for name, breaker in sorted(_breakers.items())}
+
+
+async def call_with_retries(call: Callable[[], Awaitable[T]], endpoint: str, policy: RetryPolicy = RetryPolicy()) -> T:
+    """
+    Run `call` against `endpoint` with per-attempt timeouts and retries with
+    backoff, within the current deadline. A retry is only started if a full
+    attempt still fits before the deadline. An attempt cut short by the
+    deadline is not held against the endpoint's circuit breaker.
+    """
+    breaker = circuit_breaker(endpoint)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        timeout = policy.attempt_timeout
+        remaining = remaining_time()
+        clipped = remaining is not None and remaining < timeout
+        if clipped:
+            timeout = remaining
+        try:
+            # Not wait_for: before Python 3.12 it runs the call in a new task, and
+            # a stream opened there enters the SDK's tracing span in that task's
+            # context, which then can't be left from the runner's task
+            async with asyncio.timeout(timeout):
+                result = await call()
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            if not (clipped and isinstance(e, TimeoutError)):
+                breaker.record_failure()
+            delay = policy.delay(attempt, e)
+            remaining = remaining_time()
+            if attempt >= policy.max_retries or (remaining is not None and remaining - delay < policy.attempt_timeout):
+                raise
+            reason = "timeout" if isinstance(e, TimeoutError) else str(getattr(e, "status_code", None) or "connection")
+            LLM_CALL_RETRIES.inc(endpoint=endpoint, reason=reason)
+            logger.warning(f"Call to {endpoint} failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+
+async def call_with_fallback(
+    primary: Tuple[str, Callable[[], Awaitable[T]]],
+    fallback: Optional[Tuple[str, Callable[[], Awaitable[T]]]] = None,
+    policy: RetryPolicy = RetryPolicy()
+) -> T:
+    """
+    Call the primary endpoint with retries; when it keeps failing or its
+    circuit is open, call the fallback once (if configured).
+    """
+    endpoint, call = primary
+    try:
+        return await call_with_retries(call, endpoint, policy)
+    except Exception as e:
+        if fallback is None or not (is_retryable(e) or isinstance(e, CircuitOpenError)):
+            raise
+        fallback_endpoint, fallback_call = fallback
+        LLM_FALLBACKS.inc(endpoint=endpoint, fallback=fallback_endpoint)
+        logger.warning(f"Falling back from {endpoint} to {fallback_endpoint}: {str(e)}")
+        return await call_with_retries(fallback_call, fallback_endpoint, RetryPolicy(max_retries=0, attempt_timeout=policy.attempt_timeout))
+
+
+async def hedged(call: Callable[[], Awaitable[T]], delay: float) -> T:
+    """
+    Run `call`, and a second copy if the first has not finished after `delay`
+    seconds. Returns the first successful result and cancels the other call.
+    """
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        if delay > 0:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                logger.info(f"No answer after {delay}s, sending a hedged request")
+                tasks.append(asyncio.ensure_future(call()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+class ResilientModel(Model):
+    """
+    Agents SDK model that sends every call through `call_with_fallback`.
+    `primary` and `fallback` create the underlying models; they are resolved per
+    call, like the SDK resolves model names, so they pick up the current
+    default client.
+
+    Streams are retried until their first event arrives; once events have been
+    passed on to the caller, a failure ends the stream.
+
+    `model` is the primary model's name, like the attribute of the SDK's
+    models, so metrics and logs label the agent with it.
+    """
+
+    def __init__(
+        self,
+        primary: Callable[[], Model],
+        endpoint: str,
+        fallback: Optional[Callable[[], Model]] = None,
+        fallback_endpoint: Optional[str] = None,
+        model: Optional[str] = None
+    ):
+        self.primary = primary
+        self.endpoint = endpoint
+        self.model = model or endpoint
+        self.fallback = fallback
+        self.fallback_endpoint = fallback_endpoint
+
+    def _calls(self, make_call: Callable[[Model], Awaitable[T]]):
+        primary = (self.endpoint, lambda: make_call(self.primary()))
+        fallback = (self.fallback_endpoint, lambda: make_call(self.fallback())) if self.fallback else None
+        return primary, fallback
+
+    async def get_response(self, *args, **kwargs):
+        primary, fallback = self._calls(lambda model: model.get_response(*args, **kwargs))
+        return await call_with_fallback(primary, fallback)
+
+    async def stream_response(self, *args, **kwargs) -> AsyncIterator[Any]:
+        async def open_stream(model: Model):
+            events = model.stream_response(*args, **kwargs).__aiter__()
+            return await events.__anext__(), events
+
+        primary, fallback = self._calls(open_stream)
+        first, events = await call_with_fallback(primary, fallback)
+        yield first
+        async for event in events:
+            yield event
+
+
+def user_error_message(error: BaseException) -> str:
+    """
+    Message shown to the user when an agent run fails.
+    """
+    if isinstance(error, CircuitOpenError) or (isinstance(error, openai.APIStatusError) and error.status_code == 429):
+        return "The assistant is currently overloaded. Please try again in a minute."
+    if isinstance(error, (TimeoutError, openai.APITimeoutError)):
+        return "The assistant took too long to answer. Please try again."
+    return "Sorry, there was an error processing your request. Please try again."
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.history import item_kind, item_text
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    output: str
+    agent: str
+    created_at: float
+
+
+def normalize_history(input_items: Iterable[Dict[str, Any]]) -> List[List[str]]:
+    """
+    Role (or item type) and text of the conversation's items, with whitespace
+    collapsed and case folded. Item and call ids are left out, so they don't
+    make otherwise identical histories differ. A session history also holds
+    the tool calls and outputs of earlier runs, so it only shares an entry
+    with a client-sent conversation that contains the same items; plain
+    message lists from stateless clients don't.
+    """
+    history = []
+    for item in input_items:
+        history.append([item_kind(item), " ".join(item_text(item).split()).casefold()])
+    return history
+
+
+def history_hash(input_items: Iterable[Dict[str, Any]]) -> str:
+    payload = json.dumps(normalize_history(input_items), ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Exact-match cache of agent answers for turns that are deterministic, e.g.
+    the triage greeting or the refusal of the "other" agent.
+
+    Entries are keyed by the agent graph fingerprint, the agent the run starts
+    with and the hash of the normalized history. Only agents listed in
+    `agents` (by role) are cached, and only when the answer also came from such
+    an agent. Entries expire after `ttl_seconds`; the least recently used are
+    evicted beyond `max_entries`. `clear()` is called when the agent graph is
+    replaced.
+    """
+
+    def __init__(self, agents: Iterable[str], max_entries: int, ttl_seconds: float):
+        self.agents = frozenset(agents)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.agents) and self.max_entries > 0
+
+    def cacheable(self, role: Optional[str]) -> bool:
+        return self.enabled and role in self.agents
+
+    @staticmethod
+    def key(graph_fingerprint: str, role: str, input_items: Iterable[Dict[str, Any]]) -> str:
+        return f"{graph_fingerprint}:{role}:{history_hash(input_items)}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.created_at > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry
+
+    def put(self, key: str, output: str, agent: str) -> None:
+        with self._lock:
+            self._entries[key] = CachedResponse(output=output, agent=agent, created_at=time.time())
+            self._entries.move_to_end(key)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._entries:
+                logger.info(f"Invalidated {len(self._entries)} cached responses")
+            self._entries.clear()
+            self._counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_ratio": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "agents": sorted(self.agents)
+            }
+
+
+def create_response_cache() -> ResponseCache:
+    """
+    Create the response cache configured via environment variables:
+
+    - RESPONSE_CACHE_AGENTS: comma-separated agent roles whose answers are cached,
+      e.g. "triage,other" (default empty, i.e. disabled)
+    - RESPONSE_CACHE_MAX_ENTRIES: LRU bound (default 1000)
+    - RESPONSE_CACHE_TTL_SECONDS: lifetime of an entry (default 3600)
+    """
+    agents = [role.strip() for role in os.environ.get("RESPONSE_CACHE_AGENTS", "").split(",") if role.strip()]
+    max_entries = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+    ttl_seconds = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    cache = ResponseCache(agents, max_entries, ttl_seconds)
+    if cache.enabled:
+        logger.info(f"Caching responses of {', '.join(sorted(cache.agents))} ({max_entries} entries, TTL {ttl_seconds}s)")
+    return cache
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConversationSession:
+    """
+    Server-side state of a conversation: the input items of the last run
+    (as returned by RunResult.to_input_list()) and the agent that answered last.
+    """
+    session_id: str
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    last_agent: Optional[str] = None
+    updated_at: float = field(default_factory=time.time)
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+class SessionStore(ABC):
+    """
+    Interface for conversation session storage.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        """Return the session or None if it does not exist or has expired."""
+
+    @abstractmethod
+    def save(self, session: ConversationSession) -> None:
+        """Insert or replace a session."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove a session if it exists."""
+
+    def close(self) -> None:
+        pass
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local session store with LRU eviction and a TTL.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 7200):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if time.time() - session.updated_at > self.ttl_seconds:
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            # Hand out a copy so a running request can't mutate the stored state
+            return ConversationSession(
+                session_id=session.session_id,
+                items=list(session.items),
+                last_agent=session.last_agent,
+                updated_at=session.updated_at
+            )
+
+    def save(self, session: ConversationSession) -> None:
+        session.updated_at = time.time()
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_entries:
+                evicted_id, _ = self._sessions.popitem(last=False)
+                logger.debug(f"Evicted session {evicted_id} (LRU)")
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store backed by a SQLite file. Survives restarts and can be shared
+    between workers on the same host.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7200):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+        self._connection()
+        self._purge_expired()
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Connection of the current process. A SQLite connection must not be used
+        across fork (e.g. when gunicorn preloads the app), so a forked worker
+        opens its own.
+        """
+        if self._pid == os.getpid():
+            return self._conn
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                items TEXT NOT NULL,
+                last_agent TEXT,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)")
+        self._conn = conn
+        self._pid = os.getpid()
+        return conn
+
+    def _purge_expired(self) -> None:
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM sessions WHERE updated_at < ?",
+                (time.time() - self.ttl_seconds,)
+            )
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT items, last_agent, updated_at FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        items, last_agent, updated_at = row
+        if time.time() - updated_at > self.ttl_seconds:
+            self.delete(session_id)
+            return None
+        return ConversationSession(
+            session_id=session_id,
+            items=json.loads(items),
+            last_agent=last_agent,
+            updated_at=updated_at
+        )
+
+    def save(self, session: ConversationSession) -> None:
+        session.updated_at = time.time()
+        payload = json.dumps(session.items, ensure_ascii=False, default=str)
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO sessions (session_id, items, last_agent, updated_at) VALUES (?, ?, ?, ?)",
+                (session.session_id, payload, session.last_agent, session.updated_at)
+            )
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+
+
+def create_session_store() -> SessionStore:
+    """
+    Create the session store configured via environment variables:
+
+    - SESSION_STORE: "memory" (default) or "sqlite"
+    - SESSION_TTL_SECONDS: idle time after which a session expires (default 7200)
+    - SESSION_MAX_ENTRIES: LRU bound of the in-memory store (default 1000)
+    - SESSION_SQLITE_PATH: database file of the SQLite store
+    """
+    backend = os.environ.get("SESSION_STORE", "memory").lower()
+    ttl_seconds = float(os.environ.get("SESSION_TTL_SECONDS", "7200"))
+
+    if backend == "sqlite":
+        path = os.environ.get(
+            "SESSION_SQLITE_PATH",
+            os.path.join(tempfile.gettempdir(), "manona_sessions.db")
+        )
+        logger.info(f"Using SQLite session store at {path}")
+        return SQLiteSessionStore(path, ttl_seconds=ttl_seconds)
+
+    if backend != "memory":
+        logger.warning(f"Unknown SESSION_STORE '{backend}', falling back to in-memory store")
+
+    max_entries = int(os.environ.get("SESSION_MAX_ENTRIES", "1000"))
+    logger.info(f"Using in-memory session store (max {max_entries} sessions, TTL {ttl_seconds}s)")
+    return InMemorySessionStore(max_entries=max_entries, ttl_seconds=ttl_seconds)
@@ -0,0 +1,132 @@
+import os
+import re
+import sys
+import time
+import asyncio
+import logging
+import importlib
+import subprocess
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Import the report modules (ReportLab, PyPDF2) in the background after startup
+# instead of on the first report
+STARTUP_PREWARM = os.environ.get("STARTUP_PREWARM", "true").lower() in ("1", "true", "yes")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+# Wall-clock time of startup phases in this process (and its forked workers)
+_phases: Dict[str, float] = {}
+_prewarmed: Dict[str, float] = {}
+
+
+def _process_started() -> Optional[float]:
+    """
+    Wall-clock start time of the process from /proc (Linux only).
+    """
+    try:
+        with open(f"/proc/{os.getpid()}/stat") as stat_file:
+            # Field 22, after the parenthesized command name which may contain spaces
+            start_ticks = int(stat_file.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as stat_file:
+            boot_time = next(int(line.split()[1]) for line in stat_file if line.startswith("btime"))
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+def mark(phase: str) -> None:
+    """
+    Record that a startup phase was reached (first time only).
+    """
+    _phases.setdefault(phase, time.time())
+
+
+def startup_report() -> Dict[str, Any]:
+    """
+    Seconds from process start to each startup phase and the duration of the
+    background imports.
+    """
+    started = _process_started() or min(_phases.values(), default=time.time())
+    return {
+        "pid": os.getpid(),
+        "process_started": started,
+        "phases": {phase: round(at - started, 3) for phase, at in sorted(_phases.items(), key=lambda item: item[1])},
+        "prewarmed_modules": {name: round(seconds, 3) for name, seconds in _prewarmed.items()},
+        "prewarm_enabled": STARTUP_PREWARM
+    }
+
+
+async def import_lazily(name: str) -> ModuleType:
+    """
+    Import a heavy module off the event loop, unless it is already loaded.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return await asyncio.to_thread(importlib.import_module, name)
+
+
+def prewarm(modules: List[str], warmups: List[Callable[[], Any]] = ()) -> None:
+    """
+    Import modules and run warm-up functions. Blocking; call it from a thread.
+    """
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.error(f"Error prewarming {name}: {str(e)}")
+            continue
+        _prewarmed[name] = time.perf_counter() - started
+    for warmup in warmups:
+        try:
+            warmup()
+        except Exception as e:
+            logger.error(f"Error in warm-up {getattr(warmup, '__name__', warmup)}: {str(e)}")
+    mark("prewarm_complete")
+    logger.info(f"Prewarmed {', '.join(_prewarmed)} in {sum(_prewarmed.values()):.2f}s")
+
+
+def import_time_report(module: str = "app.app", limit: int = 30, timeout: float = 120) -> Dict[str, Any]:
+    """
+    Import `module` in a fresh interpreter with `python -X importtime` and
+    return the slowest imports by cumulative and by self time (in ms).
+    Blocking and CPU-heavy; call it from a thread.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        env={**os.environ, "LOG_LEVEL": "WARNING", "PROMPT_WATCH_INTERVAL_SECONDS": "0"}
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append({
+                "module": name,
+                "depth": (len(indent) - 1) // 2,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000
+            })
+    by_package: Dict[str, float] = {}
+    for entry in imports:
+        package = entry["module"].split(".")[0]
+        by_package[package] = by_package.get(package, 0.0) + entry["self_ms"]
+    total_ms = next((entry["cumulative_ms"] for entry in reversed(imports) if entry["module"] == module), None)
+    return {
+        "module": module,
+        "returncode": result.returncode,
+        "total_ms": total_ms,
+        "by_cumulative": sorted(imports, key=lambda entry: entry["cumulative_ms"], reverse=True)[:limit],
+        "by_self": sorted(imports, key=lambda entry: entry["self_ms"], reverse=True)[:limit],
+        "by_package": dict(sorted(((package, round(ms, 3)) for package, ms in by_package.items()), key=lambda item: item[1], reverse=True)[:limit])
+    }
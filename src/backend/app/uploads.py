@@ -0,0 +1,115 @@
+import os
+import asyncio
+import hashlib
+import logging
+from typing import BinaryIO, Iterable, Tuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Maximum request body size for upload endpoints
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MAX_UPLOAD_MB", "25")) * 1024 * 1024)
+
+# Chunk size used when copying uploads
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(HTTPException):
+    """
+    Raised while reading a request body that exceeds the upload limit.
+    It is an HTTPException so FastAPI turns it into a 413 response even when it
+    is raised while the framework parses the form.
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__(
+            status_code=413,
+            detail=f"Upload too large. The maximum size is {max_bytes // (1024 * 1024)} MB."
+        )
+        self.max_bytes = max_bytes
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware that enforces a maximum body size on upload endpoints while
+    the body is being received: requests announcing a larger Content-Length are
+    rejected before anything is read, and chunked bodies are aborted as soon as
+    they cross the limit.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    break
+                if content_length > self.max_bytes:
+                    logger.warning(f"Rejected upload to {scope['path']}: Content-Length {content_length} exceeds {self.max_bytes}")
+                    error = UploadTooLargeError(self.max_bytes)
+                    response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+                    await response(scope, receive, send)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    logger.warning(f"Aborted upload to {scope['path']} after {received} bytes")
+                    raise UploadTooLargeError(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def copy_upload(upload: UploadFile, destination: BinaryIO) -> Tuple[int, str]:
+    """
+    Copy an uploaded file into `destination` chunk by chunk, hashing it on the way.
+
+    Returns:
+        The number of bytes copied and the SHA-256 hex digest of the content
+    """
+    digest = hashlib.sha256()
+
+    def consume(chunk: bytes) -> None:
+        digest.update(chunk)
+        destination.write(chunk)
+
+    size = 0
+    await upload.seek(0)
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        # The destination may be on disk; write it in a thread like UploadFile reads
+        await asyncio.to_thread(consume, chunk)
+        size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def upload_size(upload: UploadFile) -> int:
+    """
+    Size of an uploaded file without reading it into memory.
+    """
+    if upload.size is not None:
+        return upload.size
+    upload.file.seek(0, os.SEEK_END)
+    size = upload.file.tell()
+    upload.file.seek(0)
+    return size
@@ -0,0 +1,199 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturatedError(Exception):
+    """
+    Raised when a job is submitted while all workers are busy and the queue is full.
+    """
+
+    def __init__(self, pool_name: str, retry_after: int):
+        super().__init__(f"Worker pool '{pool_name}' is saturated")
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+
+
+class BoundedWorkerPool:
+    """
+    Runs blocking jobs in an executor without blocking the event loop.
+
+    At most `max_concurrency` jobs run at the same time and at most `max_queue`
+    further jobs wait for a free worker; anything beyond that is rejected with
+    PoolSaturatedError so the endpoint can answer 503 instead of piling up work.
+    Each job gets `timeout_seconds` once it has started running. An executor
+    cannot interrupt a job, so with `recycle_on_timeout` (process pools) a
+    timeout replaces the executor: new jobs go to fresh workers, and the old
+    workers are terminated once the jobs still running on them have finished.
+    Without it, a timed-out job is abandoned and its worker stays busy until the
+    job returns on its own; the job keeps its slot until then, so no more jobs
+    run than there are workers.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        executor_factory: Callable[[], Executor],
+        max_concurrency: int,
+        max_queue: int,
+        timeout_seconds: float,
+        warmup: Optional[Callable[[], Any]] = None,
+        retry_after: int = 5,
+        recycle_on_timeout: bool = False,
+        capacity_poll_seconds: float = 0.5
+    ):
+        self.name = name
+        self.executor_factory = executor_factory
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self.warmup = warmup
+        self.retry_after = retry_after
+        self.recycle_on_timeout = recycle_on_timeout
+        self.capacity_poll_seconds = capacity_poll_seconds
+        self._executor: Optional[Executor] = None
+        # Jobs still running per executor, to terminate a retired one once it is idle
+        self._running: Dict[Executor, int] = {}
+        self._retired: Set[Executor] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs that are running or waiting for a worker."""
+        return self._pending
+
+    @property
+    def saturated(self) -> bool:
+        """Whether a job submitted now would be rejected."""
+        return self._pending >= self.max_concurrency + self.max_queue
+
+    async def wait_for_capacity(self) -> None:
+        """
+        Wait until a job submitted now would be accepted. For background work,
+        which should queue behind interactive requests instead of failing; the
+        job must be submitted without awaiting anything else in between.
+        """
+        while self.saturated:
+            await asyncio.sleep(self.capacity_poll_seconds)
+
+    def start(self) -> None:
+        """
+        Create the executor. Workers are started right away when a warmup
+        function is given, so the first real job doesn't pay for their startup.
+        """
+        if self._executor is not None:
+            return
+        self._executor = self._new_executor()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        logger.info(
+            f"Started worker pool '{self.name}' (concurrency {self.max_concurrency}, "
+            f"queue {self.max_queue}, timeout {self.timeout_seconds}s)"
+        )
+
+    def _new_executor(self) -> Executor:
+        executor = self.executor_factory()
+        if self.warmup is not None:
+            for _ in range(self.max_concurrency):
+                executor.submit(self.warmup)
+        return executor
+
+    def _recycle(self, executor: Executor) -> None:
+        """
+        Send new jobs to a fresh executor after a job on `executor` timed out.
+        """
+        if executor is not self._executor:
+            return
+        logger.warning(f"Replacing the workers of pool '{self.name}' after a timeout")
+        self._executor = self._new_executor()
+        self._retired.add(executor)
+
+    def _terminate(self, executor: Executor) -> None:
+        """
+        Stop a retired executor, killing worker processes that still run an
+        abandoned job.
+        """
+        self._retired.discard(executor)
+        # ProcessPoolExecutor doesn't offer a public way to kill its workers
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.info(f"Terminated {len(processes)} retired workers of pool '{self.name}'")
+
+    def shutdown(self) -> None:
+        if self._executor is None:
+            return
+        for executor in list(self._retired):
+            self._terminate(executor)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._semaphore = None
+        logger.info(f"Stopped worker pool '{self.name}'")
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run `fn(*args, **kwargs)` in the pool and return its result.
+
+        Raises:
+            PoolSaturatedError: All workers are busy and the queue is full
+            asyncio.TimeoutError: The job did not finish within timeout_seconds
+        """
+        if self._executor is None:
+            self.start()
+
+        if self.saturated:
+            raise PoolSaturatedError(self.name, self.retry_after)
+
+        self._pending += 1
+        semaphore = self._semaphore
+        try:
+            await semaphore.acquire()
+        except BaseException:
+            self._pending -= 1
+            raise
+
+        executor = self._executor
+        self._running[executor] = self._running.get(executor, 0) + 1
+        job = None
+        recycled = False
+        try:
+            job = executor.submit(functools.partial(fn, *args, **kwargs))
+            return await asyncio.wait_for(asyncio.wrap_future(job), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            if self.recycle_on_timeout:
+                self._recycle(executor)
+                recycled = True
+            raise
+        finally:
+            self._running[executor] -= 1
+            if self._running[executor] == 0:
+                del self._running[executor]
+                if executor in self._retired:
+                    self._terminate(executor)
+            if job is not None and not job.done() and not recycled:
+                # Timed out or cancelled, but still running on its worker
+                self._release_when_done(job, semaphore)
+            else:
+                self._release(semaphore)
+
+    def _release(self, semaphore: asyncio.Semaphore) -> None:
+        self._pending -= 1
+        semaphore.release()
+
+    def _release_when_done(self, job: Future, semaphore: asyncio.Semaphore) -> None:
+        loop = asyncio.get_running_loop()
+
+        def release(_: Future) -> None:
+            try:
+                loop.call_soon_threadsafe(self._release, semaphore)
+            except RuntimeError:
+                # The event loop is gone, and the semaphore with it
+                pass
+
+        job.add_done_callback(release)
@@ -0,0 +1,74 @@
+"""
+Sample documents for benchmarks, generated on the fly so every run uses the
+same kind of input without checking binaries into the repository.
+"""
+import io
+import zipfile
+from xml.sax.saxutils import escape
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+SAMPLE_LINES = [
+    "Strafbefehl wegen Überschreitung der signalisierten Höchstgeschwindigkeit",
+    "Gemessene Geschwindigkeit 78 km/h, nach Abzug der Sicherheitsmarge 73 km/h",
+    "Signalisierte Höchstgeschwindigkeit innerorts 50 km/h",
+    "Gegen diesen Strafbefehl kann innert 10 Tagen Einsprache erhoben werden",
+    "Zahlungsbefehl Nr. 2025-1234, Forderung CHF 1'250.00 nebst Zins zu 5%"
+]
+
+
+def make_pdf(pages: int = 1, marker: str = "") -> bytes:
+    """
+    A PDF with a text layer. `marker` makes the content unique, so the
+    document cache does not turn every parse into a cache hit.
+    """
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for page in range(pages):
+        y = 780
+        pdf.drawString(72, y, f"Dokument {marker} Seite {page + 1}")
+        for line in SAMPLE_LINES * 4:
+            y -= 18
+            pdf.drawString(72, y, line)
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def make_docx(paragraphs: int = 20, marker: str = "") -> bytes:
+    """
+    A minimal DOCX (WordprocessingML) with `paragraphs` paragraphs.
+    """
+    body = "".join(
+        f"<w:p><w:r><w:t>{escape(f'{marker} {SAMPLE_LINES[i % len(SAMPLE_LINES)]}')}</w:t></w:r></w:p>"
+        for i in range(paragraphs)
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+    relationships = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/>'
+        "</Relationships>"
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", content_types)
+        archive.writestr("_rels/.rels", relationships)
+        archive.writestr("word/document.xml", document)
+    return buffer.getvalue()
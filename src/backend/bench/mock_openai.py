@@ -0,0 +1,171 @@
+"""
+OpenAI-compatible mock server for benchmarks. Implements /v1/chat/completions
+(plain and streaming) with configurable latency and answers with a handoff
+tool call when the conversation matches one of the specialist agents.
+
+    python -m bench.mock_openai --port 9100 --latency-ms 300 --jitter-ms 100
+"""
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Keyword in the last user message -> part of the handoff tool name
+HANDOFF_KEYWORDS = {
+    "geblitzt": "road_traffic",
+    "radar": "road_traffic",
+    "geschwindigkeit": "road_traffic",
+    "betreibung": "debt_collection",
+    "zahlungsbefehl": "debt_collection"
+}
+
+ANSWER_WORDS = (
+    "Vielen Dank für Ihre Angaben. Bitte teilen Sie uns mit, wann und wo die "
+    "Geschwindigkeitsmessung stattgefunden hat und ob Sie bereits einen "
+    "Strafbefehl erhalten haben."
+).split()
+
+
+class MockSettings:
+    def __init__(self, latency_ms: float, jitter_ms: float, chunk_ms: float, completion_words: int, cached_ratio: float):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chunk_ms = chunk_ms
+        self.completion_words = completion_words
+        self.cached_ratio = cached_ratio
+
+
+def _last_user_text(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content")
+            return content if isinstance(content, str) else json.dumps(content)
+    return ""
+
+
+def _handoff_tool(body: Dict[str, Any]) -> Optional[str]:
+    """
+    Name of the handoff tool to call, if the triage agent would hand off.
+    """
+    if any(message.get("role") == "tool" for message in body["messages"]):
+        return None
+    tools = [tool["function"]["name"] for tool in body.get("tools", []) if tool.get("type") == "function"]
+    text = _last_user_text(body["messages"]).lower()
+    for keyword, target in HANDOFF_KEYWORDS.items():
+        if keyword in text:
+            for tool in tools:
+                if tool.startswith("transfer_to_") and target in tool:
+                    return tool
+    return None
+
+
+def _usage(body: Dict[str, Any], settings: MockSettings) -> Dict[str, Any]:
+    # Rough token estimate: 4 characters per token
+    prompt_tokens = max(1, len(json.dumps(body["messages"])) // 4)
+    completion_tokens = settings.completion_words * 2
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": int(prompt_tokens * settings.cached_ratio)}
+    }
+
+
+def create_app(settings: MockSettings) -> FastAPI:
+    app = FastAPI()
+    stats = {"requests": 0, "streamed": 0, "handoffs": 0}
+
+    @app.get("/health")
+    async def health():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        tool = _handoff_tool(body)
+        if tool:
+            stats["handoffs"] += 1
+        words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(settings.completion_words)]
+        usage = _usage(body, settings)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        latency = max(0.0, settings.latency_ms + random.uniform(-settings.jitter_ms, settings.jitter_ms)) / 1000
+        await asyncio.sleep(latency)
+
+        if body.get("stream"):
+            stats["streamed"] += 1
+
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+                return "data: " + json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body["model"],
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                }) + "\n\n"
+
+            async def events():
+                if tool:
+                    yield chunk({"role": "assistant", "tool_calls": [
+                        {"index": 0, "id": "call_handoff", "type": "function", "function": {"name": tool, "arguments": "{}"}}
+                    ]})
+                    yield chunk({}, "tool_calls")
+                else:
+                    for word in words:
+                        yield chunk({"role": "assistant", "content": word + " "})
+                        if settings.chunk_ms:
+                            await asyncio.sleep(settings.chunk_ms / 1000)
+                    yield chunk({}, "stop")
+                yield "data: " + json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body["model"],
+                    "choices": [],
+                    "usage": usage
+                }) + "\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        message: Dict[str, Any] = {"role": "assistant", "content": None if tool else " ".join(words)}
+        if tool:
+            message["tool_calls"] = [{"id": "call_handoff", "type": "function", "function": {"name": tool, "arguments": "{}"}}]
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": body["model"],
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool else "stop"}],
+            "usage": usage
+        })
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Delay before the first token")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="Random +/- variation of the latency")
+    parser.add_argument("--chunk-ms", type=float, default=10, help="Delay between streamed chunks")
+    parser.add_argument("--completion-words", type=int, default=40, help="Length of the answers")
+    parser.add_argument("--cached-ratio", type=float, default=0.5, help="Share of prompt tokens reported as cached")
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency_ms, args.jitter_ms, args.chunk_ms, args.completion_words, args.cached_ratio)
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
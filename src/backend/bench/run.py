@@ -0,0 +1,532 @@
+"""
+Load test for the backend against the mock OpenAI server.
+
+Starts the mock server and the app (uvicorn or gunicorn) as subprocesses, runs
+a mixed workload for a fixed duration and writes throughput, latency
+percentiles, event loop lag and peak memory to a JSON file:
+
+    python -m bench.run --duration 60 --concurrency 16
+    python -m bench.run --mix chat=1 --compare bench/results/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from bench.fixtures import make_docx, make_pdf
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "bench", "results")
+API_KEY = "bench"
+
+DEFAULT_MIX = "chat=50,stream=10,parse=15,finalize=15,finalize_form=10"
+
+CHAT_OPENERS = [
+    "Ich wurde geblitzt, was soll ich tun?",
+    "Ich habe einen Zahlungsbefehl erhalten, die Betreibung ist ungerechtfertigt.",
+    "Mein Nachbar hat einen Baum gefällt, der auf meinem Grundstück stand."
+]
+CHAT_FOLLOW_UPS = [
+    "Es war innerorts, ich bin 73 km/h gefahren.",
+    "Der Strafbefehl ist vom letzten Montag.",
+    "Ich habe noch keine Einsprache erhoben.",
+    "Was sind die nächsten Schritte?"
+]
+
+
+@dataclass
+class Sample:
+    scenario: str
+    started: float
+    latency: float
+    status: int
+    ttfb: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class RunState:
+    samples: List[Sample] = field(default_factory=list)
+    rss_peak_server_kb: int = 0
+    rss_peak_total_kb: int = 0
+    probe_latencies: List[float] = field(default_factory=list)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """
+    Nearest-rank percentile.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, Optional[float]]:
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+    return {
+        "p50": ms(percentile(seconds, 0.50)),
+        "p95": ms(percentile(seconds, 0.95)),
+        "p99": ms(percentile(seconds, 0.99)),
+        "mean": ms(sum(seconds) / len(seconds)) if seconds else None,
+        "max": ms(max(seconds)) if seconds else None
+    }
+
+
+# --- Processes ---------------------------------------------------------------
+
+def _proc_children(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as children_file:
+                children.extend(int(child) for child in children_file.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss_kb(pid: int) -> Tuple[int, int]:
+    """
+    RSS of a process and of the process with all its descendants (Linux only).
+    """
+    own = _rss_kb(pid)
+    total, pending = own, _proc_children(pid)
+    while pending:
+        child = pending.pop()
+        total += _rss_kb(child)
+        pending.extend(_proc_children(child))
+    return own, total
+
+
+def start_process(command: List[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    log_file = open(log_path, "w")
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def stop_process(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} during startup")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def app_command(args) -> List[str]:
+    if args.server == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "app.app:app", "-c", "gunicorn.conf.py"]
+    return [sys.executable, "-m", "uvicorn", "app.app:app", "--host", "127.0.0.1", "--port", str(args.app_port), "--log-level", "warning"]
+
+
+def app_env(args, work_dir: str) -> Dict[str, str]:
+    mock_url = f"http://127.0.0.1:{args.mock_port}/v1"
+    env = {
+        **os.environ,
+        "CLIENT_API_KEY": API_KEY,
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": mock_url,
+        "MODEL_BASE_URL": mock_url,
+        "OPENAI_AGENTS_DISABLE_TRACING": "1",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        "DOCUMENT_CACHE_DIR": os.path.join(work_dir, "document-cache"),
+        "REPORT_RESULT_DIR": os.path.join(work_dir, "reports"),
+        "GUNICORN_BIND": f"127.0.0.1:{args.app_port}",
+        "WEB_CONCURRENCY": str(args.workers)
+    }
+    return env
+
+
+# --- Scenarios -----------------------------------------------------------------
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, rng: random.Random, args):
+        self.client = client
+        self.rng = rng
+        self.args = args
+        self.headers = {"Authorization": f"Bearer {API_KEY}"}
+        self.counter = 0
+        # Attachments are reused across reports; parsing gets unique documents
+        self.attachment_pool = [make_pdf(self.rng.randint(1, 3), f"attachment-{i}") for i in range(20)]
+        self.attachment_pool_b64 = [base64.b64encode(pdf).decode("ascii") for pdf in self.attachment_pool]
+
+    def _marker(self) -> str:
+        self.counter += 1
+        return f"{os.getpid()}-{self.counter}-{self.rng.random():.6f}"
+
+    def _conversation(self) -> List[Dict[str, str]]:
+        messages = [{"role": "user", "content": self.rng.choice(CHAT_OPENERS)}]
+        for _ in range(self.rng.randint(0, 3)):
+            messages.append({"role": "assistant", "content": "Bitte beschreiben Sie den Sachverhalt genauer."})
+            messages.append({"role": "user", "content": self.rng.choice(CHAT_FOLLOW_UPS)})
+        return messages
+
+    def _attachment_count(self) -> int:
+        low, high = self.args.attachments
+        return self.rng.randint(low, high)
+
+    async def chat(self, record) -> None:
+        """
+        A multi-turn conversation: each turn sends the full history to /agent.
+        """
+        history = [{"role": "user", "content": self.rng.choice(CHAT_OPENERS)}]
+        for turn in range(self.rng.randint(1, 4)):
+            started = time.perf_counter()
+            response = await self.client.post("/agent", json=history, headers=self.headers)
+            record("chat", started, response.status_code)
+            if response.status_code != 200:
+                return
+            history.append({"role": "assistant", "content": str(response.json())})
+            history.append({"role": "user", "content": self.rng.choice(CHAT_FOLLOW_UPS)})
+
+    async def stream(self, record) -> None:
+        started = time.perf_counter()
+        first_delta = None
+        event = None
+        done = False
+        error = None
+        async with self.client.stream("POST", "/agent/stream", json=self._conversation(), headers=self.headers) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    if first_delta is None and event == "delta":
+                        first_delta = time.perf_counter() - started
+                    done = done or event == "done"
+                elif line.startswith("data: ") and event == "error" and error is None:
+                    error = line[len("data: "):][:200]
+            # Errors after the first frame arrive as an "error" event with status 200
+            if response.status_code == 200 and error is None and not done:
+                error = "stream ended without a done event"
+            record("stream", started, response.status_code, ttfb=first_delta, error=error)
+
+    async def parse(self, record) -> None:
+        if self.rng.random() < 0.7:
+            filename, content, content_type = "dokument.pdf", make_pdf(self.rng.randint(1, 5), self._marker()), "application/pdf"
+        else:
+            filename, content, content_type = (
+                "dokument.docx",
+                make_docx(40, self._marker()),
+                "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            )
+        started = time.perf_counter()
+        response = await self.client.post(
+            "/parse-document",
+            files={"file": (filename, content, content_type)},
+            headers=self.headers
+        )
+        error = None
+        if response.status_code == 200 and "error" in response.json():
+            error = str(response.json()["error"])[:200]
+        record("parse", started, response.status_code, error=error)
+
+    async def finalize(self, record) -> None:
+        indices = [self.rng.randrange(len(self.attachment_pool)) for _ in range(self._attachment_count())]
+        body = {
+            "title": "Benchmark Report",
+            "messages": self._conversation(),
+            "pdf_files": [{"filename": f"beilage-{n}.pdf", "content": self.attachment_pool_b64[i]} for n, i in enumerate(indices)]
+        }
+        started = time.perf_counter()
+        response = await self.client.post("/finalize-report", json=body, headers=self.headers)
+        record("finalize", started, response.status_code)
+
+    async def finalize_form(self, record) -> None:
+        indices = [self.rng.randrange(len(self.attachment_pool)) for _ in range(self._attachment_count())]
+        files = [("files", (f"beilage-{n}.pdf", self.attachment_pool[i], "application/pdf")) for n, i in enumerate(indices)]
+        data = {"title": "Benchmark Report", "messages": json.dumps(self._conversation())}
+        started = time.perf_counter()
+        response = await self.client.post("/finalize-report-form", data=data, files=files, headers=self.headers)
+        record("finalize_form", started, response.status_code)
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"chat", "stream", "parse", "finalize", "finalize_form"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def parse_range(value: str) -> Tuple[int, int]:
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+# --- Measurement ---------------------------------------------------------------
+
+async def sample_resources(state: RunState, client: httpx.AsyncClient, pid: int, stop: asyncio.Event) -> None:
+    """
+    Track peak RSS and the latency of the health endpoint while the load runs.
+    """
+    while not stop.is_set():
+        own, total = process_tree_rss_kb(pid)
+        state.rss_peak_server_kb = max(state.rss_peak_server_kb, own)
+        state.rss_peak_total_kb = max(state.rss_peak_total_kb, total)
+        started = time.perf_counter()
+        try:
+            await client.get("/", timeout=10)
+            state.probe_latencies.append(time.perf_counter() - started)
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+def read_lag_histogram(client: httpx.Client) -> Dict[str, float]:
+    """
+    Cumulative bucket counts of manona_event_loop_lag_seconds from /metrics.
+    """
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {API_KEY}"})
+    buckets: Dict[str, float] = {}
+    for line in response.text.splitlines():
+        if line.startswith("manona_event_loop_lag_seconds_bucket"):
+            bound = line.split('le="', 1)[1].split('"', 1)[0]
+            buckets[bound] = float(line.rsplit(" ", 1)[1])
+    return buckets
+
+
+def lag_summary(before: Dict[str, float], after: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Percentiles (upper bucket bounds) of the lag samples taken during the run.
+    Only covers the worker that answered /metrics.
+    """
+    bounds = sorted((bound for bound in after if bound != "+Inf"), key=float) + ["+Inf"]
+    counts = [after.get(bound, 0) - before.get(bound, 0) for bound in bounds]
+    total = counts[-1] if counts else 0
+    summary: Dict[str, Any] = {"samples": int(total)}
+    for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+        if not total:
+            summary[name] = None
+            continue
+        bound = next(bound for bound, count in zip(bounds, counts) if count >= fraction * total)
+        summary[name] = None if bound == "+Inf" else round(float(bound) * 1000, 2)
+    return summary
+
+
+def summarize(state: RunState, duration: float) -> Dict[str, Any]:
+    scenarios: Dict[str, Any] = {}
+    for name in sorted({sample.scenario for sample in state.samples}):
+        samples = [sample for sample in state.samples if sample.scenario == name]
+        ok = [sample for sample in samples if sample.status < 400 and not sample.error]
+        status_codes: Dict[str, int] = {}
+        for sample in samples:
+            status_codes[str(sample.status)] = status_codes.get(str(sample.status), 0) + 1
+        result = {
+            "requests": len(samples),
+            "errors": len(samples) - len(ok),
+            "status_codes": status_codes,
+            "throughput_rps": round(len(ok) / duration, 3),
+            "latency_ms": latency_summary([sample.latency for sample in ok])
+        }
+        ttfb = [sample.ttfb for sample in ok if sample.ttfb is not None]
+        if ttfb:
+            result["ttfb_ms"] = latency_summary(ttfb)
+        sample_errors = sorted({sample.error for sample in samples if sample.error})
+        if sample_errors:
+            result["sample_errors"] = sample_errors[:5]
+        scenarios[name] = result
+
+    ok_total = [sample for sample in state.samples if sample.status < 400 and not sample.error]
+    return {
+        "scenarios": scenarios,
+        "total": {
+            "requests": len(state.samples),
+            "errors": len(state.samples) - len(ok_total),
+            "throughput_rps": round(len(ok_total) / duration, 3),
+            "latency_ms": latency_summary([sample.latency for sample in ok_total])
+        },
+        "health_probe_ms": latency_summary(state.probe_latencies),
+        "peak_rss_mb": {
+            "server": round(state.rss_peak_server_kb / 1024, 1),
+            "server_with_children": round(state.rss_peak_total_kb / 1024, 1)
+        }
+    }
+
+
+async def run_load(args, app_pid: int) -> Tuple[RunState, float]:
+    state = RunState()
+    rng = random.Random(args.seed)
+    mix = args.mix
+    names, weights = list(mix), list(mix.values())
+    base_url = f"http://127.0.0.1:{args.app_port}"
+    limits = httpx.Limits(max_connections=args.concurrency + 2, max_keepalive_connections=args.concurrency + 2)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        workload = Workload(client, rng, args)
+        deadline = time.perf_counter() + args.warmup + args.duration
+        measure_from = time.perf_counter() + args.warmup
+
+        def record(scenario: str, started: float, status: int, ttfb: Optional[float] = None, error: Optional[str] = None) -> None:
+            if started >= measure_from:
+                state.samples.append(Sample(scenario, started, time.perf_counter() - started, status, ttfb, error))
+
+        async def user() -> None:
+            while time.perf_counter() < deadline:
+                scenario = rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    await getattr(workload, scenario)(record)
+                except httpx.HTTPError as e:
+                    record(scenario, started, 599, error=f"{type(e).__name__}: {str(e)[:200]}")
+
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_resources(state, client, app_pid, stop))
+        await asyncio.gather(*(user() for _ in range(args.concurrency)))
+        stop.set()
+        await sampler
+    return state, args.duration
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Changes of throughput and latency percentiles against a previous result.
+    """
+    def change(new, old):
+        if new is None or old in (None, 0):
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    lines = [f"{'scenario':<14} {'metric':<10} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for name, result in {**current["scenarios"], "total": current["total"]}.items():
+        old = baseline["total"] if name == "total" else baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        rows = [("rps", result["throughput_rps"], old["throughput_rps"])]
+        rows += [(p, result["latency_ms"][p], old["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        for metric, new_value, old_value in rows:
+            lines.append(f"{name:<14} {metric:<10} {str(old_value):>10} {str(new_value):>10} {change(new_value, old_value):>8}")
+    return lines
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the backend against a mock OpenAI server")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of load before measuring")
+    parser.add_argument("--concurrency", type=int, default=8, help="Simulated concurrent users")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--attachments", type=parse_range, default=(1, 50), help="Attachments per report, e.g. 1-50")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers")
+    parser.add_argument("--app-port", type=int, default=8800)
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--mock-latency-ms", type=float, default=300)
+    parser.add_argument("--mock-jitter-ms", type=float, default=100)
+    parser.add_argument("--mock-chunk-ms", type=float, default=10)
+    parser.add_argument("--request-timeout", type=float, default=180)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Result file (default bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous result file to compare against")
+    args = parser.parse_args()
+
+    work_dir = os.path.join(RESULTS_DIR, ".work")
+    os.makedirs(work_dir, exist_ok=True)
+
+    mock = start_process(
+        [sys.executable, "-m", "bench.mock_openai", "--port", str(args.mock_port),
+         "--latency-ms", str(args.mock_latency_ms), "--jitter-ms", str(args.mock_jitter_ms),
+         "--chunk-ms", str(args.mock_chunk_ms)],
+        dict(os.environ),
+        os.path.join(work_dir, "mock.log")
+    )
+    app = None
+    try:
+        wait_until_ready(f"http://127.0.0.1:{args.mock_port}/health", mock)
+        app = start_process(app_command(args), app_env(args, work_dir), os.path.join(work_dir, "app.log"))
+        startup_seconds = wait_until_ready(f"http://127.0.0.1:{args.app_port}/", app)
+        print(f"App ready after {startup_seconds:.2f}s, running {args.duration}s with {args.concurrency} users")
+
+        with httpx.Client(base_url=f"http://127.0.0.1:{args.app_port}", timeout=10) as client:
+            lag_before = read_lag_histogram(client)
+            state, duration = asyncio.run(run_load(args, app.pid))
+            lag_after = read_lag_histogram(client)
+    finally:
+        if app is not None:
+            stop_process(app)
+        stop_process(mock)
+
+    result = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": {
+                key: value for key, value in vars(args).items() if key not in ("output", "compare")
+            },
+            "startup_seconds": round(startup_seconds, 3)
+        },
+        **summarize(state, duration),
+        "event_loop_lag_ms": lag_summary(lag_before, lag_after)
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as output_file:
+        json.dump(result, output_file, indent=2)
+
+    for name, scenario in result["scenarios"].items():
+        latency = scenario["latency_ms"]
+        print(f"{name:<14} {scenario['requests']:>6} req  {scenario['errors']:>4} err  {scenario['throughput_rps']:>8} rps  "
+              f"p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']} ms")
+    print(f"event loop lag {result['event_loop_lag_ms']}, peak RSS {result['peak_rss_mb']}")
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as baseline_file:
+            print("\n".join(compare(result, json.load(baseline_file))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Gunicorn configuration for production: uvicorn workers, one per available CPU
+(limited by the container's memory), with the app preloaded in the master.
+
+    gunicorn app.app:app -c gunicorn.conf.py
+
+All settings can be overridden with the environment variables below.
+"""
+import os
+import math
+import importlib.util
+
+from dotenv import load_dotenv
+
+# Same settings as the app, which loads app/.env only after this file has been read
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", ".env"))
+
+
+def _cgroup_cpu_limit():
+    """
+    CPU quota of the container (cgroup v2 or v1), None if unlimited.
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as cpu_max:
+            quota, period = cpu_max.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as quota_file, open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as period_file:
+            quota, period = int(quota_file.read()), int(period_file.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _cgroup_memory_limit_mb():
+    """
+    Memory limit of the container in MB, None if unlimited.
+    """
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as limit_file:
+                value = limit_file.read().strip()
+        except OSError:
+            continue
+        if value != "max" and int(value) < 1 << 60:
+            return int(value) // (1024 * 1024)
+    return None
+
+
+def available_cpus() -> int:
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    quota = _cgroup_cpu_limit()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def default_workers() -> int:
+    """
+    One async worker per CPU: requests wait on the model APIs without blocking
+    the loop, and CPU-bound work (PDF assembly, parsing) runs in the workers'
+    pools. Each worker, including its document parser processes, is budgeted
+    GUNICORN_WORKER_MEMORY_MB.
+    """
+    workers = available_cpus()
+    memory_mb = _cgroup_memory_limit_mb()
+    if memory_mb is not None:
+        per_worker_mb = int(os.environ.get("GUNICORN_WORKER_MEMORY_MB", "1024"))
+        workers = min(workers, memory_mb // per_worker_mb)
+    return max(1, workers)
+
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get("WEB_CONCURRENCY") or default_workers())
+
+# In-memory sessions live in one worker, so with several workers a follow-up
+# turn usually reaches a worker that doesn't know the session. Share them via
+# SQLite unless a session store is configured explicitly.
+if workers > 1:
+    os.environ.setdefault("SESSION_STORE", "sqlite")
+
+# uvicorn.workers is deprecated in favor of the uvicorn-worker package
+worker_class = (
+    "uvicorn_worker.UvicornWorker"
+    if importlib.util.find_spec("uvicorn_worker")
+    else "uvicorn.workers.UvicornWorker"
+)
+
+# Import the app (agents, models, ReportLab) once in the master; workers are forked from it
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+# Seconds a worker may not report back before it is restarted. Uvicorn workers
+# report from the event loop, so this only fires when the loop is blocked, not
+# for long model calls.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+
+# Time for running requests (model calls, reports) to finish on shutdown or
+# reload; covers a full OpenAI request (OPENAI_TIMEOUT_SECONDS)
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "130"))
+
+# Idle keep-alive of client connections. Longer than the Azure Container Apps
+# ingress (240s), so the app never closes a connection the ingress is about to
+# reuse, which would surface as sporadic 502s.
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "300"))
+
+# Optional recycling of workers after a number of requests, 0 disables it
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# Access logs are covered by the request metrics; errors go to stderr
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info").lower()
+
+# /tmp may be slow disk in containers, the worker heartbeat files belong in memory
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def when_ready(server):
+    server.log.info(f"Starting {workers} {worker_class} workers ({available_cpus()} CPUs, preload={preload_app})")
+    if workers > 1 and os.environ.get("SESSION_STORE", "").lower() == "memory":
+        server.log.warning(
+            f"SESSION_STORE=memory with {workers} workers: sessions are lost when a "
+            "turn reaches another worker, use SESSION_STORE=sqlite"
+        )
+
+
+def post_fork(server, worker):
+    # The log writer thread of the preloaded app does not survive the fork
+    from app.logging_setup import configure_logging
+    configure_logging()
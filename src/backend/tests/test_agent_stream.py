@@ -0,0 +1,41 @@
+import asyncio
+from types import SimpleNamespace
+
+from openai.types.responses import ResponseTextDeltaEvent
+
+from app import app as server
+
+
+class EndlessRun:
+    """
+    Streamed run that keeps sending text deltas until it is cancelled.
+    """
+
+    def __init__(self):
+        self.is_complete = False
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        self.is_complete = True
+
+    async def stream_events(self):
+        delta = ResponseTextDeltaEvent.model_construct(delta="Grüezi ", type="response.output_text.delta")
+        while not self.is_complete:
+            yield SimpleNamespace(type="raw_response_event", data=delta)
+            await asyncio.sleep(0)
+
+
+def test_client_disconnect_cancels_the_run(monkeypatch):
+    run = EndlessRun()
+    monkeypatch.setattr(server, "Runner", SimpleNamespace(run_streamed=lambda *args, **kwargs: run))
+
+    async def consume():
+        stream = server.main_streamed([server.Message(role="user", content="Ich wurde geblitzt")])
+        assert (await anext(stream)).startswith("event: agent")
+        assert (await anext(stream)).startswith("event: delta")
+        # What StreamingResponse does when the client goes away
+        await stream.aclose()
+
+    asyncio.run(consume())
+    assert run.cancelled
@@ -0,0 +1,60 @@
+import io
+from dataclasses import dataclass
+
+import PyPDF2
+
+from app import cover_page
+from app.cover_page import add_cover_page, cover_page_text, render_cover_page, role_display
+
+
+@dataclass
+class Message:
+    role: str
+    content: str
+
+
+MESSAGES = [
+    Message("user", "Ich wurde geblitzt <b>innerorts</b> & soll 250 Fr. zahlen."),
+    Message("assistant", "Gegen den Strafbefehl können Sie Einsprache erheben.")
+]
+
+
+def report_with_pages(*widths):
+    writer = PyPDF2.PdfWriter()
+    for width in widths:
+        writer.add_blank_page(width=width, height=200)
+    return writer
+
+
+def test_cover_page_renders_markup_as_text():
+    buffer = render_cover_page("Fall 42", "Busse wegen Geschwindigkeit", ["strafbefehl.pdf"], MESSAGES)
+    text = "".join(page.extract_text() for page in PyPDF2.PdfReader(buffer).pages)
+    assert "Fall 42" in text
+    assert "strafbefehl.pdf" in text
+    assert "<b>innerorts</b> &" in text
+
+
+def test_cover_page_is_inserted_at_the_front():
+    writer = report_with_pages(100, 110)
+    add_cover_page(writer, "Fall 42", "Zusammenfassung", ["a.pdf"], MESSAGES)
+    assert len(writer.pages) >= 3
+    assert [float(page.mediabox.width) for page in writer.pages[-2:]] == [100, 110]
+    assert "Fall 42" in writer.pages[0].extract_text()
+
+
+def test_failed_render_falls_back_to_a_minimal_cover_page(monkeypatch):
+    def broken(*args):
+        raise ValueError("layout error")
+
+    monkeypatch.setattr(cover_page, "render_cover_page", broken)
+    writer = report_with_pages(100)
+    add_cover_page(writer, "Fall 42", "Zusammenfassung", [], MESSAGES)
+    assert len(writer.pages) == 2
+    assert "Fall 42" in writer.pages[0].extract_text()
+
+
+def test_plain_text_version():
+    text = cover_page_text("Fall 42", "Zusammenfassung", ["a.pdf", "b.pdf"], MESSAGES)
+    assert text.startswith("Fall 42\n\nCASE SUMMARY:\nZusammenfassung\n\nATTACHED DOCUMENTS:\n1. a.pdf\n2. b.pdf\n")
+    assert f"Client:\n{MESSAGES[0].content}\n\nLegal Assistant:\n{MESSAGES[1].content}\n\n" in text
+    assert role_display("user") == "Client"
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from app import document_parsing
+from app.document_cache import DocumentCache, make_cache_key
+
+SHA = "ab" * 32
+
+
+def document(text):
+    return {"text": text, "pages": 1}
+
+
+def test_key_depends_on_content_and_strategy():
+    assert make_cache_key(SHA, "tiered-v1-pdf") == make_cache_key(SHA, "tiered-v1-pdf")
+    assert make_cache_key(SHA, "tiered-v1-pdf") != make_cache_key(SHA, "tiered-v2-pdf")
+    assert make_cache_key(SHA, "tiered-v1-pdf") != make_cache_key("cd" * 32, "tiered-v1-pdf")
+    assert make_cache_key(SHA, "../fast/pdf") == f"{SHA}-___fast_pdf"
+
+
+@pytest.mark.parametrize("setting, value", [
+    ("MIN_PAGE_CHARS", 100),
+    ("FALLBACK_STRATEGY", "ocr_only"),
+    ("OCR_LANGUAGES", ["deu"])
+])
+def test_parser_settings_are_part_of_the_key(monkeypatch, setting, value):
+    default = make_cache_key(SHA, document_parsing.parser_fingerprint())
+    monkeypatch.setattr(document_parsing, setting, value)
+    assert make_cache_key(SHA, document_parsing.parser_fingerprint()) != default
+
+
+def test_memory_hit(tmp_path):
+    cache = DocumentCache(memory_max_bytes=1024, disk_dir=str(tmp_path), disk_max_bytes=1024 * 1024)
+    cache.put("key", document("Verfügung"))
+    assert cache.get("key") == document("Verfügung")
+    assert cache.get("other") is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 0, 1)
+
+
+def test_disk_hit_after_restart_is_promoted(tmp_path):
+    DocumentCache(1024, str(tmp_path), 1024 * 1024).put("key", document("Verfügung"))
+
+    cache = DocumentCache(1024, str(tmp_path), 1024 * 1024)
+    assert cache.get("key") == document("Verfügung")
+    assert cache.get("key") == document("Verfügung")
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 0)
+    assert stats["disk_bytes"] == os.path.getsize(tmp_path / "key.json.gz")
+
+
+def test_changed_strategy_misses_the_disk_tier(tmp_path):
+    DocumentCache(1024, str(tmp_path), 1024 * 1024).put(make_cache_key(SHA, "tiered-v1-pdf"), document("alt"))
+
+    cache = DocumentCache(1024, str(tmp_path), 1024 * 1024)
+    assert cache.get(make_cache_key(SHA, "tiered-v2-pdf")) is None
+    assert cache.get(make_cache_key(SHA, "tiered-v1-pdf")) == document("alt")
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = DocumentCache(memory_max_bytes=120, disk_dir=None, disk_max_bytes=0)
+    cache.put("a", document("a" * 30))
+    cache.put("b", document("b" * 30))
+    cache.get("a")
+    cache.put("c", document("c" * 30))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["memory_evictions"] == 1
+
+
+def test_disk_tier_evicts_oldest_files(tmp_path):
+    cache = DocumentCache(memory_max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=1024 * 1024)
+    cache.put("a", document("a" * 100))
+    entry_size = os.path.getsize(tmp_path / "a.json.gz")
+    os.utime(tmp_path / "a.json.gz", (1, 1))
+
+    cache.disk_max_bytes = entry_size * 3 // 2
+    cache.put("b", document("b" * 100))
+    assert sorted(os.listdir(tmp_path)) == ["b.json.gz"]
+    assert cache.get("a") is None
+    assert cache.stats()["disk_evictions"] == 1
+
+
+def test_unreadable_entry_is_dropped(tmp_path):
+    (tmp_path / "key.json.gz").write_bytes(b"not gzip")
+    cache = DocumentCache(1024, str(tmp_path), 1024 * 1024)
+    assert cache.get("key") is None
+    assert not (tmp_path / "key.json.gz").exists()
+    assert cache.stats()["disk_bytes"] == 0
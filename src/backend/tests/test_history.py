@@ -0,0 +1,95 @@
+import asyncio
+
+from app.history import SUMMARY_PREFIX, HistoryCompactor, TokenCounter
+
+
+class WordCounter(TokenCounter):
+    """
+    One token per word, independent of whether tiktoken is installed.
+    """
+
+    def count_text(self, text):
+        return len(text.split())
+
+
+def conversation(turns, words=50):
+    items = []
+    for turn in range(turns):
+        items.append({"role": "user", "content": " ".join([f"frage{turn}"] * words)})
+        items.append({"role": "assistant", "content": " ".join([f"antwort{turn}"] * words)})
+    return items
+
+
+def compactor(summaries, **kwargs):
+    async def summarize(previous, items):
+        summaries.append((previous, len(items)))
+        return f"summary of {len(items)} items"
+
+    options = {"budget_tokens": 300, "keep_recent_turns": 2, "document_tokens": 0}
+    options.update(kwargs)
+    return HistoryCompactor(summarize, counter=WordCounter(), **options)
+
+
+def test_history_within_budget_is_unchanged():
+    items = conversation(2)
+    result = compactor([]).compact(items)
+    assert result.items is items
+    assert not result.compacted
+    assert not result.summary_pending
+
+
+def test_recent_turns_stay_verbatim_and_summary_is_reused():
+    summaries = []
+    history = compactor(summaries)
+    items = conversation(6)
+
+    async def run():
+        first = history.compact(items)
+        # No summary yet: the full history is sent, a summary is scheduled
+        assert first.items == items
+        assert first.summary_pending
+        await asyncio.gather(*history._summaries.tasks)
+
+        second = history.compact(items)
+        assert not second.summary_pending
+        return second
+
+    second = asyncio.run(run())
+    # The last two user turns start at item 8
+    assert summaries == [(None, 8)]
+    assert second.summarized_items == 8
+    assert second.items[0] == {"role": "system", "content": SUMMARY_PREFIX + "summary of 8 items"}
+    assert second.items[1:] == items[8:]
+    assert second.tokens < second.original_tokens
+    assert history.stats()["summary_hits"] == 1
+
+
+def test_summary_is_extended_with_newer_turns():
+    summaries = []
+    history = compactor(summaries)
+    items = conversation(6)
+
+    async def run():
+        history.compact(items)
+        await asyncio.gather(*history._summaries.tasks)
+        longer = items + conversation(1)
+        result = history.compact(longer)
+        await asyncio.gather(*history._summaries.tasks)
+        return result
+
+    result = asyncio.run(run())
+    # The stored summary covers 8 items; the turn that left the window is added to it
+    assert result.summarized_items == 8
+    assert result.summary_pending
+    assert summaries == [(None, 8), ("summary of 8 items", 2)]
+
+
+def test_large_documents_are_excerpted():
+    history = compactor([], document_tokens=100)
+    items = conversation(3)
+    items[0] = {"role": "user", "content": " ".join(["dokument"] * 400)}
+
+    result = history.compact(items)
+    assert result.excerpted_documents == 1
+    assert result.items[0]["content"].startswith("[Gekürztes Dokument")
+    assert result.items[1:] == items[1:]
@@ -0,0 +1,91 @@
+import io
+
+import PyPDF2
+import pytest
+
+from app.pdf_merge import AttachmentError, add_pdf, merge_attachments, file_size, iter_file_chunks, write_pdf
+
+
+def make_pdf(*widths):
+    """PDF with one blank page per width, so pages can be told apart."""
+    writer = PyPDF2.PdfWriter()
+    for width in widths:
+        writer.add_blank_page(width=width, height=200)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def page_widths(writer):
+    return [float(page.mediabox.width) for page in writer.pages]
+
+
+def test_pages_are_appended_in_order():
+    writer = PyPDF2.PdfWriter()
+    assert add_pdf(writer, io.BytesIO(make_pdf(100, 110)), "a.pdf") == 2
+    assert add_pdf(writer, io.BytesIO(make_pdf(120)), "b.pdf") == 1
+    assert page_widths(writer) == [100, 110, 120]
+
+
+def test_unreadable_document_gets_a_placeholder():
+    writer = PyPDF2.PdfWriter()
+    assert add_pdf(writer, io.BytesIO(b"not a pdf"), "broken.pdf") == 1
+    assert page_widths(writer) == [612]
+
+
+def test_written_report_is_streamed_and_closed():
+    writer = PyPDF2.PdfWriter()
+    add_pdf(writer, io.BytesIO(make_pdf(100, 110)), "a.pdf")
+    output = write_pdf(writer)
+    size = file_size(output)
+
+    chunks = list(iter_file_chunks(output, chunk_size=100))
+    assert output.closed
+    assert all(len(chunk) == 100 for chunk in chunks[:-1])
+    content = b"".join(chunks)
+    assert len(content) == size
+    assert len(PyPDF2.PdfReader(io.BytesIO(content)).pages) == 2
+
+
+def test_attachments_are_merged_in_order():
+    writer = merge_attachments([
+        ("a.pdf", lambda: io.BytesIO(make_pdf(100))),
+        ("broken.pdf", lambda: io.BytesIO(b"not a pdf")),
+        ("b.pdf", lambda: io.BytesIO(make_pdf(120, 130)))
+    ])
+    assert page_widths(writer) == [100, 612, 120, 130]
+
+
+def test_attachment_that_cannot_be_opened_is_reported():
+    def open_broken():
+        raise ValueError("Incorrect padding")
+
+    with pytest.raises(AttachmentError) as error:
+        merge_attachments([("a.pdf", lambda: io.BytesIO(make_pdf(100))), ("b.pdf", open_broken)])
+    assert error.value.filename == "b.pdf"
+    assert error.value.message == "Incorrect padding"
+
+
+def test_outline_and_named_destinations_are_kept():
+    source = PyPDF2.PdfWriter()
+    for width in (120, 130, 140):
+        source.add_blank_page(width=width, height=200)
+    chapter = source.add_outline_item("Kapitel 1", 0)
+    source.add_outline_item("Abschnitt 1.1", 1, parent=chapter)
+    source.add_outline_item("Kapitel 2", 2)
+    source.add_named_destination("Verfuegung", 2)
+    buffer = io.BytesIO()
+    source.write(buffer)
+
+    writer = merge_attachments([
+        ("a.pdf", lambda: io.BytesIO(make_pdf(100))),
+        ("b.pdf", lambda: io.BytesIO(buffer.getvalue()))
+    ])
+    output = io.BytesIO()
+    writer.write(output)
+    reader = PyPDF2.PdfReader(output)
+
+    first, children, second = reader.outline
+    assert [first.title, children[0].title, second.title] == ["Kapitel 1", "Abschnitt 1.1", "Kapitel 2"]
+    assert [reader.get_destination_page_number(item) for item in (first, children[0], second)] == [1, 2, 3]
+    assert reader.get_destination_page_number(reader.named_destinations["Verfuegung"]) == 3
@@ -0,0 +1,94 @@
+import json
+
+from app.pre_router import DEFAULT_RULES, KeywordRules, PreRouter, TfidfModel, load_training_examples, tokenize
+
+RULES = KeywordRules(DEFAULT_RULES, margin=2)
+
+EXAMPLES = [
+    ("Ich habe eine Busse wegen Falschparken bekommen", "road_traffic"),
+    ("Mein Führerausweis wurde nach dem Unfall entzogen", "road_traffic"),
+    ("Die Polizei hat mich nach dem Unfall kontrolliert", "road_traffic"),
+    ("Ich habe einen Zahlungsbefehl für alte Schulden erhalten", "betreibung"),
+    ("Das Betreibungsamt will meinen Lohn pfänden", "betreibung"),
+    ("Mein Vermieter kündigt mir die Wohnung", "triage"),
+    ("Ich suche einen Anwalt für meine Scheidung", "triage")
+]
+
+
+def decide(text, threshold=0.8):
+    return RULES.decide(tokenize(text), threshold)
+
+
+def test_two_keywords_of_one_field_route():
+    decision = decide("Ich wurde geblitzt und soll eine Busse zahlen")
+    assert decision.role == "road_traffic"
+    assert decision.confidence == 0.8
+    assert decision.matched == ["geblitzt", "busse"]
+
+
+def test_single_keyword_stays_below_threshold():
+    decision = decide("Ich habe einen Zahlungsbefehl erhalten")
+    assert decision.role is None
+    assert decision.confidence == 0.75
+    assert decide("Ich habe einen Zahlungsbefehl erhalten", threshold=0.75).role == "betreibung"
+
+
+def test_stems_match_at_word_starts_only():
+    for text in ("Blitzschlag", "Blitzableiter", "Radarsensor", "Geschlechtsverkehr"):
+        decision = decide(text)
+        assert decision.role is None
+        assert decision.matched == []
+    assert decide("Radarfalle").matched == ["radarfall"]
+    assert decide("Betreibungsamt").matched == ["betreib"]
+
+
+def test_accents_and_case_are_ignored():
+    assert decide("PFÄNDUNG").matched == ["pfandung"]
+
+
+def test_runner_up_needs_a_margin():
+    rules = KeywordRules({"a": {"eins": 3, "zwei": 3}, "b": {"drei": 3, "vier": 2}}, margin=2)
+    decision = rules.decide(tokenize("eins zwei drei"), threshold=0.5)
+    assert decision.scores == {"a": 6.0, "b": 3.0}
+    assert decision.role == "a"
+    # Confident enough, but only one point ahead of the runner-up
+    decision = rules.decide(tokenize("eins zwei drei vier"), threshold=0.4)
+    assert decision.confidence == 0.5
+    assert decision.role is None
+
+
+def test_mixed_fields_are_not_routed():
+    assert decide("Verkehr Betreibung Zahlungsbefehl").role is None
+
+
+def test_shadow_mode_decides_but_does_not_route():
+    router = PreRouter(RULES, mode="shadow", threshold=0.8)
+    decision = router.route(["Ich wurde geblitzt und soll eine Busse zahlen"])
+    assert decision.role == "road_traffic"
+    assert not decision.routed
+    assert decision.log_fields()["route_decision"] == "shadow"
+
+    assert PreRouter(RULES, mode="on", threshold=0.8).route(["geblitzt, Busse"]).routed
+    assert PreRouter(RULES, mode="off").route(["geblitzt, Busse"]).method == "none"
+
+
+def test_model_decides_what_the_rules_leave_open():
+    router = PreRouter(RULES, TfidfModel.train(EXAMPLES), mode="on", model_threshold=0.4)
+    decision = router.route(["Nach dem Unfall hat die Polizei meinen Führerausweis eingezogen"])
+    assert decision.method == "model"
+    assert decision.role == "road_traffic"
+    assert not router.route(["Mein Vermieter will mir die Wohnung kündigen"]).routed
+
+
+def test_training_examples_come_from_triage_and_shadow_decisions(tmp_path):
+    log = tmp_path / "routing.log"
+    records = [
+        {"message": "Routing outcome", "route_text": "geblitzt", "final_role": "road_traffic", "route_decision": "triage"},
+        {"message": "Routing outcome", "route_text": "Zahlungsbefehl", "final_role": "betreibung", "route_decision": "routed"},
+        {"message": "Routing outcome", "route_text": "Radarfalle", "final_role": "road_traffic", "route_decision": "shadow"},
+        {"text": "Scheidung", "label": "triage"}
+    ]
+    log.write_text("\n".join(json.dumps(record) for record in records) + "\nnot json\n", encoding="utf-8")
+
+    assert load_training_examples([str(log)]) == [("geblitzt", "road_traffic"), ("Radarfalle", "road_traffic"), ("Scheidung", "triage")]
+    assert len(load_training_examples([str(log)], include_routed=True)) == 4
@@ -0,0 +1,144 @@
+import asyncio
+import io
+import json
+import time
+
+from app.report_jobs import REPORT_JOB_STALE_SECONDS, ReportJob, ReportJobManager, ReportJobStore, report_job_id
+
+JOB_ID = "a" * 32
+
+
+def new_job(job_id="a" * 32, status="queued", age=0.0):
+    updated = time.time() - age
+    return ReportJob(job_id=job_id, status=status, progress=status, created_at=updated, updated_at=updated)
+
+
+def write_meta(store, job):
+    # update() stamps the current time, so aged jobs are written directly
+    with open(store._meta_path(job.job_id), "w", encoding="utf-8") as meta_file:
+        json.dump(job.to_dict(), meta_file)
+
+
+def test_job_id_depends_on_part_boundaries():
+    assert report_job_id(["ab", "c"]) != report_job_id(["a", "bc"])
+    assert report_job_id(["ab", "c"]) == report_job_id(["ab", "c"])
+
+
+def test_create_claims_a_job_id_once(tmp_path):
+    store = ReportJobStore(str(tmp_path), ttl_seconds=60)
+    job = new_job()
+    assert store.create(job)
+    assert not store.create(new_job())
+    assert store.get(job.job_id).status == "queued"
+
+
+def test_update_replaces_the_job(tmp_path):
+    store = ReportJobStore(str(tmp_path), ttl_seconds=60)
+    job = new_job()
+    store.create(job)
+    job.status, job.progress = "running", "summarizing"
+    store.update(job)
+    assert store.get(job.job_id).progress == "summarizing"
+
+
+def test_job_without_progress_is_reported_as_failed(tmp_path):
+    store = ReportJobStore(str(tmp_path), ttl_seconds=REPORT_JOB_STALE_SECONDS * 2)
+    write_meta(store, new_job(status="running", age=REPORT_JOB_STALE_SECONDS + 1))
+    job = store.get("a" * 32)
+    assert job.status == "failed"
+    assert job.error_status == 500
+
+
+def test_finished_jobs_expire_after_ttl(tmp_path):
+    store = ReportJobStore(str(tmp_path), ttl_seconds=60)
+    write_meta(store, new_job(job_id="a" * 32, status="done", age=61))
+    write_meta(store, new_job(job_id="b" * 32, status="done", age=10))
+    (tmp_path / f"{'a' * 32}.pdf").write_bytes(b"%PDF")
+
+    assert store.get("a" * 32) is None
+    assert not (tmp_path / f"{'a' * 32}.pdf").exists()
+    assert store.get("b" * 32).status == "done"
+
+
+def test_cleanup_removes_expired_and_stale_jobs(tmp_path):
+    store = ReportJobStore(str(tmp_path), ttl_seconds=60)
+    write_meta(store, new_job(job_id="a" * 32, status="failed", age=61))
+    write_meta(store, new_job(job_id="b" * 32, status="running", age=REPORT_JOB_STALE_SECONDS + 61))
+    write_meta(store, new_job(job_id="c" * 32, status="running", age=61))
+
+    assert store.cleanup() == 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"{'c' * 32}.json"]
+
+
+class InvalidAttachment(Exception):
+    status_code = 422
+    detail = "b.pdf is not a valid PDF"
+
+
+def run_jobs(store, build, *payloads):
+    """Submit every payload under the same job id, then wait for the jobs."""
+    async def run():
+        manager = ReportJobManager(store, build, max_concurrency=1)
+        created = [(await manager.submit(JOB_ID, payload))[1] for payload in payloads]
+        await asyncio.gather(*manager._tasks)
+        return created
+
+    return asyncio.run(run())
+
+
+def test_manager_runs_a_job_once(tmp_path):
+    store = ReportJobStore(str(tmp_path), ttl_seconds=60)
+    built = []
+
+    async def build(payload, progress):
+        await progress("merging")
+        built.append((payload, store.get(JOB_ID).progress))
+        return io.BytesIO(b"%PDF-" + payload)
+
+    assert run_jobs(store, build, b"1", b"1") == [True, False]
+    assert built == [(b"1", "merging")]
+    job = store.get(JOB_ID)
+    assert (job.status, job.size) == ("done", 6)
+    assert (tmp_path / f"{JOB_ID}.pdf").read_bytes() == b"%PDF-1"
+
+
+def test_failed_job_keeps_the_status_code_and_can_be_resubmitted(tmp_path):
+    store = ReportJobStore(str(tmp_path), ttl_seconds=60)
+
+    async def fail(payload, progress):
+        raise InvalidAttachment()
+
+    run_jobs(store, fail, b"1")
+    job = store.get(JOB_ID)
+    assert (job.status, job.error, job.error_status) == ("failed", "b.pdf is not a valid PDF", 422)
+
+    async def build(payload, progress):
+        return io.BytesIO(b"%PDF-" + payload)
+
+    assert run_jobs(store, build, b"2") == [True]
+    assert store.get(JOB_ID).status == "done"
+
+
+def test_waiting_jobs_are_not_taken_for_lost_ones(tmp_path):
+    store = ReportJobStore(str(tmp_path), ttl_seconds=60)
+    release = asyncio.Event()
+
+    async def build(payload, progress):
+        await release.wait()
+        return io.BytesIO(b"%PDF-" + payload)
+
+    async def run():
+        manager = ReportJobManager(store, build, max_concurrency=1, heartbeat_seconds=0.01)
+        await manager.submit("a" * 32, b"1")
+        waiting, _ = await manager.submit("b" * 32, b"2")
+        queued_at = waiting.updated_at
+        await asyncio.sleep(0.1)
+
+        job = store.get("b" * 32)
+        assert job.status == "queued"
+        assert job.updated_at > queued_at
+        release.set()
+        await asyncio.gather(*manager._tasks)
+
+    asyncio.run(run())
+    assert store.get("b" * 32).status == "done"
@@ -0,0 +1,184 @@
+import asyncio
+import contextvars
+import time
+
+import httpx
+import openai
+import pytest
+
+from app import resilience
+from app.resilience import (
+    CircuitBreaker, CircuitOpenError, ResilientModel, RetryPolicy, call_with_fallback, call_with_retries, deadline,
+    deadline_budget, hedged, remaining_time
+)
+
+NO_BACKOFF = RetryPolicy(max_retries=2, backoff_base=0, attempt_timeout=1)
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.example.com"))
+
+
+class Flaky:
+    """
+    Fails with the given errors, then returns "ok".
+    """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_retryable_errors_are_retried():
+    call = Flaky(connection_error(), TimeoutError())
+    assert asyncio.run(call_with_retries(call, "endpoint", NO_BACKOFF)) == "ok"
+    assert call.calls == 3
+    assert resilience.circuit_breaker("endpoint").state == "closed"
+
+
+def test_other_errors_are_not_retried():
+    call = Flaky(ValueError("bad request"))
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_retries(call, "endpoint", NO_BACKOFF))
+    assert call.calls == 1
+    assert resilience.circuit_breaker("endpoint").failures == 0
+
+
+def test_gives_up_after_max_retries():
+    call = Flaky(*[connection_error() for _ in range(5)])
+    with pytest.raises(openai.APIConnectionError):
+        asyncio.run(call_with_retries(call, "endpoint", NO_BACKOFF))
+    assert call.calls == 3
+
+
+def test_deadline_budget_bounds_calls_but_not_the_block():
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def run():
+        with deadline_budget(0.05):
+            with pytest.raises(TimeoutError):
+                await call_with_retries(slow, "endpoint", RetryPolicy(max_retries=0, attempt_timeout=0.5))
+            # Unlike deadline(), the block itself is not cancelled
+            await asyncio.sleep(0.05)
+            assert remaining_time() < 0
+        assert remaining_time() is None
+
+    asyncio.run(run())
+
+
+def test_attempts_run_in_the_callers_context():
+    # A stream's first event is read inside the attempt, the rest by the caller
+    current = contextvars.ContextVar("current", default=None)
+
+    async def enter():
+        return current.set("span")
+
+    async def run():
+        token = await call_with_retries(enter, "endpoint", NO_BACKOFF)
+        assert current.get() == "span"
+        current.reset(token)
+
+    asyncio.run(run())
+
+
+def test_timeouts_clipped_by_the_deadline_are_not_breaker_failures():
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def run():
+        async with deadline(0.05):
+            await call_with_retries(slow, "endpoint", RetryPolicy(attempt_timeout=0.5))
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(run())
+    assert resilience.circuit_breaker("endpoint").failures == 0
+
+
+def test_no_retry_without_time_for_a_full_attempt():
+    call = Flaky(connection_error())
+
+    async def run():
+        async with deadline(0.5):
+            await call_with_retries(call, "endpoint", RetryPolicy(backoff_base=0, attempt_timeout=1))
+
+    with pytest.raises(openai.APIConnectionError):
+        asyncio.run(run())
+    assert call.calls == 1
+
+
+def test_breaker_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker("endpoint", failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_probe_closes_or_reopens_the_circuit(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("endpoint", failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] += 30
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_fallback_is_called_when_the_primary_keeps_failing():
+    primary = Flaky(*[connection_error() for _ in range(5)])
+    fallback = Flaky()
+    result = asyncio.run(call_with_fallback(("primary", primary), ("fallback", fallback), NO_BACKOFF))
+    assert result == "ok"
+    assert (primary.calls, fallback.calls) == (3, 1)
+
+
+def test_fallback_is_not_used_for_client_errors():
+    fallback = Flaky()
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_fallback(("primary", Flaky(ValueError())), ("fallback", fallback), NO_BACKOFF))
+    assert fallback.calls == 0
+
+
+def test_hedged_request_wins_over_a_slow_first_call():
+    started = []
+
+    async def call():
+        started.append(time.monotonic())
+        if len(started) == 1:
+            await asyncio.sleep(1)
+            return "slow"
+        return "fast"
+
+    begin = time.monotonic()
+    assert asyncio.run(hedged(call, delay=0.05)) == "fast"
+    assert len(started) == 2
+    assert time.monotonic() - begin < 0.5
+
+
+def test_resilient_model_is_labelled_with_the_primary_model():
+    assert ResilientModel(lambda: None, "api.openai.com/gpt-4o", model="gpt-4o").model == "gpt-4o"
+    assert ResilientModel(lambda: None, "api.openai.com/gpt-4o").model == "api.openai.com/gpt-4o"
@@ -0,0 +1,71 @@
+from app import response_cache
+from app.response_cache import ResponseCache
+
+
+def messages(*texts):
+    return [{"role": "user", "content": text} for text in texts]
+
+
+def test_key_ignores_ids_whitespace_and_case():
+    first = [{"role": "user", "content": "Hallo  Welt", "id": "msg_1"}]
+    second = [{"role": "user", "content": "hallo welt", "id": "msg_2"}]
+    assert ResponseCache.key("graph", "triage", first) == ResponseCache.key("graph", "triage", second)
+    assert ResponseCache.key("graph", "triage", first) != ResponseCache.key("graph", "other", first)
+    assert ResponseCache.key("graph", "triage", first) != ResponseCache.key("other-graph", "triage", first)
+
+
+def test_tool_items_of_session_histories_are_part_of_the_key():
+    plain = messages("Ich wurde geblitzt")
+    session = plain + [
+        {"type": "function_call", "name": "transfer_to_road_traffic", "arguments": "{}", "call_id": "call_1"},
+        {"type": "function_call_output", "call_id": "call_1", "output": "{\"assistant\": \"Road traffic agent\"}"}
+    ]
+    assert ResponseCache.key("graph", "triage", plain) != ResponseCache.key("graph", "triage", session)
+
+
+def test_only_listed_roles_are_cacheable():
+    cache = ResponseCache(["triage"], max_entries=10, ttl_seconds=60)
+    assert cache.cacheable("triage")
+    assert not cache.cacheable("road_traffic")
+    assert not ResponseCache([], max_entries=10, ttl_seconds=60).cacheable("triage")
+    assert not ResponseCache(["triage"], max_entries=0, ttl_seconds=60).cacheable("triage")
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(["triage"], max_entries=10, ttl_seconds=60)
+    key = cache.key("graph", "triage", messages("Hallo"))
+    cache.put(key, "Grüezi", "Triage agent")
+
+    now[0] += 59
+    assert cache.get(key).output == "Grüezi"
+    now[0] += 2
+    assert cache.get(key) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(["triage"], max_entries=2, ttl_seconds=60)
+    cache.put("a", "A", "Triage agent")
+    cache.put("b", "B", "Triage agent")
+    assert cache.get("a") is not None
+    cache.put("c", "C", "Triage agent")
+
+    assert cache.get("b") is None
+    assert cache.get("a").output == "A"
+    assert cache.get("c").output == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_clear_and_stats():
+    cache = ResponseCache(["triage"], max_entries=10, ttl_seconds=60)
+    cache.put("a", "A", "Triage agent")
+    cache.get("a")
+    cache.get("missing")
+    cache.clear()
+
+    stats = cache.stats()
+    assert stats["entries"] == 0
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
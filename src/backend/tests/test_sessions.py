@@ -0,0 +1,108 @@
+import pytest
+
+from app import sessions
+from app.sessions import ConversationSession, InMemorySessionStore, SQLiteSessionStore, create_session_store
+
+ITEMS = [{"role": "user", "content": "Grüezi"}, {"role": "assistant", "content": "Hallo"}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60)
+    yield store
+    store.close()
+
+
+def test_memory_store_hands_out_copies():
+    store = InMemorySessionStore(max_entries=10, ttl_seconds=60)
+    store.save(ConversationSession("s1", items=list(ITEMS), last_agent="Triage agent"))
+
+    session = store.get("s1")
+    assert session.items == ITEMS
+    assert session.last_agent == "Triage agent"
+    session.items.append({"role": "user", "content": "Noch eine Frage"})
+    assert store.get("s1").items == ITEMS
+
+
+def test_memory_store_expires_idle_sessions(clock):
+    store = InMemorySessionStore(max_entries=10, ttl_seconds=60)
+    store.save(ConversationSession("s1", items=list(ITEMS)))
+
+    clock[0] += 59
+    assert store.get("s1") is not None
+    clock[0] += 61
+    assert store.get("s1") is None
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = InMemorySessionStore(max_entries=2, ttl_seconds=60)
+    for session_id in ("s1", "s2"):
+        store.save(ConversationSession(session_id))
+    store.get("s1")
+    store.save(ConversationSession("s3"))
+
+    assert store.get("s2") is None
+    assert store.get("s1") is not None
+    assert store.get("s3") is not None
+
+
+def test_sqlite_store_round_trip(sqlite_store):
+    sqlite_store.save(ConversationSession("s1", items=list(ITEMS), last_agent="Triage agent"))
+    session = sqlite_store.get("s1")
+    assert session.items == ITEMS
+    assert session.last_agent == "Triage agent"
+
+    sqlite_store.delete("s1")
+    assert sqlite_store.get("s1") is None
+
+
+def test_sqlite_store_survives_a_restart(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path, ttl_seconds=60)
+    store.save(ConversationSession("s1", items=list(ITEMS)))
+    store.close()
+
+    reopened = SQLiteSessionStore(path, ttl_seconds=60)
+    try:
+        assert reopened.get("s1").items == ITEMS
+    finally:
+        reopened.close()
+
+
+def test_sqlite_store_expires_idle_sessions(clock, sqlite_store):
+    sqlite_store.save(ConversationSession("s1", items=list(ITEMS)))
+
+    clock[0] += 59
+    assert sqlite_store.get("s1") is not None
+    clock[0] += 61
+    assert sqlite_store.get("s1") is None
+
+
+def test_store_is_chosen_by_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("SESSION_STORE", "sqlite")
+    monkeypatch.setenv("SESSION_SQLITE_PATH", str(tmp_path / "sessions.db"))
+    store = create_session_store()
+    try:
+        assert isinstance(store, SQLiteSessionStore)
+    finally:
+        store.close()
+
+    monkeypatch.setenv("SESSION_STORE", "memory")
+    assert isinstance(create_session_store(), InMemorySessionStore)
+
+
+def test_forked_worker_opens_its_own_connection(monkeypatch, sqlite_store):
+    sqlite_store.save(ConversationSession("s1", items=list(ITEMS)))
+    parent_connection = sqlite_store._conn
+
+    monkeypatch.setattr(sessions.os, "getpid", lambda: -1)
+    assert sqlite_store.get("s1").items == ITEMS
+    assert sqlite_store._conn is not parent_connection
+    parent_connection.close()
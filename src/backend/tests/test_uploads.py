@@ -0,0 +1,63 @@
+import asyncio
+import hashlib
+import io
+
+from fastapi import FastAPI, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from app.uploads import UploadSizeLimitMiddleware, copy_upload, upload_size
+
+
+def limited_client(max_bytes=10):
+    inner = FastAPI()
+
+    @inner.post("/upload")
+    @inner.post("/other")
+    async def receive_body(request: Request):
+        return {"size": len(await request.body())}
+
+    return TestClient(UploadSizeLimitMiddleware(inner, max_bytes=max_bytes, paths=["/upload"]))
+
+
+def chunks(*parts):
+    yield from parts
+
+
+def test_announced_oversized_body_is_rejected():
+    response = limited_client().post("/upload", content=b"x" * 11)
+    assert response.status_code == 413
+    assert "maximum size" in response.json()["detail"]
+
+
+def test_chunked_body_is_aborted_at_the_limit():
+    response = limited_client().post("/upload", content=chunks(b"x" * 6, b"x" * 6))
+    assert response.status_code == 413
+
+
+def test_bodies_within_the_limit_and_other_paths_pass():
+    client = limited_client()
+    assert client.post("/upload", content=b"x" * 10).json() == {"size": 10}
+    assert client.post("/other", content=b"x" * 100).json() == {"size": 100}
+
+
+def test_copy_upload_counts_and_hashes():
+    data = b"%PDF-1.4 " + b"x" * 3000
+    upload = UploadFile(file=io.BytesIO(data), filename="document.pdf")
+    destination = io.BytesIO()
+
+    size, digest = asyncio.run(copy_upload(upload, destination))
+    assert size == len(data) == upload_size(upload)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert destination.getvalue() == data
+
+
+def test_rejection_carries_the_cors_headers():
+    from app import app as server
+
+    response = TestClient(server.app).post(
+        "/parse-document",
+        content=b"x",
+        headers={"Origin": "https://example.org", "Content-Length": str(server.MAX_UPLOAD_BYTES + 1)}
+    )
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"]
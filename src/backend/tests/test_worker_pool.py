@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.worker_pool import BoundedWorkerPool, PoolSaturatedError
+
+
+def thread_pool(**kwargs):
+    options = {"max_concurrency": 1, "max_queue": 1, "timeout_seconds": 5, "capacity_poll_seconds": 0.01}
+    options.update(kwargs)
+    return BoundedWorkerPool("test", lambda: ThreadPoolExecutor(max_workers=1), **options)
+
+
+def test_jobs_beyond_the_queue_are_rejected():
+    pool = thread_pool()
+    release = threading.Event()
+
+    async def run():
+        running = asyncio.create_task(pool.run(release.wait))
+        queued = asyncio.create_task(pool.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        assert pool.pending == 2
+        assert pool.saturated
+        with pytest.raises(PoolSaturatedError) as error:
+            await pool.run(lambda: "rejected")
+        assert error.value.retry_after == pool.retry_after
+
+        release.set()
+        assert await queued == "queued"
+        await running
+        assert pool.pending == 0
+        assert not pool.saturated
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_wait_for_capacity_returns_once_a_slot_is_free():
+    pool = thread_pool(max_queue=0)
+    release = threading.Event()
+
+    async def run():
+        running = asyncio.create_task(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.create_task(pool.wait_for_capacity())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+
+        release.set()
+        await running
+        await asyncio.wait_for(waiting, timeout=1)
+        assert await pool.run(lambda: "next") == "next"
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_jobs_time_out():
+    pool = thread_pool(timeout_seconds=0.05)
+    release = threading.Event()
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(pool.run(release.wait))
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_timeout_moves_new_jobs_to_a_fresh_executor():
+    pool = thread_pool(timeout_seconds=0.05, recycle_on_timeout=True)
+    release = threading.Event()
+
+    async def run():
+        pool.start()
+        first = pool._executor
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(release.wait)
+        assert pool._executor is not first
+        assert not pool._retired
+        assert await pool.run(lambda: "fresh") == "fresh"
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_timed_out_job_keeps_its_slot_until_it_returns():
+    pool = thread_pool(max_queue=0, timeout_seconds=0.05)
+    release = threading.Event()
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(release.wait)
+        # The thread is still busy with the abandoned job
+        assert pool.saturated
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(lambda: "rejected")
+
+        release.set()
+        await asyncio.wait_for(pool.wait_for_capacity(), timeout=1)
+        assert await pool.run(lambda: "next") == "next"
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
+        pool.shutdown()